@@ -1,9 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
 import os
 
+import timing
+
 
 def _truncate_utf8_bytes_force71(s, max_bytes=71):
     if not isinstance(s, str):
@@ -24,72 +27,89 @@ SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(
-    schemes=["bcrypt_sha256"], deprecated="auto", bcrypt__variant="pybcrypt"
+# Password hashing profiles, picked with PASSWORD_HASH_PROFILE:
+# - production: bcrypt_sha256 at the default cost (12 rounds)
+# - test: the same scheme at the minimum cost (4 rounds, ~1ms). The cost is
+#   stored in every hash ("...,r=4$"), so either profile verifies the other's
+#   hashes. Under the production profile, /auth/login rehashes low-cost ones
+#   (password_needs_rehash()). Never use it outside tests and seeding
+PRODUCTION_ROUNDS = 12
+TEST_ROUNDS = 4
+HASH_PROFILES = {
+    "production": {
+        "bcrypt_sha256__default_rounds": PRODUCTION_ROUNDS,
+        "bcrypt_sha256__min_rounds": PRODUCTION_ROUNDS,
+    },
+    "test": {
+        "bcrypt_sha256__default_rounds": TEST_ROUNDS,
+        "bcrypt_sha256__min_rounds": TEST_ROUNDS,
+    },
+}
+PASSWORD_HASH_PROFILE = os.getenv("PASSWORD_HASH_PROFILE", "production")
+
+
+def make_password_context(profile):
+    if profile not in HASH_PROFILES:
+        raise ValueError(
+            f"Unknown PASSWORD_HASH_PROFILE {profile!r}; "
+            f"expected one of {sorted(HASH_PROFILES)}"
+        )
+    return CryptContext(
+        schemes=["bcrypt_sha256"],
+        deprecated="auto",
+        bcrypt__variant="pybcrypt",
+        **HASH_PROFILES[profile],
+    )
+
+
+pwd_context = make_password_context(PASSWORD_HASH_PROFILE)
+if PASSWORD_HASH_PROFILE == "test":
+    print(
+        "[WARN] PASSWORD_HASH_PROFILE=test: low-cost password hashes, "
+        "never use this outside tests",
+        flush=True,
+    )
+
+# bcrypt is CPU-bound (and releases the GIL), so running more hashes at once
+# than there are cores only makes every login slower. Request threads hand
+# the work to this bounded pool and wait; excess logins queue here instead.
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "0")) or os.cpu_count() or 1
+_bcrypt_executor = ThreadPoolExecutor(
+    max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt"
 )
 
 
+def bcrypt_queue_depth():
+    """Hashes submitted but not yet picked up by a bcrypt thread."""
+    return _bcrypt_executor._work_queue.qsize()
+
+
 def verify_password(plain_password, hashed_password):
     # Always truncate before verifying
     safe_password = _truncate_utf8_bytes_force71(plain_password, 71)
-    return pwd_context.verify(safe_password, hashed_password)
+    with timing.span("bcrypt"):
+        return _bcrypt_executor.submit(
+            pwd_context.verify, safe_password, hashed_password
+        ).result()
+
+
+def password_needs_rehash(hashed_password):
+    """True for hashes below the active profile's cost (e.g. test hashes)."""
+    return pwd_context.needs_update(hashed_password)
 
 
 def get_password_hash(password):
-    # Debug: log type and value of password
-    debug_msg = (
-        f"[DEBUG] get_password_hash: type={type(password)}, value={repr(password)}\n"
-    )
-    print(debug_msg, flush=True)
-    try:
-        with open("/tmp/password_debug.log", "a") as f:
-            f.write(debug_msg)
-    except Exception:
-        pass
+    # Never print or log `password`: logins rehash old hashes through here
     if not isinstance(password, str):
-        raise ValueError(
-            f"Password must be a string, got {type(password)}: {repr(password)}"
-        )
-    if password is None:
-        raise ValueError("Password cannot be None")
+        raise ValueError(f"Password must be a string, got {type(password)}")
     # Always truncate before hashing
     safe_password = _truncate_utf8_bytes_force71(password, 71)
-    safe_password_bytes = safe_password.encode("utf-8")
-    byte_len = len(safe_password_bytes)
-    debug_msg2 = (
-        f"[DEBUG] About to hash password: {repr(safe_password)}\n"
-        f"[DEBUG] Type: {type(safe_password)}\n"
-        f"[DEBUG] Encoded bytes: {safe_password_bytes}\n"
-        f"[DEBUG] Byte length: {byte_len}\n"
-        f"[DEBUG] Char length: {len(safe_password)}\n"
+    byte_len = len(safe_password.encode("utf-8"))
+    assert byte_len <= 72, (
+        f"Password passed to bcrypt is {byte_len} bytes, must be <= 72"
     )
-    print(debug_msg2, flush=True)
-    try:
-        with open("/tmp/password_debug.log", "a") as f:
-            f.write(debug_msg2)
-    except Exception:
-        pass
-    try:
-        assert byte_len <= 72, (
-            f"Password passed to bcrypt is {byte_len} bytes, must be <= 72. "
-            f"Value: {repr(safe_password)}"
-        )
-        return pwd_context.hash(safe_password)
-    except ValueError as ve:
-        import traceback
-
-        tb = traceback.format_exc()
-        error_msg = (
-            f"[ERROR] Exception in get_password_hash: {ve}\n{tb}\n"
-            f"[DEBUG] Password: {repr(safe_password)} (bytes: {byte_len})\n"
-        )
-        print(error_msg, flush=True)
-        try:
-            with open("/tmp/password_debug.log", "a") as f:
-                f.write(error_msg)
-        except Exception:
-            pass
-        raise
+    with timing.span("bcrypt"):
+        return _bcrypt_executor.submit(pwd_context.hash, safe_password).result()
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -98,13 +118,15 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    with timing.span("jwt"):
+        encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
 def decode_access_token(token: str):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with timing.span("jwt"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except JWTError:
         return None
@@ -0,0 +1,67 @@
+"""
+auth_bench.py: Microbenchmarks for the auth primitives on every auth request.
+
+Usage (from backend/):
+    pytest benchmarks/auth_bench.py                     # compare to baseline
+    pytest benchmarks/auth_bench.py --bench-save        # accept new numbers
+    pytest benchmarks/auth_bench.py --bench-fail        # exit 1 on regression
+    pytest benchmarks/auth_bench.py -k "not bcrypt"     # skip the slow hashes
+
+Baselines live in benchmarks/baselines/auth_bench.json. They are only
+meaningful on the machine that recorded them (see its "machine" block), so
+re-save after changing hardware, hash cost or the JWT backend.
+"""
+
+from datetime import timedelta
+
+import pytest
+
+import auth
+
+PASSWORDS = {
+    "ascii": "correct-horse-9",
+    "multibyte": "pässwörd-密码-🔑",
+    "ascii_over72": "x" * 100,
+    "multibyte_over72": "密" * 40 + "🔑" * 5,
+}
+
+
+@pytest.mark.parametrize("kind", PASSWORDS)
+def test_truncate_utf8(bench, kind):
+    bench(f"truncate[{kind}]", auth._truncate_utf8_bytes_force71, PASSWORDS[kind])
+
+
+@pytest.mark.parametrize("kind", PASSWORDS)
+def test_bcrypt_hash(bench, kind):
+    result = bench(f"bcrypt_hash[{kind}]", auth.get_password_hash, PASSWORDS[kind])
+    assert result["median_s"] > 0
+
+
+@pytest.mark.parametrize("kind", PASSWORDS)
+def test_bcrypt_verify(bench, kind):
+    hashed = auth.get_password_hash(PASSWORDS[kind])
+    assert auth.verify_password(PASSWORDS[kind], hashed)
+    bench(f"bcrypt_verify[{kind}]", auth.verify_password, PASSWORDS[kind], hashed)
+
+
+def test_create_access_token(bench):
+    bench(
+        "create_access_token",
+        auth.create_access_token,
+        {"sub": "12345", "role": "user"},
+    )
+
+
+def test_decode_access_token(bench):
+    token = auth.create_access_token({"sub": "12345", "role": "user"})
+    assert auth.decode_access_token(token)["sub"] == "12345"
+    bench("decode_access_token[valid]", auth.decode_access_token, token)
+
+
+def test_decode_rejected_tokens(bench):
+    expired = auth.create_access_token({"sub": "1"}, timedelta(minutes=-5))
+    tampered = auth.create_access_token({"sub": "1"})[:-2] + "xx"
+    assert auth.decode_access_token(expired) is None
+    assert auth.decode_access_token(tampered) is None
+    bench("decode_access_token[expired]", auth.decode_access_token, expired)
+    bench("decode_access_token[tampered]", auth.decode_access_token, tampered)
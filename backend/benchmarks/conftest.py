@@ -0,0 +1,174 @@
+"""
+Benchmark fixtures for ``pytest benchmarks/<name>_bench.py``.
+
+- ``bench(name, fn, *args)`` calibrates a loop count so one round takes at
+  least --bench-min-time, runs --bench-rounds rounds with the GC paused and
+  records min/median seconds per call
+- Results go to --bench-output (JSON). Each result is compared with
+  benchmarks/baselines/<module>.json; medians slower than the baseline by
+  more than --bench-threshold percent are listed as regressions at the end
+- --bench-save rewrites the baseline; --bench-fail makes regressions fail
+  the run (exit status 1)
+"""
+
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("bench", "microbenchmarks")
+    group.addoption("--bench-rounds", type=int, default=5)
+    group.addoption("--bench-min-time", type=float, default=0.1, help="s/round")
+    group.addoption("--bench-threshold", type=float, default=25, help="% slower")
+    group.addoption("--bench-output", help="Write this run's results as JSON")
+    group.addoption("--bench-save", action="store_true", help="Update baselines")
+    group.addoption("--bench-fail", action="store_true", help="Fail on regression")
+
+
+def machine():
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+class BenchSession:
+    def __init__(self, config):
+        self.config = config
+        self.results = {}  # module -> name -> result
+        self.regressions = []
+
+    def baseline(self, module):
+        path = os.path.join(BASELINE_DIR, f"{module}.json")
+        try:
+            with open(path) as f:
+                return json.load(f).get("results", {})
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, module, name, result):
+        self.results.setdefault(module, {})[name] = result
+        previous = self.baseline(module).get(name)
+        if not previous:
+            return
+        threshold = self.config.getoption("bench_threshold")
+        change = (result["median_s"] / previous["median_s"] - 1) * 100
+        result["change_pct"] = round(change, 1)
+        if change > threshold:
+            self.regressions.append(
+                f"{module}::{name}: {previous['median_s'] * 1e6:.2f}us -> "
+                f"{result['median_s'] * 1e6:.2f}us ({change:+.0f}%)"
+            )
+
+    def write(self):
+        output = self.config.getoption("bench_output")
+        if output:
+            with open(output, "w") as f:
+                json.dump({"machine": machine(), "results": self.results}, f, indent=2)
+        if self.config.getoption("bench_save"):
+            os.makedirs(BASELINE_DIR, exist_ok=True)
+            for module, results in self.results.items():
+                path = os.path.join(BASELINE_DIR, f"{module}.json")
+                # Merge, so saving a -k subset keeps the other baselines
+                merged = {**self.baseline(module), **results}
+                stored = {
+                    name: {k: v for k, v in r.items() if k != "change_pct"}
+                    for name, r in sorted(merged.items())
+                }
+                with open(path, "w") as f:
+                    json.dump({"machine": machine(), "results": stored}, f, indent=2)
+                    f.write("\n")
+
+
+def pytest_configure(config):
+    config._bench = BenchSession(config)
+
+
+def measure(fn, args, rounds, min_time):
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn(*args)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(loops):
+                fn(*args)
+            timings.append((time.perf_counter() - start) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "rounds": rounds,
+        "loops": loops,
+    }
+
+
+@pytest.fixture
+def bench(request, capsys):
+    session = request.config._bench
+    module = request.module.__name__.rsplit(".", 1)[-1]
+
+    def run(name, fn, *args):
+        result = measure(
+            fn,
+            args,
+            request.config.getoption("bench_rounds"),
+            request.config.getoption("bench_min_time"),
+        )
+        capsys.readouterr()  # drop whatever the benchmarked code printed
+        session.record(module, name, result)
+        return result
+
+    return run
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    session = config._bench
+    if not session.results:
+        return
+    terminalreporter.section("benchmarks")
+    for module, results in sorted(session.results.items()):
+        for name, r in sorted(results.items()):
+            change = r.get("change_pct")
+            suffix = "" if change is None else f"  ({change:+.1f}% vs baseline)"
+            terminalreporter.write_line(
+                f"{module}::{name:<45} median {r['median_s'] * 1e6:12.2f}us"
+                f"  min {r['min_s'] * 1e6:12.2f}us{suffix}"
+            )
+    if session.regressions:
+        terminalreporter.section("benchmark regressions", red=True)
+        for line in session.regressions:
+            terminalreporter.write_line(line, red=True)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    bench_session = session.config._bench
+    bench_session.write()
+    if bench_session.regressions and session.config.getoption("bench_fail"):
+        session.exitstatus = 1
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+db_perf.py: PostgreSQL performance suite for the ``users`` table.
+
+- Inserts: per-row INSERT vs executemany vs execute_values vs COPY, each
+  loading --insert-rows rows in one transaction with the production indexes
+- Email lookups at each --sizes row count, one index strategy at a time:
+  none (seq scan), the production unique btree, lower(email), hash and a
+  covering btree (INCLUDE the columns login reads). Reports build time,
+  index size, the plan node and p50/p95/p99 round-trip latency
+- Pagination at each size: LIMIT/OFFSET vs keyset (id > cursor) at several
+  depths into the table
+- Everything runs in a scratch schema (--schema, dropped afterwards) whose
+  ``users`` table is created from models.User, so the app's data is never
+  touched. Tables are grown with generate_series, so 10M rows take about a
+  minute and ~2 GB of disk
+
+Usage (from backend/, e.g. inside the backend container):
+    python benchmarks/db_perf.py --sizes 10k,1m --output reports/db_perf.json
+    python benchmarks/db_perf.py --baseline reports/db_perf-baseline.json
+
+With --baseline, latencies more than --threshold percent slower (or insert
+throughput that much lower) than the stored report are listed and the
+script exits 1. --save-baseline writes the report to --baseline instead.
+"""
+
+import argparse
+import datetime
+import io
+import math
+import os
+import platform
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import psycopg2  # noqa: E402
+import psycopg2.extras  # noqa: E402
+from sqlalchemy import MetaData, create_engine  # noqa: E402
+
+import models  # noqa: E402
+from reporting import add_report_arguments, finish, percentile  # noqa: E402
+
+DB_NAME = os.getenv("TEST_DB", "anantam_test")
+DB_USER = os.getenv("TEST_DB_USER", "anantam")
+DB_PASSWORD = os.getenv("TEST_DB_PASSWORD", "supersecret")
+DB_HOST = os.getenv("TEST_DB_HOST", "db")
+DB_PORT = os.getenv("TEST_DB_PORT", "5432")
+DATABASE_URL = os.getenv("TEST_DATABASE_URL") or (
+    os.getenv("DATABASE_URL", "")
+    if os.getenv("DATABASE_URL", "").startswith("postgresql")
+    else f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+
+COLUMNS = (
+    "email",
+    "hashed_password",
+    "full_name",
+    "is_active",
+    "is_superuser",
+    "role",
+    "created_at",
+    "version",
+)
+LOGIN_COLUMNS = "id, hashed_password, is_active"
+
+# name -> (index DDL or None, lookup WHERE clause, selected columns)
+EMAIL_STRATEGIES = {
+    "none": (None, "email = %s", LOGIN_COLUMNS),
+    "btree_unique": (
+        "CREATE UNIQUE INDEX bench_email ON {t} (email)",
+        "email = %s",
+        LOGIN_COLUMNS,
+    ),
+    "btree_lower": (
+        "CREATE UNIQUE INDEX bench_email ON {t} (lower(email))",
+        "lower(email) = lower(%s)",
+        LOGIN_COLUMNS,
+    ),
+    "hash": (
+        "CREATE INDEX bench_email ON {t} USING hash (email)",
+        "email = %s",
+        LOGIN_COLUMNS,
+    ),
+    "btree_covering": (
+        "CREATE UNIQUE INDEX bench_email ON {t} (email) "
+        "INCLUDE (hashed_password, is_active)",
+        "email = %s",
+        LOGIN_COLUMNS,
+    ),
+}
+DEPTHS = (0, 0.1, 0.5, 0.9)
+SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    if text[-1:] in SUFFIXES:
+        return int(float(text[:-1]) * SUFFIXES[text[-1]])
+    return int(text)
+
+
+def latency_block(seconds):
+    values = sorted(seconds)
+    return {
+        "samples": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 4),
+        "p50_ms": round(percentile(values, 50) * 1000, 4),
+        "p95_ms": round(percentile(values, 95) * 1000, 4),
+        "p99_ms": round(percentile(values, 99) * 1000, 4),
+    }
+
+
+def user_row(i, now):
+    return (
+        f"user{i}@example.com",
+        f"$2b$12${i:053d}",
+        f"User {i}",
+        True,
+        False,
+        "user",
+        now,
+        1,
+    )
+
+
+class Suite:
+    def __init__(self, url, schema, seed=0):
+        self.url = url
+        self.schema = schema
+        self.table = f"{schema}.users"
+        self.random = random.Random(seed)
+        self.conn = psycopg2.connect(url)
+        self.conn.autocommit = True
+        self.size = 0
+
+    def execute(self, sql, args=None):
+        with self.conn.cursor() as cur:
+            cur.execute(sql, args)
+            return cur.fetchall() if cur.description else None
+
+    def server(self):
+        return self.execute("SHOW server_version")[0][0]
+
+    def create_schema(self):
+        self.drop_schema()
+        self.execute(f"CREATE SCHEMA {self.schema}")
+        metadata = MetaData()
+        models.User.__table__.to_metadata(metadata, schema=self.schema)
+        engine = create_engine(self.url)
+        try:
+            metadata.create_all(engine)
+        finally:
+            engine.dispose()
+        self.production_indexes = [
+            row[0]
+            for row in self.execute(
+                "SELECT indexdef FROM pg_indexes WHERE schemaname = %s "
+                "AND tablename = 'users' AND indexname NOT LIKE '%%pkey'",
+                (self.schema,),
+            )
+        ]
+
+    def drop_schema(self):
+        self.execute(f"DROP SCHEMA IF EXISTS {self.schema} CASCADE")
+
+    def drop_secondary_indexes(self):
+        rows = self.execute(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = %s "
+            "AND tablename = 'users' AND indexname NOT LIKE '%%pkey'",
+            (self.schema,),
+        )
+        for (name,) in rows:
+            self.execute(f"DROP INDEX {self.schema}.{name}")
+
+    def truncate(self):
+        self.execute(f"TRUNCATE {self.table} RESTART IDENTITY")
+        self.size = 0
+
+    # Inserts
+
+    def insert_strategies(self, rows):
+        table, columns = self.table, ", ".join(COLUMNS)
+        placeholders = ", ".join(["%s"] * len(COLUMNS))
+        single = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+
+        def per_row(cur, data):
+            for row in data:
+                cur.execute(single, row)
+
+        def executemany(cur, data):
+            cur.executemany(single, data)
+
+        def execute_values(cur, data):
+            psycopg2.extras.execute_values(
+                cur, f"INSERT INTO {table} ({columns}) VALUES %s", data, page_size=1000
+            )
+
+        def copy(cur, data):
+            buffer = io.StringIO()
+            for row in data:
+                buffer.write(
+                    "\t".join(
+                        ("t" if v else "f") if isinstance(v, bool) else str(v)
+                        for v in row
+                    )
+                )
+                buffer.write("\n")
+            buffer.seek(0)
+            cur.copy_expert(f"COPY {table} ({columns}) FROM STDIN", buffer)
+
+        strategies = {
+            "per_row": per_row,
+            "executemany": executemany,
+            "execute_values": execute_values,
+            "copy": copy,
+        }
+        now = datetime.datetime.utcnow()
+        data = [user_row(i, now) for i in range(1, rows + 1)]
+        results = {}
+        for name, load in strategies.items():
+            self.truncate()
+            with self.conn.cursor() as cur:
+                start = time.perf_counter()
+                cur.execute("BEGIN")
+                load(cur, data)
+                cur.execute("COMMIT")
+                elapsed = time.perf_counter() - start
+            count = self.execute(f"SELECT count(*) FROM {table}")[0][0]
+            assert count == rows, f"{name} inserted {count} of {rows} rows"
+            results[name] = {
+                "seconds": round(elapsed, 4),
+                "rows_per_s": round(rows / elapsed, 1),
+            }
+        self.truncate()
+        return {"rows": rows, "indexes": self.production_indexes, "strategies": results}
+
+    # Scale
+
+    def grow(self, size):
+        """Fill the table up to ``size`` rows (ids and emails stay dense)."""
+        start = time.perf_counter()
+        if size > self.size:
+            self.execute(
+                f"INSERT INTO {self.table} ({', '.join(COLUMNS)}) "
+                "SELECT 'user' || g || '@example.com', "
+                "'$2b$12$' || lpad(g::text, 53, '0'), 'User ' || g, "
+                "true, false, 'user', now() - g * interval '1 second', 1 "
+                "FROM generate_series(%s, %s) AS g",
+                (self.size + 1, size),
+            )
+            self.size = size
+        self.execute(f"VACUUM ANALYZE {self.table}")
+        return round(time.perf_counter() - start, 2)
+
+    def timed(self, sql, args_list, warmup=20):
+        latencies = []
+        with self.conn.cursor() as cur:
+            for i, args in enumerate(args_list):
+                start = time.perf_counter()
+                cur.execute(sql, args)
+                cur.fetchall()
+                if i >= warmup or len(args_list) <= warmup:
+                    latencies.append(time.perf_counter() - start)
+        return latencies
+
+    def plan_node(self, sql, args):
+        plan = self.execute("EXPLAIN (FORMAT JSON) " + sql, args)[0][0][0]["Plan"]
+        while plan.get("Node Type") in ("Limit", "Gather") and plan.get("Plans"):
+            plan = plan["Plans"][0]
+        return plan["Node Type"]
+
+    def email_lookups(self, lookups, seq_lookups, miss_ratio=0.1):
+        results = {}
+        for name, (ddl, where, select) in EMAIL_STRATEGIES.items():
+            count = seq_lookups if ddl is None else lookups
+            keys = [
+                (
+                    (
+                        f"missing{i}@example.com"
+                        if self.random.random() < miss_ratio
+                        else f"user{self.random.randint(1, self.size)}@example.com"
+                    ),
+                )
+                for i in range(count)
+            ]
+            build_s = index_bytes = None
+            if ddl:
+                start = time.perf_counter()
+                self.execute(ddl.format(t=self.table))
+                build_s = round(time.perf_counter() - start, 3)
+                self.execute(f"ANALYZE {self.table}")
+                index_bytes = self.execute(
+                    f"SELECT pg_relation_size('{self.schema}.bench_email')"
+                )[0][0]
+            sql = f"SELECT {select} FROM {self.table} WHERE {where}"
+            try:
+                block = latency_block(self.timed(sql, keys))
+                block.update(
+                    build_s=build_s,
+                    index_bytes=index_bytes,
+                    plan=self.plan_node(sql, keys[0]),
+                )
+                results[name] = block
+            finally:
+                if ddl:
+                    self.execute(f"DROP INDEX {self.schema}.bench_email")
+        return results
+
+    def pagination(self, page_size, repeats):
+        offset_sql = (
+            f"SELECT id, email, full_name FROM {self.table} "
+            "ORDER BY id LIMIT %s OFFSET %s"
+        )
+        keyset_sql = (
+            f"SELECT id, email, full_name FROM {self.table} "
+            "WHERE id > %s ORDER BY id LIMIT %s"
+        )
+        results = {"page_size": page_size, "offset": {}, "keyset": {}}
+        for fraction in DEPTHS:
+            depth = int(self.size * fraction)
+            # The cursor a client would hold: the last id of the previous page
+            cursor = (
+                self.execute(
+                    f"SELECT id FROM {self.table} ORDER BY id OFFSET %s LIMIT 1",
+                    (depth - 1,),
+                )[0][0]
+                if depth
+                else 0
+            )
+            assert self.execute(offset_sql, (page_size, depth)) == self.execute(
+                keyset_sql, (cursor, page_size)
+            )
+            key = str(depth)
+            offset = self.timed(offset_sql, [(page_size, depth)] * repeats, warmup=1)
+            keyset = self.timed(keyset_sql, [(cursor, page_size)] * repeats, warmup=1)
+            results["offset"][key] = latency_block(offset)
+            results["keyset"][key] = latency_block(keyset)
+        return results
+
+    def close(self):
+        self.conn.close()
+
+
+def run(args):
+    suite = Suite(args.dsn, args.schema, args.seed)
+    report = {
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "server_version": suite.server(),
+        },
+        "started_at": datetime.datetime.utcnow().isoformat() + "Z",
+        "config": {
+            "insert_rows": args.insert_rows,
+            "sizes": args.sizes,
+            "lookups": args.lookups,
+            "seq_lookups": args.seq_lookups,
+            "page_size": args.page_size,
+            "page_repeats": args.page_repeats,
+        },
+        "sizes": {},
+    }
+    try:
+        suite.create_schema()
+        log(f"inserts: {args.insert_rows} rows per strategy")
+        report["inserts"] = suite.insert_strategies(args.insert_rows)
+        suite.drop_secondary_indexes()
+        for size in sorted(args.sizes):
+            log(f"{size} rows: loading")
+            fill_s = suite.grow(size)
+            table_bytes = suite.execute(f"SELECT pg_table_size('{suite.table}')")[0][0]
+            log(f"{size} rows: email lookups")
+            lookups = suite.email_lookups(args.lookups, args.seq_lookups)
+            log(f"{size} rows: pagination")
+            pages = suite.pagination(args.page_size, args.page_repeats)
+            report["sizes"][str(size)] = {
+                "fill_s": fill_s,
+                "table_bytes": table_bytes,
+                "email_lookup": lookups,
+                "pagination": pages,
+            }
+    finally:
+        if not args.keep:
+            suite.drop_schema()
+        suite.close()
+    return report
+
+
+def flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, value
+
+
+def compare(report, baseline, threshold):
+    """Latencies (p50/p95/p99) that grew or insert rates that dropped."""
+    old = dict(flatten({k: baseline.get(k) for k in ("inserts", "sizes")}))
+    regressions = []
+    for key, new in flatten({k: report.get(k) for k in ("inserts", "sizes")}):
+        previous = old.get(key)
+        if not previous:
+            continue
+        if key.endswith(("p50_ms", "p95_ms", "p99_ms")):
+            change = (new / previous - 1) * 100
+        elif key.endswith("rows_per_s"):
+            change = (previous / new - 1) * 100 if new else math.inf
+        else:
+            continue
+        if change > threshold:
+            regressions.append(f"{key}: {previous} -> {new} ({change:+.0f}%)")
+    return regressions
+
+
+def log(message):
+    print(f"[INFO] {message}", file=sys.stderr, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dsn", default=DATABASE_URL)
+    parser.add_argument("--schema", default="perf_bench")
+    parser.add_argument("--sizes", default="10k,1m,10m", help="e.g. 10k,1m,10m")
+    parser.add_argument("--insert-rows", type=int, default=10_000)
+    parser.add_argument("--lookups", type=int, default=2000, help="Per index")
+    parser.add_argument(
+        "--seq-lookups", type=int, default=20, help="Lookups without an index"
+    )
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--page-repeats", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep the schema")
+    add_report_arguments(parser)
+    parser.add_argument("--threshold", type=float, default=25, help="Allowed %% change")
+    args = parser.parse_args()
+    try:
+        args.sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    except ValueError:
+        parser.error("--sizes must look like 10k,1m,10m")
+    if not args.sizes or min(args.sizes) < 1 or args.insert_rows < 1:
+        parser.error("sizes and --insert-rows must be positive")
+
+    report = run(args)
+    sys.exit(
+        finish(report, args, lambda baseline: compare(report, baseline, args.threshold))
+    )
+
+
+if __name__ == "__main__":
+    main()
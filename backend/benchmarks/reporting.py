@@ -0,0 +1,57 @@
+"""
+reporting.py: Shared report and baseline handling for the perf scripts.
+
+- Used by benchmarks/db_perf.py and scripts/loadtest.py, which both print a
+  JSON report, can save it as a baseline and exit 1 when a later run
+  regresses against it
+- percentile() is the nearest-rank percentile both scripts report
+"""
+
+import json
+import math
+import os
+import sys
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def add_report_arguments(parser):
+    parser.add_argument("--output", help="Write the JSON report here too")
+    parser.add_argument("--baseline", help="Report to compare against")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Write the report to --baseline"
+    )
+
+
+def finish(report, args, compare):
+    """Compare with --baseline, print and write the report; return the exit code.
+
+    ``compare(baseline)`` returns the list of regressions against a stored
+    report. They are added to the report as "regressions".
+    """
+    exit_code = 0
+    if args.baseline and not args.save_baseline:
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                regressions = compare(json.load(f))
+            report["regressions"] = regressions
+            for line in regressions:
+                print(f"[REGRESSION] {line}", file=sys.stderr)
+            exit_code = 1 if regressions else 0
+        else:
+            print(f"[WARN] Baseline {args.baseline} not found", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    for path in filter(None, [args.output, args.save_baseline and args.baseline]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text + "\n")
+        print(f"[INFO] Report written to {path}", file=sys.stderr)
+    return exit_code
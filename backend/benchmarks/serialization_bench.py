@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+serialization_bench.py: Compare response serialization paths.
+
+- "pydantic": what FastAPI does for response_model with orm_mode, i.e.
+  validate the ORM object with from_attributes, then dump JSON
+- "fast": serialization.serialize() + FastJSONResponse.render()
+- Payloads: a single UserOut and HomeTreeOut trees of increasing size
+
+Usage (from backend/):
+    python benchmarks/serialization_bench.py [--output results.json]
+"""
+
+import argparse
+import datetime
+import decimal
+import json
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+warnings.simplefilter("ignore")
+
+from pydantic import TypeAdapter  # noqa: E402
+
+import models  # noqa: E402
+import schemas  # noqa: E402
+import serialization  # noqa: E402
+
+
+def build_user():
+    return models.User(
+        id=1,
+        email="bench@example.com",
+        hashed_password="x",
+        full_name="Bench User",
+        is_active=True,
+        is_superuser=False,
+        role="user",
+    )
+
+
+def build_home(n_rooms, n_elements, n_purchases):
+    home = models.Home(
+        id=1,
+        name="Bench Home",
+        address="1 Main St",
+        owner_id=1,
+        version=1,
+        created_at=datetime.datetime(2024, 1, 1),
+    )
+    for r in range(n_rooms):
+        # Set every column, as rows loaded from the database would have
+        room = models.Room(
+            id=r, name=f"Room {r}", description="d" * 40, measurements={"area": 20}
+        )
+        for e in range(n_elements):
+            element = models.RoomElement(
+                id=e, name=f"Element {e}", description=None, measurements=None
+            )
+            for p in range(n_purchases):
+                element.purchases.append(
+                    models.PurchaseDetail(
+                        id=p,
+                        status="ordered",
+                        vendor="Acme",
+                        cost=decimal.Decimal("12.50"),
+                        link=None,
+                    )
+                )
+            room.elements.append(element)
+        home.rooms.append(room)
+    return home
+
+
+CASES = [
+    ("UserOut", schemas.UserOut, build_user),
+    ("HomeTree 10x10x2", schemas.HomeTreeOut, lambda: build_home(10, 10, 2)),
+    ("HomeTree 50x40x3", schemas.HomeTreeOut, lambda: build_home(50, 40, 3)),
+]
+
+
+def time_call(fn, min_time):
+    fn()
+    loops, elapsed = 0, 0.0
+    start = time.perf_counter()
+    while elapsed < min_time:
+        fn()
+        loops += 1
+        elapsed = time.perf_counter() - start
+    return elapsed / loops
+
+
+def run(min_time):
+    results = []
+    for name, schema, build in CASES:
+        obj = build()
+        adapter = TypeAdapter(schema)
+
+        def pydantic_path(adapter=adapter, obj=obj):
+            return adapter.dump_json(adapter.validate_python(obj, from_attributes=True))
+
+        def fast_path(schema=schema, obj=obj):
+            return serialization.FastJSONResponse(
+                serialization.serialize(schema, obj)
+            ).body
+
+        assert json.loads(pydantic_path()) == json.loads(fast_path())
+        slow = time_call(pydantic_path, min_time)
+        fast = time_call(fast_path, min_time)
+        results.append(
+            {
+                "case": name,
+                "pydantic_us": round(slow * 1e6, 2),
+                "fast_us": round(fast * 1e6, 2),
+                "speedup": round(slow / fast, 2),
+            }
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--min-time", type=float, default=0.5)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    results = run(args.min_time)
+    for row in results:
+        print(
+            f"{row['case']:<20} pydantic {row['pydantic_us']:>10.2f}us  "
+            f"fast {row['fast_us']:>10.2f}us  x{row['speedup']}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
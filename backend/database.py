@@ -4,6 +4,8 @@ from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 from dotenv import load_dotenv
 
+import timing
+
 load_dotenv()
 
 # Use TEST_DATABASE_URL if running under pytest, else use DATABASE_URL
@@ -14,6 +16,7 @@ else:
     db_url = os.getenv("DATABASE_URL")
 
 engine = create_engine(db_url)
+timing.instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -1,21 +1,178 @@
 #!/usr/bin/env python3
+"""
+entrypoint.py: Container entrypoint; optionally migrates before the server.
+
+- Checks that alembic.ini and migrations/ are present, then execs the command
+- With MIGRATE_ON_START=1 it first brings the database to head:
+  - one query reads alembic_version; if it already matches the script heads,
+    Alembic never runs (the common case for restarts and extra replicas)
+  - otherwise it takes a Postgres advisory lock, so exactly one replica
+    migrates while the others wait (up to MIGRATION_LOCK_TIMEOUT seconds),
+    re-checks the revision once it holds the lock and upgrades in-process
+  - waiting replicas poll pg_try_advisory_lock on an AUTOCOMMIT connection,
+    so they hold no transaction: CREATE INDEX CONCURRENTLY in the migrating
+    replica waits for every open transaction and would deadlock on theirs
+  - the lock is per session, so a replica that dies mid-migration releases
+    it and the next one retries; SQLite has no locks and migrates directly
+- Waits up to DB_CONNECT_TIMEOUT seconds (with backoff) for the database
+"""
+
 import os
 import sys
+import time
+
+APP_DIR = "/app"
+ALEMBIC_INI = os.path.join(APP_DIR, "alembic.ini")
+MIGRATIONS_DIR = os.path.join(APP_DIR, "migrations")
+# Any constant works as long as every replica uses the same one
+MIGRATION_LOCK_KEY = 0x616E616E74616D  # "anantam"
+MIGRATION_LOCK_POLL = 0.5  # Seconds between tries while another replica migrates
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def script_heads(alembic_ini=ALEMBIC_INI):
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config(alembic_ini)
+    config.set_main_option(
+        "script_location", os.path.join(os.path.dirname(alembic_ini), "migrations")
+    )
+    return config, set(ScriptDirectory.from_config(config).get_heads())
+
+
+def current_heads(connection):
+    """The revisions in alembic_version (empty if the table does not exist)."""
+    from sqlalchemy import exc, text
+
+    try:
+        rows = connection.execute(text("SELECT version_num FROM alembic_version"))
+        heads = {row[0] for row in rows}
+    except (exc.ProgrammingError, exc.OperationalError):
+        heads = set()
+    connection.rollback()
+    return heads
+
+
+def connect(engine, timeout):
+    from sqlalchemy import exc
+
+    deadline = time.monotonic() + timeout
+    delay = 0.25
+    while True:
+        try:
+            return engine.connect()
+        except exc.OperationalError as error:
+            if time.monotonic() + delay > deadline:
+                raise
+            log(f"[INFO] Database not ready ({error.orig}); retrying in {delay}s")
+            time.sleep(delay)
+            delay = min(delay * 2, 5)
 
 
-ALEMBIC_INI = "/app/alembic.ini"
-MIGRATIONS_DIR = "/app/migrations"
+def acquire_lock(lock_connection, timeout, poll=MIGRATION_LOCK_POLL):
+    """Poll for the migration lock; False if it is still taken after `timeout`."""
+    from sqlalchemy import text
 
-if not os.path.isfile(ALEMBIC_INI):
-    print(f"[FATAL] {ALEMBIC_INI} is missing!", file=sys.stderr)
-    sys.exit(1)
-if not os.path.isdir(MIGRATIONS_DIR):
-    print(f"[FATAL] {MIGRATIONS_DIR} directory is missing!", file=sys.stderr)
-    sys.exit(1)
+    deadline = time.monotonic() + timeout
+    while True:
+        if lock_connection.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY}
+        ).scalar():
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(poll, remaining))
 
-# Pass through to the actual command
-if len(sys.argv) > 1:
+
+def upgrade(config, connection):
+    from alembic import command
+
+    # Not inside a transaction: env.py commits per revision, which
+    # online_migrations' autocommit blocks rely on
+    config.attributes["connection"] = connection
+    command.upgrade(config, "head")
+
+
+def migrate(
+    url, alembic_ini=ALEMBIC_INI, lock_timeout=300, connect_timeout=30, log_sql=True
+):
+    """Bring the database at `url` to head; returns "at-head" or "migrated".
+
+    log_sql=False keeps the caller's logging setup (alembic.ini's is skipped).
+    """
+    from sqlalchemy import create_engine, pool, text
+
+    config, heads = script_heads(alembic_ini)
+    config.attributes["configure_logger"] = log_sql
+    engine = create_engine(url, poolclass=pool.NullPool)
+    try:
+        with connect(engine, connect_timeout) as connection:
+            current = current_heads(connection)
+            if current == heads:
+                log(f"[INFO] Database already at head ({', '.join(heads)})")
+                return "at-head"
+            if engine.dialect.name != "postgresql":
+                upgrade(config, connection)
+                return "migrated"
+
+            log(f"[INFO] Waiting for the migration lock (at {current or 'base'})")
+            # The lock is per session, so it outlives the commits on this
+            # AUTOCOMMIT connection; Alembic runs on `connection`
+            with connect(engine, connect_timeout).execution_options(
+                isolation_level="AUTOCOMMIT"
+            ) as lock_connection:
+                if not acquire_lock(lock_connection, lock_timeout):
+                    raise TimeoutError(
+                        f"migration lock still held after {lock_timeout:g}s"
+                    )
+                try:
+                    # Another replica may have migrated while this one waited
+                    if current_heads(connection) == heads:
+                        log("[INFO] Another replica migrated the database to head")
+                        return "at-head"
+                    upgrade(config, connection)
+                    log(f"[OK] Migrated database to head ({', '.join(heads)})")
+                    return "migrated"
+                finally:
+                    lock_connection.execute(
+                        text("SELECT pg_advisory_unlock(:key)"),
+                        {"key": MIGRATION_LOCK_KEY},
+                    )
+    finally:
+        engine.dispose()
+
+
+def main():
+    if not os.path.isfile(ALEMBIC_INI):
+        log(f"[FATAL] {ALEMBIC_INI} is missing!")
+        sys.exit(1)
+    if not os.path.isdir(MIGRATIONS_DIR):
+        log(f"[FATAL] {MIGRATIONS_DIR} directory is missing!")
+        sys.exit(1)
+    if len(sys.argv) < 2:
+        log("[FATAL] No command provided to entrypoint.")
+        sys.exit(1)
+
+    if os.getenv("MIGRATE_ON_START", "0") == "1":
+        sys.path.insert(0, APP_DIR)  # env.py imports database and models
+        try:
+            migrate(
+                os.environ["DATABASE_URL"],
+                lock_timeout=float(os.getenv("MIGRATION_LOCK_TIMEOUT", "300")),
+                connect_timeout=float(os.getenv("DB_CONNECT_TIMEOUT", "30")),
+            )
+        except Exception as exc:
+            log(f"[FATAL] Migration on start failed: {exc}")
+            sys.exit(1)
+
+    # Pass through to the actual command
     os.execvp(sys.argv[1], sys.argv[1:])
-else:
-    print("[FATAL] No command provided to entrypoint.", file=sys.stderr)
-    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
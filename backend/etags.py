@@ -0,0 +1,57 @@
+"""
+etags.py: Conditional requests on top of row version counters.
+
+- Versioned models carry a ``version`` column that SQLAlchemy bumps on every
+  UPDATE (``version_id_col``), so the ETag is known without serializing
+- GET handlers return 304 when If-None-Match matches the current ETag
+- PUT/PATCH handlers reject a stale If-Match with 412; a write that races
+  past the check is still caught by the versioned UPDATE and turned into 409
+"""
+
+from fastapi import HTTPException, Response
+from sqlalchemy.orm.exc import StaleDataError
+
+
+def resource_etag(kind, obj):
+    return f'"{kind}-{obj.id}-v{obj.version}"'
+
+
+def _etag_list(header):
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def not_modified(request, etag):
+    """Return a 304 response if If-None-Match matches ``etag``, else None."""
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return None
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    tags = [tag[2:] if tag.startswith("W/") else tag for tag in _etag_list(header)]
+    if "*" in tags or etag in tags:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+def require_match(request, etag):
+    """Raise 412 if an If-Match header is present and does not match ``etag``."""
+    header = request.headers.get("if-match")
+    if header is None:
+        return
+    tags = _etag_list(header)
+    if "*" not in tags and etag not in tags:
+        raise HTTPException(
+            status_code=412,
+            detail="Resource was modified by someone else",
+            headers={"ETag": etag},
+        )
+
+
+def commit_versioned(db):
+    """Commit, turning a lost optimistic-concurrency race into 409."""
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(
+            status_code=409, detail="Resource was modified by someone else"
+        )
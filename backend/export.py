@@ -0,0 +1,175 @@
+"""
+export.py: Streaming export of a whole home as a ZIP archive.
+
+- One NDJSON member per entity (home, rooms, elements, comments, purchases,
+  attachments) plus the attachment files themselves
+- Rows are read through server-side cursors and written straight into the
+  archive, so memory stays flat no matter how large the home is
+- iter_home_export() is a plain generator that can be handed to a
+  StreamingResponse
+"""
+
+import contextlib
+import json
+import os
+import zipfile
+
+from sqlalchemy import Connection, or_, select
+
+import models
+
+ATTACHMENTS_DIR = os.getenv("ATTACHMENTS_DIR", "/app/uploads")
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# Compressed bytes buffered before a chunk is handed to the response
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", str(64 * 1024)))
+FILE_READ_SIZE = 64 * 1024
+
+
+class _ZipSink:
+    """Write-only file object that collects zip output until it is drained.
+
+    It has no tell()/seek(), so zipfile switches to streaming mode and
+    writes data descriptors instead of seeking back to patch headers.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+
+def _ndjson_line(row):
+    return (json.dumps(dict(row._mapping), default=str) + "\n").encode("utf-8")
+
+
+def _export_queries(home_id):
+    homes = models.Home.__table__
+    rooms = models.Room.__table__
+    elements = models.RoomElement.__table__
+    comments = models.Comment.__table__
+    purchases = models.PurchaseDetail.__table__
+    attachments = models.Attachment.__table__
+
+    room_ids = select(rooms.c.id).where(rooms.c.home_id == home_id)
+    element_ids = select(elements.c.id).where(elements.c.room_id.in_(room_ids))
+    return [
+        ("home.ndjson", select(homes).where(homes.c.id == home_id)),
+        (
+            "rooms.ndjson",
+            select(rooms).where(rooms.c.home_id == home_id).order_by(rooms.c.id),
+        ),
+        (
+            "elements.ndjson",
+            select(elements)
+            .where(elements.c.room_id.in_(room_ids))
+            .order_by(elements.c.id),
+        ),
+        (
+            "comments.ndjson",
+            select(comments)
+            .where(
+                or_(
+                    comments.c.room_id.in_(room_ids),
+                    comments.c.element_id.in_(element_ids),
+                )
+            )
+            .order_by(comments.c.id),
+        ),
+        (
+            "purchases.ndjson",
+            select(purchases)
+            .where(purchases.c.element_id.in_(element_ids))
+            .order_by(purchases.c.id),
+        ),
+        (
+            "attachments.ndjson",
+            select(attachments)
+            .where(attachments.c.home_id == home_id)
+            .order_by(attachments.c.id),
+        ),
+    ]
+
+
+def _attachment_source(file_path, base_dir):
+    """Returns (path, None) for a file under base_dir, else (None, problem).
+
+    Paths are resolved (``..``, symlinks) first: a stored path must not be
+    able to pull other server files, such as /app/.env, into an export.
+    """
+    base = os.path.realpath(base_dir)
+    path = os.path.realpath(os.path.join(base, file_path))
+    if os.path.commonpath([base, path]) != base:
+        return None, "is outside the attachments directory"
+    if not os.path.isfile(path):
+        return None, "missing on disk"
+    return path, None
+
+
+def iter_home_export(bind, home_id, chunk_size=EXPORT_CHUNK_SIZE, attachments_dir=None):
+    """Yield a ZIP archive of the given home in chunks of about chunk_size bytes.
+
+    Uses its own connection from ``bind`` when it is an Engine, because the
+    response body is produced after the request's session has been closed.
+    A Connection (the tests bind sessions to one) is used as it is.
+    """
+    attachments_dir = attachments_dir or ATTACHMENTS_DIR
+    sink = _ZipSink()
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED)
+    if isinstance(bind, Connection):
+        connection = contextlib.nullcontext(bind)
+    else:
+        connection = bind.connect()
+    with connection as conn:
+        conn = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+        for member, query in _export_queries(home_id):
+            with archive.open(member, mode="w", force_zip64=True) as fh:
+                for row in conn.execute(query):
+                    fh.write(_ndjson_line(row))
+                    if sink.size >= chunk_size:
+                        yield sink.drain()
+
+        attachments = models.Attachment.__table__
+        files = conn.execute(
+            select(attachments.c.id, attachments.c.file_path, attachments.c.filename)
+            .where(attachments.c.home_id == home_id)
+            .order_by(attachments.c.id)
+        )
+        for attachment_id, file_path, filename in files:
+            source, problem = _attachment_source(file_path, attachments_dir)
+            if problem:
+                print(
+                    f"[EXPORT WARN] Attachment {attachment_id} {problem}: "
+                    f"{file_path}",
+                    flush=True,
+                )
+                continue
+            member = f"attachments/{attachment_id}/{os.path.basename(filename)}"
+            with open(source, "rb") as src, archive.open(
+                member, mode="w", force_zip64=True
+            ) as fh:
+                while True:
+                    block = src.read(FILE_READ_SIZE)
+                    if not block:
+                        break
+                    fh.write(block)
+                    if sink.size >= chunk_size:
+                        yield sink.drain()
+    # Closing the archive writes the central directory
+    archive.close()
+    tail = sink.drain()
+    if tail:
+        yield tail
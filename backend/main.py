@@ -1,16 +1,71 @@
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
+import asyncio
+import hmac
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, Depends, HTTPException, Request, WebSocket
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, selectinload
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 import models
 import schemas
 import auth
 import database
+import etags
+import export
+import memory
+import metrics
+import notifications
+import profiler
+import realtime
+import serialization
+import summarization
+import timing
 from sqlalchemy.exc import IntegrityError
 
-app = FastAPI()
 session_local = database.SessionLocal
 engine = database.engine
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+notification_sender = notifications.NotificationSender()
+summary_service = summarization.SummaryService()
+realtime_hub = realtime.Hub()
+metrics_writer = metrics.SnapshotWriter()
+rolling_profiler = profiler.RollingProfiler()
+metrics.registry.register_gauges(lambda: metrics.pool_gauges(engine))
+metrics.registry.register_gauges(
+    lambda: {"bcrypt_queue_depth": auth.bcrypt_queue_depth()}
+)
+realtime_listener = None
+if engine.dialect.name == "postgresql":
+    realtime_listener = realtime.NotifyListener(
+        realtime_hub,
+        engine.url.set(drivername="postgresql").render_as_string(hide_password=False),
+    )
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await metrics_writer.start()
+    if os.getenv("PROFILE_CONTINUOUS") == "1":
+        rolling_profiler.start()
+    if notifications.SMTP_HOST:
+        notification_sender.start()
+    if realtime_listener is not None:
+        await realtime_listener.start()
+    yield
+    if realtime_listener is not None:
+        await realtime_listener.stop()
+    await notification_sender.stop()
+    await metrics_writer.stop()
+    rolling_profiler.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(timing.ServerTimingMiddleware)
+app.add_middleware(memory.AllocationSamplingMiddleware)
 
 
 def get_db():
@@ -31,6 +86,29 @@ def root():
     return {"message": "Backend is running!"}
 
 
+async def require_metrics_token(request: Request):
+    if not metrics.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = request.headers.get("authorization", "").encode()
+    expected = f"Bearer {metrics.METRICS_TOKEN}".encode()
+    if not hmac.compare_digest(supplied, expected):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+metrics_token_dependency = Depends(require_metrics_token)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(authorized: None = metrics_token_dependency):
+    # On the event loop, like the middleware, so no locking is needed
+    body = metrics.render(metrics.collect())
+    return PlainTextResponse(body, media_type=metrics.CONTENT_TYPE)
+
+
 @app.post("/auth/register", response_model=schemas.UserOut)
 def register(user: schemas.UserCreate, db: Session = db_dependency):
     print("[REGISTER ENTRY] Entered register endpoint", flush=True)
@@ -59,7 +137,7 @@ def register(user: schemas.UserCreate, db: Session = db_dependency):
         db.add(db_user)
         db.commit()
         db.refresh(db_user)
-        return db_user
+        return serialization.trusted_response(schemas.UserOut, db_user)
     except IntegrityError:
         db.rollback()
         raise HTTPException(status_code=400, detail="Email already registered")
@@ -86,13 +164,15 @@ def login(
     user = db.query(models.User).filter(models.User.email == form_data.username).first()
     if not user or not auth.verify_password(form_data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Incorrect email or password")
+    # Upgrade hashes below the active cost (e.g. seeded with the test profile)
+    if auth.password_needs_rehash(user.hashed_password):
+        user.hashed_password = auth.get_password_hash(form_data.password)
+        db.commit()
     access_token = auth.create_access_token({"sub": str(user.id), "role": user.role})
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-def get_current_user(
-    token: str = oauth2_scheme_dependency, db: Session = db_dependency
-):
+def user_from_token(db, token):
     payload = auth.decode_access_token(token)
     if not payload:
         raise HTTPException(
@@ -104,9 +184,389 @@ def get_current_user(
     return user
 
 
+def get_current_user(
+    token: str = oauth2_scheme_dependency, db: Session = db_dependency
+):
+    return user_from_token(db, token)
+
+
 current_user_dependency = Depends(get_current_user)
 
 
-@app.get("/users/me", response_model=schemas.UserOut)
-def read_users_me(current_user: models.User = current_user_dependency):
+def get_current_admin(current_user: models.User = current_user_dependency):
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Admin privileges required")
     return current_user
+
+
+admin_dependency = Depends(get_current_admin)
+
+
+@app.get("/users/me", response_model=schemas.UserOut)
+def read_users_me(
+    request: Request,
+    current_user: models.User = current_user_dependency,
+):
+    etag = etags.resource_etag("user", current_user)
+    cached = etags.not_modified(request, etag)
+    if cached:
+        return cached
+    return serialization.trusted_response(
+        schemas.UserOut, current_user, headers={"ETag": etag}
+    )
+
+
+@app.patch("/users/me", response_model=schemas.UserOut)
+def update_users_me(
+    update: schemas.UserUpdate,
+    request: Request,
+    current_user: models.User = current_user_dependency,
+    db: Session = db_dependency,
+):
+    etags.require_match(request, etags.resource_etag("user", current_user))
+    for field, value in update.model_dump(exclude_unset=True).items():
+        setattr(current_user, field, value)
+    etags.commit_versioned(db)
+    db.refresh(current_user)
+    return serialization.trusted_response(
+        schemas.UserOut,
+        current_user,
+        headers={"ETag": etags.resource_etag("user", current_user)},
+    )
+
+
+def get_owned_home(db, home_id, user, options=()):
+    query = db.query(models.Home).options(*options)
+    home = query.filter(models.Home.id == home_id).first()
+    if not home:
+        raise HTTPException(status_code=404, detail="Home not found")
+    if home.owner_id != user.id and not user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not allowed to access this home")
+    return home
+
+
+@app.post("/homes/", response_model=schemas.HomeOut, status_code=201)
+def create_home(
+    home: schemas.HomeCreate,
+    current_user: models.User = current_user_dependency,
+    db: Session = db_dependency,
+):
+    db_home = models.Home(
+        name=home.name, address=home.address, owner_id=current_user.id
+    )
+    db.add(db_home)
+    db.commit()
+    db.refresh(db_home)
+    return serialization.trusted_response(
+        schemas.HomeOut,
+        db_home,
+        status_code=201,
+        headers={"ETag": etags.resource_etag("home", db_home)},
+    )
+
+
+@app.get("/homes/", response_model=List[schemas.HomeOut])
+def list_homes(
+    current_user: models.User = current_user_dependency,
+    db: Session = db_dependency,
+):
+    homes = (
+        db.query(models.Home)
+        .filter(models.Home.owner_id == current_user.id)
+        .order_by(models.Home.id)
+        .all()
+    )
+    return serialization.trusted_response(schemas.HomeOut, homes, many=True)
+
+
+@app.get("/homes/{home_id}", response_model=schemas.HomeOut)
+def read_home(
+    home_id: int,
+    request: Request,
+    current_user: models.User = current_user_dependency,
+    db: Session = db_dependency,
+):
+    home = get_owned_home(db, home_id, current_user)
+    etag = etags.resource_etag("home", home)
+    cached = etags.not_modified(request, etag)
+    if cached:
+        return cached
+    return serialization.trusted_response(schemas.HomeOut, home, headers={"ETag": etag})
+
+
+@app.get("/homes/{home_id}/tree", response_model=schemas.HomeTreeOut)
+def read_home_tree(
+    home_id: int,
+    current_user: models.User = current_user_dependency,
+    db: Session = db_dependency,
+):
+    home = get_owned_home(
+        db,
+        home_id,
+        current_user,
+        options=[
+            selectinload(models.Home.rooms)
+            .selectinload(models.Room.elements)
+            .selectinload(models.RoomElement.purchases)
+        ],
+    )
+    return serialization.trusted_response(schemas.HomeTreeOut, home)
+
+
+@app.patch("/homes/{home_id}", response_model=schemas.HomeOut)
+def update_home(
+    home_id: int,
+    update: schemas.HomeUpdate,
+    request: Request,
+    current_user: models.User = current_user_dependency,
+    db: Session = db_dependency,
+):
+    home = get_owned_home(db, home_id, current_user)
+    etags.require_match(request, etags.resource_etag("home", home))
+    for field, value in update.model_dump(exclude_unset=True).items():
+        setattr(home, field, value)
+    etags.commit_versioned(db)
+    db.refresh(home)
+    return serialization.trusted_response(
+        schemas.HomeOut, home, headers={"ETag": etags.resource_etag("home", home)}
+    )
+
+
+@app.get("/export/")
+def export_home(
+    home_id: int,
+    current_user: models.User = current_user_dependency,
+    db: Session = db_dependency,
+):
+    get_owned_home(db, home_id, current_user)
+    return StreamingResponse(
+        export.iter_home_export(db.get_bind(), home_id),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="home-{home_id}-export.zip"'
+        },
+    )
+
+
+def comment_thread_home_id(db, room_id=None, element_id=None):
+    """The home a room's or element's comment thread belongs to."""
+    if element_id is not None:
+        home_id = (
+            db.query(models.Room.home_id)
+            .join(models.RoomElement, models.RoomElement.room_id == models.Room.id)
+            .filter(models.RoomElement.id == element_id)
+            .scalar()
+        )
+        detail = "Element not found"
+    else:
+        home_id = (
+            db.query(models.Room.home_id).filter(models.Room.id == room_id).scalar()
+        )
+        detail = "Room not found"
+    if home_id is None:
+        raise HTTPException(status_code=404, detail=detail)
+    return home_id
+
+
+def load_comment_thread(db, user, room_id=None, element_id=None):
+    """(id, content) of the thread's comments, oldest first."""
+    get_owned_home(db, comment_thread_home_id(db, room_id, element_id), user)
+    query = db.query(models.Comment.id, models.Comment.content)
+    if element_id is not None:
+        query = query.filter(models.Comment.element_id == element_id)
+    else:
+        query = query.filter(
+            models.Comment.room_id == room_id, models.Comment.element_id.is_(None)
+        )
+    return query.order_by(models.Comment.id).all()
+
+
+def save_comment_summary(db, comment_ids, summary):
+    """Copy a thread's summary onto the comments it was made from."""
+    db.query(models.Comment).filter(
+        models.Comment.id.in_(comment_ids),
+        models.Comment.ai_summary.is_distinct_from(summary),
+    ).update({models.Comment.ai_summary: summary}, synchronize_session=False)
+    db.commit()
+
+
+@app.post("/ai/summarize", response_model=schemas.SummaryOut)
+async def summarize_comments(
+    request: schemas.SummarizeRequest,
+    current_user: models.User = current_user_dependency,
+    db: Session = db_dependency,
+):
+    if (request.room_id is None) == (request.element_id is None):
+        raise HTTPException(
+            status_code=422, detail="Provide exactly one of room_id or element_id"
+        )
+    thread = await run_in_threadpool(
+        load_comment_thread, db, current_user, request.room_id, request.element_id
+    )
+    if not thread:
+        raise HTTPException(status_code=404, detail="No comments to summarize")
+    comments = [content for _, content in thread]
+    with timing.span("summarize"):
+        key, summary = await summary_service.summarize(comments, db=db)
+    await run_in_threadpool(
+        save_comment_summary, db, [comment_id for comment_id, _ in thread], summary
+    )
+    return {
+        "room_id": request.room_id,
+        "element_id": request.element_id,
+        "comment_count": len(comments),
+        "thread_hash": key,
+        "summary": summary,
+    }
+
+
+def authorize_home_stream(db, token, home_id, room_id=None):
+    # Browsers cannot set headers on WebSocket/EventSource, so the token
+    # arrives as a query parameter. The session is closed right away so a
+    # long-lived stream does not pin a pooled connection.
+    try:
+        user = user_from_token(db, token)
+        get_owned_home(db, home_id, user)
+        if room_id is not None:
+            room = db.query(models.Room).filter(models.Room.id == room_id).first()
+            if not room or room.home_id != home_id:
+                raise HTTPException(status_code=404, detail="Room not found")
+        return realtime.topics_for(home_id, room_id)
+    finally:
+        db.close()
+
+
+@app.websocket("/ws/homes/{home_id}")
+async def home_updates_ws(
+    websocket: WebSocket,
+    home_id: int,
+    token: str,
+    room_id: Optional[int] = None,
+    db: Session = db_dependency,
+):
+    try:
+        topics = await run_in_threadpool(
+            authorize_home_stream, db, token, home_id, room_id
+        )
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    subscriber = realtime_hub.subscribe(topics)
+    try:
+        await realtime.pump_websocket(websocket, subscriber)
+    finally:
+        realtime_hub.unsubscribe(subscriber)
+
+
+@app.get("/events/homes/{home_id}")
+async def home_updates_sse(
+    home_id: int,
+    token: str,
+    room_id: Optional[int] = None,
+    db: Session = db_dependency,
+):
+    topics = await run_in_threadpool(authorize_home_stream, db, token, home_id, room_id)
+    return StreamingResponse(
+        realtime.sse_stream(realtime_hub, topics),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def profile_response(stacks, fmt, interval=None):
+    if fmt == "speedscope":
+        return profiler.speedscope(stacks, interval=interval)
+    return PlainTextResponse(profiler.collapsed(stacks))
+
+
+@app.get("/admin/profile", include_in_schema=False)
+async def admin_profile(
+    seconds: float = 10,
+    interval_ms: float = 5,
+    format: str = "collapsed",
+    idle: bool = False,
+    admin: models.User = admin_dependency,
+):
+    if not 0 < seconds <= 60 or interval_ms < 1:
+        raise HTTPException(
+            status_code=422, detail="Use 0 < seconds <= 60 and interval_ms >= 1"
+        )
+    if format not in ("collapsed", "speedscope"):
+        raise HTTPException(status_code=422, detail="Unknown format")
+    # Sample from a thread while this coroutine sleeps, leaving the event
+    # loop free to serve (and be sampled serving) real traffic
+    sampler = profiler.Sampler(interval_ms / 1000, include_idle=idle).start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        sampler.stop()
+    return profile_response(sampler.take(), format, interval_ms / 1000)
+
+
+@app.post("/admin/profile/continuous", include_in_schema=False)
+def admin_profile_continuous(enabled: bool, admin: models.User = admin_dependency):
+    """Start or stop rolling sampling in the worker serving this request."""
+    if enabled:
+        rolling_profiler.start()
+    else:
+        rolling_profiler.stop()
+    return {"pid": os.getpid(), "running": rolling_profiler.running}
+
+
+@app.get("/admin/profile/continuous", include_in_schema=False)
+def admin_profile_history(
+    minutes: float = 10,
+    format: str = "collapsed",
+    admin: models.User = admin_dependency,
+):
+    """Merged rolling profiles of every worker for the last ``minutes``."""
+    if format not in ("collapsed", "speedscope"):
+        raise HTTPException(status_code=422, detail="Unknown format")
+    stacks = rolling_profiler.load(since=time.time() - minutes * 60)
+    return profile_response(stacks, format, rolling_profiler.sampler.interval)
+
+
+def memory_status():
+    return {
+        "pid": os.getpid(),
+        "rss_bytes": metrics.process_rss_bytes(),
+        **memory.status(),
+    }
+
+
+@app.post("/admin/memory/start", include_in_schema=False)
+async def admin_memory_start(frames: int = 1, admin: models.User = admin_dependency):
+    """Start tracemalloc in the worker serving this request."""
+    if not 1 <= frames <= 64:
+        raise HTTPException(status_code=422, detail="Use 1 <= frames <= 64")
+    memory.start(frames)
+    return memory_status()
+
+
+@app.post("/admin/memory/stop", include_in_schema=False)
+async def admin_memory_stop(admin: models.User = admin_dependency):
+    memory.stop()
+    return memory_status()
+
+
+@app.get("/admin/memory/snapshot", include_in_schema=False)
+async def admin_memory_snapshot(
+    group_by: str = "lineno",
+    limit: int = 25,
+    reset: bool = False,
+    admin: models.User = admin_dependency,
+):
+    """Allocation growth since tracing started (or since the last reset)."""
+    if group_by not in ("lineno", "filename"):
+        raise HTTPException(status_code=422, detail="group_by: lineno or filename")
+    if not memory.is_tracing():
+        raise HTTPException(status_code=409, detail="tracemalloc is not running")
+    # Snapshots of a busy process take a while; keep the event loop free
+    top = await run_in_threadpool(memory.diff, group_by, limit, reset)
+    return {**memory_status(), "top": top}
+
+
+@app.get("/admin/memory/routes", include_in_schema=False)
+async def admin_memory_routes(admin: models.User = admin_dependency):
+    return {**memory_status(), "routes": memory.route_report()}
@@ -0,0 +1,127 @@
+"""
+memory.py: Allocation tracking for live workers (tracemalloc).
+
+- start()/stop() toggle tracemalloc in the current worker and take a
+  baseline snapshot; tracing costs CPU and memory, so it is off by default
+- diff() compares a fresh snapshot with the baseline, grouped by
+  ``lineno`` (file:line) or ``filename``, largest growth first
+- AllocationSamplingMiddleware: while tracing, a sample of requests
+  (MEMORY_SAMPLE_RATE) records the traced-memory peak above the level at
+  request start, per route. reset_peak() is process-wide, so a concurrent
+  request's allocations count too; treat the numbers as upper bounds
+"""
+
+import os
+import random
+import tracemalloc
+
+MEMORY_SAMPLE_RATE = float(os.getenv("MEMORY_SAMPLE_RATE", "0.1"))
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+_baseline = None
+route_peaks = {}  # (method, route) -> [samples, max bytes, total bytes]
+
+
+def is_tracing():
+    return tracemalloc.is_tracing()
+
+
+def start(frames=1):
+    global _baseline
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    route_peaks.clear()
+    _baseline = _snapshot()
+
+
+def stop():
+    global _baseline
+    tracemalloc.stop()
+    _baseline = None
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces(_IGNORED)
+
+
+def status():
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracing": tracemalloc.is_tracing(),
+        "frames": tracemalloc.get_traceback_limit(),
+        "traced_bytes": current,
+        "traced_peak_bytes": peak,
+        "overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+    }
+
+
+def diff(group_by="lineno", limit=25, reset=False):
+    """Top allocation growth since the baseline (or the last reset)."""
+    global _baseline
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not running")
+    snapshot = _snapshot()
+    stats = snapshot.compare_to(_baseline, group_by)
+    if reset:
+        _baseline = snapshot
+    return [
+        {
+            "location": str(stat.traceback[0]) if stat.traceback else "?",
+            "size_diff": stat.size_diff,
+            "size": stat.size,
+            "count_diff": stat.count_diff,
+            "count": stat.count,
+        }
+        for stat in stats[:limit]
+    ]
+
+
+def route_report():
+    rows = [
+        {
+            "method": method,
+            "route": route,
+            "samples": samples,
+            "max_peak_bytes": max_peak,
+            "mean_peak_bytes": total // samples,
+        }
+        for (method, route), (samples, max_peak, total) in route_peaks.items()
+    ]
+    return sorted(rows, key=lambda row: row["max_peak_bytes"], reverse=True)
+
+
+class AllocationSamplingMiddleware:
+    """Pure ASGI middleware; free when tracemalloc is off."""
+
+    def __init__(self, app, sample_rate=None):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        rate = MEMORY_SAMPLE_RATE if self.sample_rate is None else self.sample_rate
+        if (
+            scope["type"] != "http"
+            or not tracemalloc.is_tracing()
+            or random.random() >= rate
+        ):
+            await self.app(scope, receive, send)
+            return
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if tracemalloc.is_tracing():
+                _, peak = tracemalloc.get_traced_memory()
+                route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+                key = (scope["method"], route)
+                row = route_peaks.setdefault(key, [0, 0, 0])
+                growth = max(0, peak - before)
+                row[0] += 1
+                row[1] = max(row[1], growth)
+                row[2] += growth
@@ -0,0 +1,366 @@
+"""
+metrics.py: Prometheus text-format metrics.
+
+- MetricsMiddleware records request counts, latency histograms and
+  in-flight requests into plain dicts. It only runs on the event loop
+  thread, so recording needs no locks
+- Gauges (bcrypt queue, DB pool, RSS, ...) are sampled from registered
+  callables when a snapshot is taken, never on the request path
+- Multi-worker: with METRICS_DIR set, each worker periodically writes its
+  snapshot to ``<pid>.json`` (write + rename, so readers never see a partial
+  file). /metrics merges every worker's file with the live registry of the
+  worker that serves the scrape. Counters of exited workers are folded into
+  ``archive.json`` by the master (see server.py) so totals never go down;
+  gauges are only reported for live workers
+- /metrics needs ``Authorization: Bearer <METRICS_TOKEN>``; without a
+  configured token it is disabled
+- Workers are identified by (pid, start time), so a new worker that gets a
+  reused pid is not mistaken for an archived one
+"""
+
+import asyncio
+import bisect
+import json
+import os
+import time
+
+METRICS_DIR = os.getenv("METRICS_DIR")
+# Bearer token scrapers must send; /metrics answers 404 while it is unset
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ARCHIVE = "archive.json"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# name -> (type, help)
+GAUGES = {
+    "http_requests_in_progress": ("gauge", "Requests being served."),
+    "bcrypt_queue_depth": ("gauge", "Password hashes waiting for a bcrypt thread."),
+    "db_pool_size": ("gauge", "Configured DB pool size."),
+    "db_pool_checked_out": ("gauge", "DB connections in use."),
+    "db_pool_checked_in": ("gauge", "Idle DB connections in the pool."),
+    "db_pool_overflow": ("gauge", "DB connections opened beyond the pool size."),
+    "process_resident_memory_bytes": ("gauge", "Resident memory size in bytes."),
+}
+
+
+class Registry:
+    """Per-process metric state. Mutate only from the event loop thread."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.requests = {}  # (method, route, status) -> count
+        self.latency = {}  # (method, route) -> [bucket counts..., +Inf, sum]
+        self.in_flight = {}  # method -> count
+        self.gauge_sources = []
+
+    def register_gauges(self, source):
+        """``source()`` returns {gauge name: value}; called at snapshot time."""
+        self.gauge_sources.append(source)
+
+    def observe(self, method, route, status, seconds):
+        key = (method, route, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        series = self.latency.get((method, route))
+        if series is None:
+            series = self.latency[(method, route)] = [0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, seconds)] += 1
+        series[-1] += seconds
+
+    def gauges(self):
+        values = {
+            "http_requests_in_progress": sum(self.in_flight.values()),
+            "process_resident_memory_bytes": process_rss_bytes(),
+        }
+        for source in self.gauge_sources:
+            try:
+                values.update(source())
+            except Exception as exc:  # a broken source must not break scrapes
+                print(f"[METRICS WARN] Gauge source failed: {exc}", flush=True)
+        return {k: v for k, v in values.items() if v is not None}
+
+    def snapshot(self):
+        return {
+            "pid": os.getpid(),
+            "started": process_start_time(),
+            "requests": [[*k, v] for k, v in self.requests.items()],
+            "latency": [[*k, *v] for k, v in self.latency.items()],
+            "gauges": self.gauges(),
+        }
+
+
+registry = Registry()
+_start_times = {}
+
+
+def process_start_time():
+    """When this process first took a snapshot; tells apart reused pids.
+
+    Keyed by pid because the registry is created before workers fork.
+    """
+    pid = os.getpid()
+    if pid not in _start_times:
+        _start_times[pid] = time.time()
+    return _start_times[pid]
+
+
+def _worker_key(snapshot):
+    return [snapshot["pid"], snapshot.get("started")]
+
+
+def process_rss_bytes(pid="self"):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def pool_gauges(engine):
+    pool = engine.pool
+    values = {}
+    for name, attr in (
+        ("db_pool_size", "size"),
+        ("db_pool_checked_out", "checkedout"),
+        ("db_pool_checked_in", "checkedin"),
+        ("db_pool_overflow", "overflow"),
+    ):
+        method = getattr(pool, attr, None)
+        if callable(method):
+            values[name] = method()
+    return values
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware; streaming bodies are timed until the last chunk."""
+
+    def __init__(self, app, registry=registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        in_flight = self.registry.in_flight
+        in_flight[method] = in_flight.get(method, 0) + 1
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight[method] -= 1
+            route = scope.get("route")
+            # Route templates keep label cardinality bounded
+            path = getattr(route, "path", None) or "<unmatched>"
+            self.registry.observe(
+                method, path, str(status), time.perf_counter() - start
+            )
+
+
+# --- Multi-process snapshots -------------------------------------------------
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def write_snapshot(reg=registry, directory=None):
+    directory = directory or METRICS_DIR
+    if directory:
+        _write_json(os.path.join(directory, f"{os.getpid()}.json"), reg.snapshot())
+
+
+def clear_directory(directory=None):
+    """Drop data of a previous server run (called by the master on start)."""
+    directory = directory or METRICS_DIR
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(".json") or name.endswith(".tmp"):
+            os.unlink(os.path.join(directory, name))
+
+
+def _merge_counters(target, snapshot):
+    for *key, value in snapshot.get("requests", ()):
+        key = tuple(key)
+        target["requests"][key] = target["requests"].get(key, 0) + value
+    for row in snapshot.get("latency", ()):
+        key, values = tuple(row[:2]), row[2:]
+        series = target["latency"].get(key)
+        if series is None:
+            target["latency"][key] = list(values)
+        else:
+            for i, value in enumerate(values):
+                series[i] += value
+
+
+def archive_worker(pid, directory=None):
+    """Fold an exited worker's counters into the archive (master only)."""
+    directory = directory or METRICS_DIR
+    if not directory:
+        return
+    path = os.path.join(directory, f"{pid}.json")
+    snapshot = _read_json(path)
+    if snapshot is None:
+        return
+    archive_path = os.path.join(directory, ARCHIVE)
+    archive = _read_json(archive_path) or {"merged": [], "requests": [], "latency": []}
+    merged = {"requests": {}, "latency": {}}
+    _merge_counters(merged, archive)
+    _merge_counters(merged, snapshot)
+    # Readers skip snapshots listed in "merged", so the worker is counted
+    # exactly once whether they see its file, the archive, or both. Older
+    # entries are dropped once no file can match them: the file is gone, or
+    # it is this pid's file, which is unlinked below
+    keep = [
+        key
+        for key in archive["merged"]
+        if key[0] != pid and os.path.exists(os.path.join(directory, f"{key[0]}.json"))
+    ]
+    _write_json(
+        archive_path,
+        {
+            "merged": keep + [_worker_key(snapshot)],
+            "requests": [[*k, v] for k, v in merged["requests"].items()],
+            "latency": [[*k, *v] for k, v in merged["latency"].items()],
+        },
+    )
+    os.unlink(path)
+
+
+def collect(reg=registry, directory=None):
+    """Merged counters plus per-pid gauges across all workers."""
+    directory = directory or METRICS_DIR
+    own = reg.snapshot()
+    snapshots = [own]
+    archive = None
+    if directory and os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if not name.endswith(".json") or name == ARCHIVE:
+                continue
+            snapshot = _read_json(os.path.join(directory, name))
+            if snapshot is not None and snapshot.get("pid") != own["pid"]:
+                snapshots.append(snapshot)
+        # Read the archive after the pid files (see archive_worker)
+        archive = _read_json(os.path.join(directory, ARCHIVE))
+    merged = {"requests": {}, "latency": {}, "gauges": {}}
+    skip = {tuple(key) for key in archive["merged"]} if archive else set()
+    if archive:
+        _merge_counters(merged, archive)
+    for snapshot in snapshots:
+        if tuple(_worker_key(snapshot)) in skip:
+            continue
+        _merge_counters(merged, snapshot)
+        if snapshot is own or _pid_alive(snapshot["pid"]):
+            merged["gauges"][snapshot["pid"]] = snapshot.get("gauges", {})
+    return merged
+
+
+# --- Exposition --------------------------------------------------------------
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def render(merged, buckets=BUCKETS):
+    lines = [
+        "# HELP http_requests_total Requests handled, by route template.",
+        "# TYPE http_requests_total counter",
+    ]
+    for (method, route, status), value in sorted(merged["requests"].items()):
+        labels = _labels(method=method, route=route, status=status)
+        lines.append(f"http_requests_total{labels} {value}")
+
+    lines.append("# HELP http_request_duration_seconds Request latency.")
+    lines.append("# TYPE http_request_duration_seconds histogram")
+    for (method, route), series in sorted(merged["latency"].items()):
+        cumulative = 0
+        for bound, count in zip((*buckets, "+Inf"), series[:-1]):
+            cumulative += count
+            labels = _labels(method=method, route=route, le=bound)
+            lines.append(f"http_request_duration_seconds_bucket{labels} {cumulative}")
+        labels = _labels(method=method, route=route)
+        lines.append(f"http_request_duration_seconds_sum{labels} {series[-1]}")
+        lines.append(f"http_request_duration_seconds_count{labels} {cumulative}")
+
+    for name, (kind, help_text) in GAUGES.items():
+        rows = [
+            (pid, gauges[name])
+            for pid, gauges in sorted(merged["gauges"].items())
+            if name in gauges
+        ]
+        if not rows:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for pid, value in rows:
+            lines.append(f"{name}{_labels(pid=pid)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class SnapshotWriter:
+    """Background task writing this worker's snapshot every FLUSH_SECONDS."""
+
+    def __init__(self, reg=registry, directory=None, interval=FLUSH_SECONDS):
+        self.registry = reg
+        self.directory = directory or METRICS_DIR
+        self.interval = interval
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            write_snapshot(self.registry, self.directory)
+
+    async def start(self):
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Final flush so the master can archive everything this worker counted
+        write_snapshot(self.registry, self.directory)
@@ -16,8 +16,10 @@ from models import *  # noqa
 config = context.config
 
 # Interpret the config file for Python logging.
-# This line sets up loggers basically.
-fileConfig(config.config_file_name)
+# This line sets up loggers basically. In-process callers (see
+# tests/migration_harness.py) keep their own logging setup.
+if config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
 
 target_metadata = Base.metadata
 
@@ -32,6 +34,21 @@ def run_migrations_offline():
 
 
 def run_migrations_online():
+    # One transaction per revision, so online_migrations' autocommit blocks
+    # (CREATE INDEX CONCURRENTLY, batched backfills) can commit around it.
+    # In-process callers may hand over an open connection, not in a transaction
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            compare_type=True,
+            transaction_per_migration=True,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section),
         prefix="sqlalchemy.",
@@ -40,7 +57,10 @@ def run_migrations_online():
     )
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata, compare_type=True
+            connection=connection,
+            target_metadata=target_metadata,
+            compare_type=True,
+            transaction_per_migration=True,
         )
         with context.begin_transaction():
             context.run_migrations()
@@ -0,0 +1,144 @@
+"""
+Revision ID: 0002_create_home_entities
+Revises: 0001_create_users
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_create_home_entities"
+down_revision = "0001_create_users"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "homes",
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("name", sa.String, nullable=False),
+        sa.Column("address", sa.String, nullable=True),
+        sa.Column(
+            "owner_id",
+            sa.Integer,
+            sa.ForeignKey("users.id"),
+            index=True,
+            nullable=False,
+        ),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+    )
+    op.create_table(
+        "rooms",
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column(
+            "home_id",
+            sa.Integer,
+            sa.ForeignKey("homes.id", ondelete="CASCADE"),
+            index=True,
+            nullable=False,
+        ),
+        sa.Column("name", sa.String, nullable=False),
+        sa.Column("description", sa.Text, nullable=True),
+        sa.Column("measurements", sa.JSON, nullable=True),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+    )
+    op.create_table(
+        "room_elements",
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column(
+            "room_id",
+            sa.Integer,
+            sa.ForeignKey("rooms.id", ondelete="CASCADE"),
+            index=True,
+            nullable=False,
+        ),
+        sa.Column("name", sa.String, nullable=False),
+        sa.Column("description", sa.Text, nullable=True),
+        sa.Column("measurements", sa.JSON, nullable=True),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+    )
+    op.create_table(
+        "comments",
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column(
+            "user_id",
+            sa.Integer,
+            sa.ForeignKey("users.id"),
+            index=True,
+            nullable=False,
+        ),
+        sa.Column(
+            "room_id",
+            sa.Integer,
+            sa.ForeignKey("rooms.id", ondelete="CASCADE"),
+            index=True,
+            nullable=True,
+        ),
+        sa.Column(
+            "element_id",
+            sa.Integer,
+            sa.ForeignKey("room_elements.id", ondelete="CASCADE"),
+            index=True,
+            nullable=True,
+        ),
+        sa.Column("content", sa.Text, nullable=False),
+        sa.Column("ai_summary", sa.Text, nullable=True),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+    )
+    op.create_table(
+        "purchase_details",
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column(
+            "element_id",
+            sa.Integer,
+            sa.ForeignKey("room_elements.id", ondelete="CASCADE"),
+            index=True,
+            nullable=False,
+        ),
+        sa.Column("status", sa.String, nullable=True),
+        sa.Column("vendor", sa.String, nullable=True),
+        sa.Column("cost", sa.Numeric(12, 2), nullable=True),
+        sa.Column("link", sa.String, nullable=True),
+        sa.Column("notes", sa.Text, nullable=True),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+    )
+    op.create_table(
+        "attachments",
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column(
+            "home_id",
+            sa.Integer,
+            sa.ForeignKey("homes.id", ondelete="CASCADE"),
+            index=True,
+            nullable=False,
+        ),
+        sa.Column(
+            "room_id",
+            sa.Integer,
+            sa.ForeignKey("rooms.id", ondelete="SET NULL"),
+            index=True,
+            nullable=True,
+        ),
+        sa.Column(
+            "element_id",
+            sa.Integer,
+            sa.ForeignKey("room_elements.id", ondelete="SET NULL"),
+            index=True,
+            nullable=True,
+        ),
+        sa.Column("uploaded_by", sa.Integer, sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("file_path", sa.String, nullable=False),
+        sa.Column("filename", sa.String, nullable=False),
+        sa.Column("content_type", sa.String, nullable=True),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+    )
+
+
+def downgrade():
+    op.drop_table("attachments")
+    op.drop_table("purchase_details")
+    op.drop_table("comments")
+    op.drop_table("room_elements")
+    op.drop_table("rooms")
+    op.drop_table("homes")
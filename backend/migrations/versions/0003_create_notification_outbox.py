@@ -0,0 +1,42 @@
+"""
+Revision ID: 0003_create_notification_outbox
+Revises: 0002_create_home_entities
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_create_notification_outbox"
+down_revision = "0002_create_home_entities"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "notification_outbox",
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("recipient", sa.String, index=True, nullable=False),
+        sa.Column("kind", sa.String, nullable=False, server_default="generic"),
+        sa.Column("subject", sa.String, nullable=False),
+        sa.Column("body", sa.Text, nullable=False),
+        sa.Column(
+            "status", sa.String, index=True, nullable=False, server_default="pending"
+        ),
+        sa.Column("attempts", sa.Integer, nullable=False, server_default="0"),
+        sa.Column(
+            "next_attempt_at",
+            sa.DateTime,
+            index=True,
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.Column("last_error", sa.Text, nullable=True),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+        sa.Column("sent_at", sa.DateTime, nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table("notification_outbox")
@@ -0,0 +1,27 @@
+"""
+Revision ID: 0004_create_comment_summaries
+Revises: 0003_create_notification_outbox
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_create_comment_summaries"
+down_revision = "0003_create_notification_outbox"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "comment_summaries",
+        sa.Column("thread_hash", sa.String(64), primary_key=True),
+        sa.Column("summary", sa.Text, nullable=False),
+        sa.Column("comment_count", sa.Integer, nullable=False),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+    )
+
+
+def downgrade():
+    op.drop_table("comment_summaries")
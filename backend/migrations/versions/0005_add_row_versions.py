@@ -0,0 +1,28 @@
+"""
+Revision ID: 0005_add_row_versions
+Revises: 0004_create_comment_summaries
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_add_row_versions"
+down_revision = "0004_create_comment_summaries"
+branch_labels = None
+depends_on = None
+
+VERSIONED_TABLES = ["users", "homes", "rooms", "room_elements", "purchase_details"]
+
+
+def upgrade():
+    for table in VERSIONED_TABLES:
+        op.add_column(
+            table,
+            sa.Column("version", sa.Integer, nullable=False, server_default="1"),
+        )
+
+
+def downgrade():
+    for table in reversed(VERSIONED_TABLES):
+        op.drop_column(table, "version")
@@ -0,0 +1,82 @@
+"""
+Revision ID: 0006_add_change_notify_triggers
+Revises: 0005_add_row_versions
+Create Date: 2026-10-19 00:00:00.000000
+"""
+
+from alembic import op
+
+revision = "0006_add_change_notify_triggers"
+down_revision = "0005_add_row_versions"
+branch_labels = None
+depends_on = None
+
+CHANNEL = "anantam_events"
+NOTIFY_TABLES = ["rooms", "room_elements", "comments", "purchase_details"]
+
+NOTIFY_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION anantam_notify_change() RETURNS trigger AS $$
+DECLARE
+    rec RECORD;
+    v_home_id INTEGER;
+    v_room_id INTEGER;
+    v_element_id INTEGER;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        rec := OLD;
+    ELSE
+        rec := NEW;
+    END IF;
+    IF TG_TABLE_NAME = 'rooms' THEN
+        v_room_id := rec.id;
+        v_home_id := rec.home_id;
+    ELSIF TG_TABLE_NAME = 'room_elements' THEN
+        v_element_id := rec.id;
+        v_room_id := rec.room_id;
+    ELSIF TG_TABLE_NAME = 'comments' THEN
+        v_element_id := rec.element_id;
+        v_room_id := rec.room_id;
+    ELSIF TG_TABLE_NAME = 'purchase_details' THEN
+        v_element_id := rec.element_id;
+    END IF;
+    IF v_room_id IS NULL AND v_element_id IS NOT NULL THEN
+        SELECT room_id INTO v_room_id FROM room_elements WHERE id = v_element_id;
+    END IF;
+    IF v_home_id IS NULL AND v_room_id IS NOT NULL THEN
+        SELECT home_id INTO v_home_id FROM rooms WHERE id = v_room_id;
+    END IF;
+    PERFORM pg_notify(
+        '{CHANNEL}',
+        json_build_object(
+            'table', TG_TABLE_NAME,
+            'op', TG_OP,
+            'id', rec.id,
+            'home_id', v_home_id,
+            'room_id', v_room_id,
+            'element_id', v_element_id
+        )::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute(NOTIFY_FUNCTION)
+    for table in NOTIFY_TABLES:
+        op.execute(
+            f"CREATE TRIGGER {table}_notify_change "
+            f"AFTER INSERT OR UPDATE OR DELETE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION anantam_notify_change()"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for table in NOTIFY_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_notify_change ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS anantam_notify_change()")
@@ -1,5 +1,16 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Boolean,
+    DateTime,
+    ForeignKey,
+    Numeric,
+    Text,
+    JSON,
+)
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
 import datetime
 
 Base = declarative_base()
@@ -15,3 +26,136 @@ class User(Base):
     is_superuser = Column(Boolean, default=False)
     role = Column(String, default="user")
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+class Home(Base):
+    __tablename__ = "homes"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    address = Column(String, nullable=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)
+    rooms = relationship("Room", order_by="Room.id")
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+class Room(Base):
+    __tablename__ = "rooms"
+    id = Column(Integer, primary_key=True, index=True)
+    home_id = Column(
+        Integer, ForeignKey("homes.id", ondelete="CASCADE"), index=True, nullable=False
+    )
+    name = Column(String, nullable=False)
+    description = Column(Text, nullable=True)
+    measurements = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)
+    elements = relationship("RoomElement", order_by="RoomElement.id")
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+class RoomElement(Base):
+    __tablename__ = "room_elements"
+    id = Column(Integer, primary_key=True, index=True)
+    room_id = Column(
+        Integer, ForeignKey("rooms.id", ondelete="CASCADE"), index=True, nullable=False
+    )
+    name = Column(String, nullable=False)
+    description = Column(Text, nullable=True)
+    measurements = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)
+    purchases = relationship("PurchaseDetail", order_by="PurchaseDetail.id")
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+class Comment(Base):
+    __tablename__ = "comments"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    room_id = Column(
+        Integer, ForeignKey("rooms.id", ondelete="CASCADE"), index=True, nullable=True
+    )
+    element_id = Column(
+        Integer,
+        ForeignKey("room_elements.id", ondelete="CASCADE"),
+        index=True,
+        nullable=True,
+    )
+    content = Column(Text, nullable=False)
+    ai_summary = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+
+class PurchaseDetail(Base):
+    __tablename__ = "purchase_details"
+    id = Column(Integer, primary_key=True, index=True)
+    element_id = Column(
+        Integer,
+        ForeignKey("room_elements.id", ondelete="CASCADE"),
+        index=True,
+        nullable=False,
+    )
+    status = Column(String, default="planned")
+    vendor = Column(String, nullable=True)
+    cost = Column(Numeric(12, 2), nullable=True)
+    link = Column(String, nullable=True)
+    notes = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1)
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+class Attachment(Base):
+    __tablename__ = "attachments"
+    id = Column(Integer, primary_key=True, index=True)
+    home_id = Column(
+        Integer, ForeignKey("homes.id", ondelete="CASCADE"), index=True, nullable=False
+    )
+    room_id = Column(
+        Integer, ForeignKey("rooms.id", ondelete="SET NULL"), index=True, nullable=True
+    )
+    element_id = Column(
+        Integer,
+        ForeignKey("room_elements.id", ondelete="SET NULL"),
+        index=True,
+        nullable=True,
+    )
+    uploaded_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    file_path = Column(String, nullable=False)
+    filename = Column(String, nullable=False)
+    content_type = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    id = Column(Integer, primary_key=True, index=True)
+    recipient = Column(String, index=True, nullable=False)
+    kind = Column(String, nullable=False, default="generic")
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String, index=True, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(
+        DateTime, index=True, nullable=False, default=datetime.datetime.utcnow
+    )
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+
+class CommentSummary(Base):
+    __tablename__ = "comment_summaries"
+    thread_hash = Column(String(64), primary_key=True)
+    summary = Column(Text, nullable=False)
+    comment_count = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
@@ -0,0 +1,272 @@
+"""
+notifications.py: Durable email notifications (outbox table + background sender).
+
+- Request handlers call enqueue() inside their own transaction, so nothing
+  talks to SMTP on the request path and a notification is only sent if the
+  change that caused it was committed
+- NotificationSender drains the outbox in the background over one reused
+  SMTP connection, folding everything pending for a recipient into a digest
+- Failed sends are retried with exponential backoff up to MAX_ATTEMPTS
+"""
+
+import asyncio
+import datetime
+import os
+from email.message import EmailMessage
+
+import aiosmtplib
+
+import database
+import models
+
+SMTP_HOST = os.getenv("SMTP_HOST")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "25"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_FROM = os.getenv("SMTP_FROM", "no-reply@anantam.local")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+
+POLL_INTERVAL = float(os.getenv("NOTIFICATION_POLL_INTERVAL", "2"))
+BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", "200"))
+# Hold new notifications back this long so bursts end up in one digest
+DIGEST_DELAY = float(os.getenv("NOTIFICATION_DIGEST_SECONDS", "0"))
+MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "6"))
+BACKOFF_BASE = float(os.getenv("NOTIFICATION_BACKOFF_BASE", "5"))
+BACKOFF_MAX = float(os.getenv("NOTIFICATION_BACKOFF_MAX", "3600"))
+# A claimed row that is not resolved within this window is picked up again
+CLAIM_LEASE = float(os.getenv("NOTIFICATION_CLAIM_LEASE", "300"))
+
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+
+def enqueue(db, recipient, subject, body, kind="generic", delay=None):
+    """Add a notification to the outbox. It is sent after the caller commits."""
+    delay = DIGEST_DELAY if delay is None else delay
+    entry = models.NotificationOutbox(
+        recipient=recipient,
+        kind=kind,
+        subject=subject,
+        body=body,
+        status=STATUS_PENDING,
+        attempts=0,
+        next_attempt_at=datetime.datetime.utcnow() + datetime.timedelta(seconds=delay),
+    )
+    db.add(entry)
+    return entry
+
+
+def backoff_delay(attempts):
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** max(attempts - 1, 0))
+
+
+def build_message(recipient, entries, sender=SMTP_FROM):
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = recipient
+    if len(entries) == 1:
+        message["Subject"] = entries[0]["subject"]
+        message.set_content(entries[0]["body"])
+    else:
+        message["Subject"] = f"You have {len(entries)} new notifications"
+        sections = [
+            f"{entry['subject']}\n{'-' * len(entry['subject'])}\n{entry['body']}"
+            for entry in entries
+        ]
+        message.set_content("\n\n".join(sections))
+    return message
+
+
+class NotificationSender:
+    """Background task that delivers the outbox over a single SMTP connection."""
+
+    def __init__(
+        self,
+        session_factory=None,
+        hostname=SMTP_HOST,
+        port=SMTP_PORT,
+        username=SMTP_USERNAME,
+        password=SMTP_PASSWORD,
+        sender=SMTP_FROM,
+        poll_interval=POLL_INTERVAL,
+        batch_size=BATCH_SIZE,
+    ):
+        self.session_factory = session_factory or database.SessionLocal
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._smtp = None
+        self._task = None
+        self._stopping = None
+
+    # --- Outbox bookkeeping (sync, run in a worker thread) ---
+
+    def _claim_due(self):
+        now = datetime.datetime.utcnow()
+        outbox = models.NotificationOutbox
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(outbox)
+                .filter(
+                    outbox.status.in_([STATUS_PENDING, STATUS_SENDING]),
+                    outbox.next_attempt_at <= now,
+                )
+                .order_by(outbox.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            lease = now + datetime.timedelta(seconds=CLAIM_LEASE)
+            claimed = []
+            for row in rows:
+                row.status = STATUS_SENDING
+                row.next_attempt_at = lease
+                claimed.append(
+                    {
+                        "id": row.id,
+                        "recipient": row.recipient,
+                        "subject": row.subject,
+                        "body": row.body,
+                        "attempts": row.attempts,
+                    }
+                )
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def _mark_sent(self, entries):
+        outbox = models.NotificationOutbox
+        db = self.session_factory()
+        try:
+            db.query(outbox).filter(
+                outbox.id.in_([entry["id"] for entry in entries])
+            ).update(
+                {
+                    outbox.status: STATUS_SENT,
+                    outbox.sent_at: datetime.datetime.utcnow(),
+                    outbox.last_error: None,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _mark_failed(self, entries, error):
+        now = datetime.datetime.utcnow()
+        outbox = models.NotificationOutbox
+        db = self.session_factory()
+        try:
+            for entry in entries:
+                attempts = entry["attempts"] + 1
+                values = {outbox.attempts: attempts, outbox.last_error: error}
+                if attempts >= MAX_ATTEMPTS:
+                    values[outbox.status] = STATUS_FAILED
+                else:
+                    values[outbox.status] = STATUS_PENDING
+                    values[outbox.next_attempt_at] = now + datetime.timedelta(
+                        seconds=backoff_delay(attempts)
+                    )
+                db.query(outbox).filter(outbox.id == entry["id"]).update(
+                    values, synchronize_session=False
+                )
+            db.commit()
+        finally:
+            db.close()
+
+    # --- SMTP ---
+
+    def _connected(self):
+        return self._smtp is not None and self._smtp.is_connected
+
+    async def _connection(self):
+        if not self._connected():
+            self._smtp = aiosmtplib.SMTP(
+                hostname=self.hostname,
+                port=self.port,
+                username=self.username,
+                password=self.password,
+                timeout=SMTP_TIMEOUT,
+            )
+            await self._smtp.connect()
+        return self._smtp
+
+    async def _send(self, message):
+        smtp = await self._connection()
+        try:
+            await smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # The server dropped our idle connection; reconnect once
+            self._smtp = None
+            smtp = await self._connection()
+            await smtp.send_message(message)
+
+    async def close(self):
+        if self._connected():
+            try:
+                await self._smtp.quit()
+            except aiosmtplib.SMTPException:
+                self._smtp.close()
+        self._smtp = None
+
+    # --- Delivery loop ---
+
+    async def send_pending(self):
+        """Run one outbox pass. Returns the number of outbox rows processed."""
+        claimed = await asyncio.to_thread(self._claim_due)
+        by_recipient = {}
+        for entry in claimed:
+            by_recipient.setdefault(entry["recipient"], []).append(entry)
+        groups = list(by_recipient.items())
+        for index, (recipient, entries) in enumerate(groups):
+            message = build_message(recipient, entries, self.sender)
+            try:
+                await self._send(message)
+            except (aiosmtplib.SMTPException, OSError) as exc:
+                print(
+                    f"[NOTIFY ERROR] Sending to {recipient} failed: {exc}", flush=True
+                )
+                if not self._connected():
+                    # No usable connection: defer the rest of this pass as well
+                    remaining = [e for _, group in groups[index:] for e in group]
+                    await asyncio.to_thread(self._mark_failed, remaining, str(exc))
+                    break
+                await asyncio.to_thread(self._mark_failed, entries, str(exc))
+                continue
+            await asyncio.to_thread(self._mark_sent, entries)
+        return len(claimed)
+
+    async def run(self):
+        while not self._stopping.is_set():
+            try:
+                processed = await self.send_pending()
+            except Exception as exc:
+                print(f"[NOTIFY ERROR] Outbox pass failed: {exc}", flush=True)
+                processed = 0
+            if processed >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+        await self.close()
+
+    def start(self):
+        """Start the delivery loop on the running event loop."""
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
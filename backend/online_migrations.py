@@ -0,0 +1,217 @@
+"""
+online_migrations.py: Alembic helpers that keep the app serving while they run.
+
+- lock_timeout(): DDL in the block gives up after a short wait instead of
+  queueing for its lock (an ALTER TABLE waiting behind a long transaction
+  blocks every read of the table, logins included, until it gets the lock)
+- create_index_concurrently()/drop_index_concurrently(): CREATE/DROP INDEX
+  CONCURRENTLY in an autocommit block, outside the migration transaction.
+  An INVALID index left by an interrupted build is dropped and rebuilt
+- backfill(): UPDATE in key ranges of batch_size rows, each its own
+  transaction, sleeping between batches and retrying batches that hit
+  lock_timeout or a deadlock. Progress is checkpointed in the same statement
+  as each batch (table online_migration_progress), so re-running the
+  migration after an interruption resumes at the next range
+- Batch size, sleep and lock timeout default to BACKFILL_BATCH_SIZE,
+  BACKFILL_SLEEP and BACKFILL_LOCK_TIMEOUT, so ops can tune a migration
+  without editing it
+- On other databases (SQLite) the same calls run as plain DDL/UPDATEs
+
+Usage, in a revision:
+    from online_migrations import (
+        backfill, create_index_concurrently, lock_timeout,
+    )
+
+    def upgrade():
+        with lock_timeout("2s"):
+            op.add_column("users", sa.Column("email_normalized", sa.String))
+        backfill("users", "email_normalized = lower(email)",
+                 where="email_normalized IS NULL")
+        create_index_concurrently("ix_users_email_normalized", "users",
+                                  ["email_normalized"])
+"""
+
+import contextlib
+import logging
+import os
+import time
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import exc, text
+
+log = logging.getLogger("alembic.online_migrations")
+
+PROGRESS_TABLE = "online_migration_progress"
+# SQLSTATEs worth retrying a batch for: lock_not_available, deadlock_detected
+RETRY_SQLSTATES = {"55P03", "40P01"}
+
+
+def _is_postgres():
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _timeout_literal(timeout):
+    # "2s", "500ms" or a number of seconds
+    return f"{timeout}s" if isinstance(timeout, (int, float)) else str(timeout)
+
+
+@contextlib.contextmanager
+def lock_timeout(timeout="2s"):
+    """Make lock waits in the block fail after `timeout` (Postgres only)."""
+    if not _is_postgres():
+        yield
+        return
+    bind = op.get_bind()
+    previous = bind.execute(text("SHOW lock_timeout")).scalar()
+    bind.execute(text(f"SET lock_timeout = '{_timeout_literal(timeout)}'"))
+    try:
+        yield
+    finally:
+        bind.execute(text(f"SET lock_timeout = '{previous}'"))
+
+
+def create_index_concurrently(
+    name, table, columns, unique=False, where=None, timeout="2s"
+):
+    """Build an index without blocking writes; `columns` may be SQL expressions."""
+    if not _is_postgres():
+        op.create_index(
+            name,
+            table,
+            [sa.text(c) if "(" in c else c for c in columns],
+            unique=unique,
+            sqlite_where=sa.text(where) if where else None,
+        )
+        return
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        invalid = bind.execute(
+            text(
+                "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name AND NOT i.indisvalid"
+            ),
+            {"name": name},
+        ).scalar()
+        if invalid:
+            log.info("Dropping invalid index %s left by an earlier build", name)
+            bind.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        sql = (
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY "
+            f"IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+        )
+        if where:
+            sql += f" WHERE {where}"
+        with lock_timeout(timeout):
+            bind.execute(text(sql))
+
+
+def drop_index_concurrently(name, table=None):
+    if not _is_postgres():
+        op.drop_index(name, table_name=table)
+        return
+    with op.get_context().autocommit_block():
+        op.get_bind().execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def _settings(batch_size, sleep, timeout):
+    if batch_size is None:
+        batch_size = int(os.getenv("BACKFILL_BATCH_SIZE", "10000"))
+    if sleep is None:
+        sleep = float(os.getenv("BACKFILL_SLEEP", "0.05"))
+    if timeout is None:
+        timeout = os.getenv("BACKFILL_LOCK_TIMEOUT", "2s")
+    return batch_size, sleep, _timeout_literal(timeout)
+
+
+def _ensure_progress_table(bind):
+    bind.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {PROGRESS_TABLE} ("
+            "name TEXT PRIMARY KEY, next_key BIGINT NOT NULL, "
+            "rows BIGINT NOT NULL DEFAULT 0, updated_at TIMESTAMPTZ NOT NULL)"
+        )
+    )
+
+
+def _finish_progress(bind, name):
+    bind.execute(
+        text(f"DELETE FROM {PROGRESS_TABLE} WHERE name = :name"), {"name": name}
+    )
+    # Leave no table behind once nothing is in flight (models don't know it)
+    if not bind.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {PROGRESS_TABLE})")
+    ).scalar():
+        bind.execute(text(f"DROP TABLE IF EXISTS {PROGRESS_TABLE}"))
+
+
+def backfill(
+    table,
+    set_sql,
+    where=None,
+    key="id",
+    name=None,
+    batch_size=None,
+    sleep=None,
+    timeout=None,
+    retries=5,
+):
+    """UPDATE `table` SET `set_sql` in throttled, resumable key-range batches.
+
+    `where` should exclude rows already done (e.g. "col IS NULL") so reruns
+    and rows written by the app meanwhile are handled. Returns rows updated.
+    """
+    batch_size, sleep, timeout = _settings(batch_size, sleep, timeout)
+    if not _is_postgres():
+        sql = f"UPDATE {table} SET {set_sql}" + (f" WHERE {where}" if where else "")
+        return op.get_bind().execute(text(sql)).rowcount
+
+    condition = f" AND ({where})" if where else ""
+    name = name or f"{table}: {set_sql}"
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        _ensure_progress_table(bind)
+        bounds = bind.execute(text(f"SELECT min({key}), max({key}) FROM {table}"))
+        low, high = bounds.one()
+        saved = bind.execute(
+            text(f"SELECT next_key FROM {PROGRESS_TABLE} WHERE name = :name"),
+            {"name": name},
+        ).scalar()
+        if saved is not None:
+            log.info("Resuming backfill %r at %s=%s", name, key, saved)
+            low = saved
+        # One statement per batch: the UPDATE and its checkpoint commit together
+        batch = text(
+            f"WITH batch AS (UPDATE {table} SET {set_sql} "
+            f"WHERE {key} >= :low AND {key} < :high{condition} RETURNING 1) "
+            f"INSERT INTO {PROGRESS_TABLE} (name, next_key, rows, updated_at) "
+            "SELECT :name, :high, count(*), now() FROM batch "
+            "ON CONFLICT (name) DO UPDATE SET next_key = EXCLUDED.next_key, "
+            f"rows = {PROGRESS_TABLE}.rows + EXCLUDED.rows, updated_at = now() "
+            f"RETURNING (SELECT count(*) FROM batch)"
+        )
+        total = 0
+        started = time.monotonic()
+        with lock_timeout(timeout):
+            while low is not None and low <= high:
+                params = {"low": low, "high": low + batch_size, "name": name}
+                for attempt in range(retries + 1):
+                    try:
+                        total += bind.execute(batch, params).scalar()
+                        break
+                    except exc.OperationalError as error:
+                        code = getattr(error.orig, "pgcode", None)
+                        if code not in RETRY_SQLSTATES or attempt == retries:
+                            raise
+                        log.info("Batch at %s=%s hit %s, retrying", key, low, code)
+                        time.sleep(sleep * 2 ** (attempt + 1))
+                low += batch_size
+                time.sleep(sleep)
+        _finish_progress(bind, name)
+        log.info(
+            "Backfilled %d rows of %s in %.1fs",
+            total,
+            table,
+            time.monotonic() - started,
+        )
+        return total
@@ -0,0 +1,249 @@
+"""
+profiler.py: Statistical stack sampler for live workers.
+
+- Sampler runs a daemon thread that reads every other thread's stack with
+  sys._current_frames() each ``interval`` seconds, so it sees the event
+  loop and the threadpool/bcrypt threads alike (a signal-based sampler only
+  ever sees the main thread)
+- Stacks are folded per function (file:first line), rooted at the thread
+  name; threads idling in select/wait/queue get are skipped unless asked for
+- Output is either collapsed stacks ("a;b;c 42", for flamegraph.pl and
+  speedscope) or speedscope's own JSON format
+- RollingProfiler samples continuously at a low rate and writes one
+  collapsed file per worker per window to PROFILE_DIR, keeping the newest
+  PROFILE_KEEP files per worker
+"""
+
+import collections
+import glob
+import os
+import sys
+import threading
+import time
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/anantam-profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "100"))
+PROFILE_WINDOW_SECONDS = float(os.getenv("PROFILE_WINDOW_SECONDS", "60"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "30"))
+MAX_DEPTH = 128
+
+# Leaf functions of threads that are parked rather than working
+IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get"),
+    ("_thread.py", "run"),
+}
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+def _is_idle(code):
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES
+
+
+class Sampler:
+    def __init__(self, interval=0.005, include_idle=False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks = collections.Counter()
+        self.samples = 0
+        # Only the sampler and take() contend for this, never a request
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample_once(self):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        own = threading.get_ident()
+        folded = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            if not self.include_idle and _is_idle(frame.f_code):
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            stack.reverse()
+            folded.append(tuple(stack))
+        with self._lock:
+            for stack in folded:
+                self.stacks[stack] += 1
+            self.samples += 1
+
+    def _run(self):
+        next_at = time.perf_counter()
+        while not self._stop.is_set():
+            self.sample_once()
+            next_at += self.interval
+            delay = next_at - time.perf_counter()
+            if delay < 0:
+                # Fell behind (GIL contention): skip ahead instead of bursting
+                next_at = time.perf_counter()
+                delay = 0
+            self._stop.wait(delay)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="profiler-sampler", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def take(self):
+        """Return the stacks collected so far and start a fresh window."""
+        with self._lock:
+            stacks, self.stacks = self.stacks, collections.Counter()
+        return stacks
+
+
+def collapsed(stacks):
+    lines = [f"{';'.join(stack)} {count}" for stack, count in stacks.most_common()]
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+def parse_collapsed(text, into=None):
+    stacks = into if into is not None else collections.Counter()
+    for line in text.splitlines():
+        stack, _, count = line.rpartition(" ")
+        if stack and count.isdigit():
+            stacks[tuple(stack.split(";"))] += int(count)
+    return stacks
+
+
+def speedscope(stacks, name="anantam", interval=None):
+    """speedscope "sampled" profile; weights are sample counts."""
+    frames, index = [], {}
+    samples, weights = [], []
+    for stack, count in stacks.most_common():
+        ids = []
+        for label in stack:
+            if label not in index:
+                index[label] = len(frames)
+                frame = {"name": label}
+                if label.endswith(")") and ":" in label:
+                    function, _, location = label[:-1].rpartition(" (")
+                    file, _, line = location.rpartition(":")
+                    frame = {"name": function, "file": file, "line": int(line)}
+                frames.append(frame)
+            ids.append(index[label])
+        samples.append(ids)
+        weights.append(count)
+    profile = {
+        "type": "sampled",
+        "name": name,
+        "unit": "none",
+        "startValue": 0,
+        "endValue": sum(weights),
+        "samples": samples,
+        "weights": weights,
+    }
+    if interval:
+        profile["unit"] = "milliseconds"
+        profile["weights"] = [w * interval * 1000 for w in weights]
+        profile["endValue"] = sum(profile["weights"])
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [profile],
+        "name": name,
+        "exporter": "anantam-profiler",
+    }
+
+
+def profile_for(seconds, interval=0.005, include_idle=False):
+    """Blocking helper: sample for ``seconds`` and return the stacks."""
+    sampler = Sampler(interval, include_idle).start()
+    time.sleep(seconds)
+    return sampler.stop().take()
+
+
+class RollingProfiler:
+    """Low-rate continuous sampling into rotating per-worker files."""
+
+    def __init__(
+        self,
+        directory=PROFILE_DIR,
+        interval=PROFILE_INTERVAL_MS / 1000,
+        window=PROFILE_WINDOW_SECONDS,
+        keep=PROFILE_KEEP,
+    ):
+        self.directory = directory
+        self.window = window
+        self.keep = keep
+        self.sampler = Sampler(interval)
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def _pattern(self, pid="*"):
+        return os.path.join(self.directory, f"profile-{pid}-*.collapsed")
+
+    def flush(self):
+        stacks = self.sampler.take()
+        if not stacks:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(
+            self.directory, f"profile-{os.getpid()}-{time.time() * 1000:.0f}.collapsed"
+        )
+        with open(path + ".tmp", "w") as f:
+            f.write(collapsed(stacks))
+        os.replace(path + ".tmp", path)
+        for old in sorted(glob.glob(self._pattern(os.getpid())))[: -self.keep]:
+            os.unlink(old)
+        return path
+
+    def _run(self):
+        while not self._stop.wait(self.window):
+            self.flush()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self.sampler.start()
+        self._thread = threading.Thread(
+            target=self._run, name="profiler-roller", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.sampler.stop()
+        self.flush()
+
+    def load(self, since=None):
+        """Merged stacks of every worker's files (newer than ``since``)."""
+        stacks = collections.Counter()
+        for path in glob.glob(self._pattern()):
+            if since is not None and os.path.getmtime(path) < since:
+                continue
+            try:
+                with open(path) as f:
+                    parse_collapsed(f.read(), into=stacks)
+            except OSError:
+                continue  # rotated away while we were listing
+        return stacks
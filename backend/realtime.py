@@ -0,0 +1,249 @@
+"""
+realtime.py: Push room/home changes to collaborators (WebSocket with SSE fallback).
+
+- A trigger (migration 0006) calls pg_notify on CHANNEL whenever a room,
+  element, comment or purchase changes; the payload carries ids only
+- Each worker holds ONE dedicated LISTEN connection (NotifyListener) whose
+  socket is watched by the event loop, so no thread is parked on it
+- Hub keeps an in-memory index topic -> subscribers ("home:<id>",
+  "room:<id>") and fans each notification out without awaiting anyone
+- Every subscriber has a bounded queue. When it is full the oldest message
+  is dropped; a subscriber that keeps overflowing is evicted and its client
+  is expected to reconnect and refetch
+"""
+
+import asyncio
+import json
+import os
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from starlette.websockets import WebSocketDisconnect
+
+# Not configurable: the triggers from migration 0006 notify this channel
+CHANNEL = "anantam_events"
+BUFFER_SIZE = int(os.getenv("REALTIME_BUFFER_SIZE", "100"))
+MAX_DROPS = int(os.getenv("REALTIME_MAX_DROPS", "100"))
+HEARTBEAT_SECONDS = float(os.getenv("REALTIME_HEARTBEAT_SECONDS", "15"))
+RECONNECT_MAX_SECONDS = float(os.getenv("REALTIME_RECONNECT_MAX_SECONDS", "30"))
+
+
+def topics_for(home_id, room_id=None):
+    return [f"room:{room_id}"] if room_id is not None else [f"home:{home_id}"]
+
+
+class Subscriber:
+    """One connected client: a bounded queue plus overflow accounting."""
+
+    __slots__ = ("topics", "queue", "dropped", "closed")
+
+    def __init__(self, topics, buffer_size=BUFFER_SIZE):
+        self.topics = list(topics)
+        self.queue = asyncio.Queue(maxsize=buffer_size)
+        self.dropped = 0
+        self.closed = False
+
+    def offer(self, message):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+            return
+        except asyncio.QueueFull:
+            pass
+        self.dropped += 1
+        if self.dropped >= MAX_DROPS:
+            self.close()
+            return
+        # Keep the newest events; the client refetches on reconnect anyway
+        self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    def close(self):
+        """Evict the subscriber; get() returns None once the queue is drained."""
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    async def get(self):
+        message = await self.queue.get()
+        self.dropped = 0
+        return message
+
+
+class Hub:
+    """In-memory topic -> subscribers index. Must be used from the event loop."""
+
+    def __init__(self, buffer_size=BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._topics = {}
+
+    def subscribe(self, topics):
+        subscriber = Subscriber(topics, self.buffer_size)
+        for topic in subscriber.topics:
+            self._topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        for topic in subscriber.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._topics[topic]
+
+    def subscriber_count(self, topic=None):
+        if topic is not None:
+            return len(self._topics.get(topic, ()))
+        return sum(len(s) for s in self._topics.values())
+
+    def publish(self, topics, message):
+        targets = set()
+        for topic in topics:
+            targets.update(self._topics.get(topic, ()))
+        for subscriber in targets:
+            subscriber.offer(message)
+        return len(targets)
+
+    def dispatch_notification(self, payload):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            print(f"[REALTIME WARN] Ignoring malformed payload: {payload!r}")
+            return 0
+        topics = []
+        if event.get("home_id") is not None:
+            topics.append(f"home:{event['home_id']}")
+        if event.get("room_id") is not None:
+            topics.append(f"room:{event['room_id']}")
+        return self.publish(topics, payload)
+
+
+class NotifyListener:
+    """Single LISTEN connection per worker feeding a Hub."""
+
+    def __init__(self, hub, dsn, channel=CHANNEL):
+        self.hub = hub
+        self.dsn = dsn
+        self.channel = channel
+        self._task = None
+        self._stopping = None
+        self.connected = asyncio.Event()
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, keepalives=1, keepalives_idle=30)
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {self.channel}")
+        return conn
+
+    def _on_readable(self, conn, lost):
+        try:
+            conn.poll()
+        except psycopg2.Error as exc:
+            print(f"[REALTIME WARN] LISTEN connection lost: {exc}", flush=True)
+            lost.set()
+            return
+        while conn.notifies:
+            self.hub.dispatch_notification(conn.notifies.pop(0).payload)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        delay = 1.0
+        while not self._stopping.is_set():
+            try:
+                conn = await asyncio.to_thread(self._connect)
+            except psycopg2.Error as exc:
+                print(f"[REALTIME WARN] LISTEN connect failed: {exc}", flush=True)
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+                continue
+            delay = 1.0
+            lost = asyncio.Event()
+            loop.add_reader(conn.fileno(), self._on_readable, conn, lost)
+            self.connected.set()
+            waiters = [
+                asyncio.ensure_future(lost.wait()),
+                asyncio.ensure_future(self._stopping.wait()),
+            ]
+            try:
+                await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for waiter in waiters:
+                    waiter.cancel()
+                self.connected.clear()
+                loop.remove_reader(conn.fileno())
+                conn.close()
+
+    async def start(self):
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+
+
+async def pump_websocket(websocket, subscriber):
+    """Forward a subscriber's queue to a websocket until either side closes."""
+    client_gone = False
+
+    async def watch_client():
+        nonlocal client_gone
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            client_gone = True
+        finally:
+            subscriber.close()
+
+    watcher = asyncio.create_task(watch_client())
+    try:
+        while True:
+            message = await subscriber.get()
+            if message is None:
+                break
+            await websocket.send_text(message)
+    except (WebSocketDisconnect, RuntimeError):
+        client_gone = True
+    finally:
+        watcher.cancel()
+    if not client_gone:
+        # Evicted as a slow consumer: ask the client to reconnect later
+        try:
+            await websocket.close(code=1013)
+        except RuntimeError:
+            pass
+
+
+async def sse_stream(hub, topics, heartbeat=HEARTBEAT_SECONDS):
+    """Server-sent events body; subscribed to `topics` only while it runs.
+
+    Subscribing here rather than in the route means a client that leaves
+    before the body starts never leaves a subscriber behind.
+    """
+    subscriber = hub.subscribe(topics)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if message is None:
+                return
+            yield f"data: {message}\n\n"
+    finally:
+        hub.unsubscribe(subscriber)
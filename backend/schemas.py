@@ -1,5 +1,7 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, field_validator
+from typing import List, Optional
+from decimal import Decimal
+import datetime
 
 
 class UserCreate(BaseModel):
@@ -13,6 +15,10 @@ class UserLogin(BaseModel):
     password: str
 
 
+class UserUpdate(BaseModel):
+    full_name: Optional[str] = None
+
+
 class UserOut(BaseModel):
     id: int
     email: EmailStr
@@ -23,3 +29,93 @@ class UserOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class HomeCreate(BaseModel):
+    name: str
+    address: Optional[str] = None
+
+
+class HomeUpdate(BaseModel):
+    # Omitted means unchanged
+    name: Optional[str] = None
+    address: Optional[str] = None
+
+    @field_validator("name")
+    @classmethod
+    def name_not_null(cls, value):
+        # homes.name is NOT NULL: an explicit null is a 422, not an
+        # IntegrityError (validators skip the default, so omitting still works)
+        if value is None:
+            raise ValueError("name cannot be null")
+        return value
+
+
+class HomeOut(BaseModel):
+    id: int
+    name: str
+    address: Optional[str] = None
+    owner_id: int
+    version: int
+
+    class Config:
+        orm_mode = True
+
+
+class SummarizeRequest(BaseModel):
+    room_id: Optional[int] = None
+    element_id: Optional[int] = None
+
+
+class SummaryOut(BaseModel):
+    room_id: Optional[int] = None
+    element_id: Optional[int] = None
+    comment_count: int
+    thread_hash: str
+    summary: str
+
+
+class PurchaseOut(BaseModel):
+    id: int
+    status: Optional[str] = None
+    vendor: Optional[str] = None
+    cost: Optional[Decimal] = None
+    link: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+
+class ElementTreeOut(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    measurements: Optional[dict] = None
+    purchases: List[PurchaseOut] = []
+
+    class Config:
+        orm_mode = True
+
+
+class RoomTreeOut(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    measurements: Optional[dict] = None
+    elements: List[ElementTreeOut] = []
+
+    class Config:
+        orm_mode = True
+
+
+class HomeTreeOut(BaseModel):
+    id: int
+    name: str
+    address: Optional[str] = None
+    owner_id: int
+    version: int
+    created_at: Optional[datetime.datetime] = None
+    rooms: List[RoomTreeOut] = []
+
+    class Config:
+        orm_mode = True
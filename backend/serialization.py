@@ -0,0 +1,124 @@
+"""
+serialization.py: Fast response path for trusted ORM objects.
+
+- compile_serializer() turns a response schema into a generated function
+  that copies attributes straight off an ORM object into a dict, recursing
+  into nested schemas and lists; it is built once per schema and cached
+- The generated code skips Pydantic validation entirely, so it is only for
+  objects loaded from our own database, never for client input
+- FastJSONResponse encodes with orjson when it is installed and falls back
+  to a compact stdlib json.dumps otherwise
+- Handlers keep response_model for the OpenAPI schema and return
+  trusted_response(...), which FastAPI sends as-is without re-validating
+"""
+
+import datetime
+import decimal
+import json
+import typing
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+import timing
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+_SERIALIZERS = {}
+_NO_DICT = {}
+
+
+def _json_default(value):
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _unwrap_optional(annotation):
+    if typing.get_origin(annotation) is typing.Union:
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        if len(args) == 1:
+            return args[0], True
+    return annotation, False
+
+
+def _is_model(annotation):
+    return isinstance(annotation, type) and issubclass(annotation, BaseModel)
+
+
+def _value_expr(annotation, source, namespace, name):
+    """Python expression converting ``source`` according to ``annotation``."""
+    inner, optional = _unwrap_optional(annotation)
+    if _is_model(inner):
+        namespace[name] = compile_serializer(inner)
+        template = name + "({})"
+    elif typing.get_origin(inner) is list and _is_model(typing.get_args(inner)[0]):
+        namespace[name] = compile_serializer(typing.get_args(inner)[0])
+        template = "[" + name + "(x) for x in ({} or ())]"
+    elif inner in (datetime.datetime, datetime.date, datetime.time):
+        template = "{}.isoformat()"
+    elif inner is decimal.Decimal:
+        template = "str({})"
+    else:
+        return source
+    if optional:
+        return f"(None if (v := {source}) is None else {template.format('v')})"
+    return template.format(source)
+
+
+def compile_serializer(schema):
+    """Return a cached function mapping an ORM object to ``schema``'s JSON dict."""
+    serializer = _SERIALIZERS.get(schema)
+    if serializer is not None:
+        return serializer
+    namespace = {"_NO_DICT": _NO_DICT}
+    items = []
+    for index, (field, info) in enumerate(schema.model_fields.items()):
+        # Loaded ORM attributes live in the instance __dict__; reading them
+        # there skips SQLAlchemy's descriptor machinery
+        source = f"(d[{field!r}] if {field!r} in d else obj.{field})"
+        expr = _value_expr(info.annotation, source, namespace, f"_s{index}")
+        items.append(f"{field!r}: {expr}")
+    source = (
+        "def serialize(obj):\n"
+        "    d = getattr(obj, '__dict__', _NO_DICT)\n"
+        "    return {" + ", ".join(items) + "}\n"
+    )
+    exec(compile(source, f"<serializer {schema.__name__}>", "exec"), namespace)
+    serializer = namespace["serialize"]
+    _SERIALIZERS[schema] = serializer
+    return serializer
+
+
+def serialize(schema, obj):
+    return compile_serializer(schema)(obj)
+
+
+def serialize_many(schema, objs):
+    serializer = compile_serializer(schema)
+    return [serializer(obj) for obj in objs]
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content):
+        if orjson is not None:
+            return orjson.dumps(content, default=_json_default)
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+            default=_json_default,
+        ).encode("utf-8")
+
+
+def trusted_response(schema, obj, status_code=200, headers=None, many=False):
+    """Serialize a trusted ORM object (or list) without Pydantic validation."""
+    with timing.span("serialize"):
+        content = serialize_many(schema, obj) if many else serialize(schema, obj)
+        return FastJSONResponse(content, status_code=status_code, headers=headers)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+server.py: Production entry point (gunicorn master + uvicorn workers).
+
+- The app is imported once in the master (preload) and workers are forked
+  from it, so the import cost is paid once and pages are shared
+- Each worker drops any inherited DB connections after fork and warms up
+  before it accepts traffic: it fills the DB pool, runs one bcrypt hash and
+  builds the OpenAPI schema
+- SIGHUP: re-import the app in the master, fork fresh workers and retire the
+  old ones gracefully. If the new code fails to import, the running version
+  keeps serving
+- SIGTERM: stop accepting, let in-flight requests finish (long-lived
+  WebSocket/SSE streams are cut after STREAM_DRAIN_SECONDS so clients
+  reconnect elsewhere), then exit
+
+- The master clears METRICS_DIR on start and archives the counters of every
+  worker that exits, so /metrics totals survive reloads
+
+Run as ``python server.py``; tune with WEB_CONCURRENCY, HOST, PORT,
+GRACEFUL_TIMEOUT, STREAM_DRAIN_SECONDS, WARMUP_DB_CONNECTIONS and METRICS_DIR.
+"""
+
+import math
+import os
+import sys
+import time
+import traceback
+
+from gunicorn.app.base import BaseApplication
+from uvicorn_worker import UvicornWorker
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+STREAM_DRAIN_SECONDS = int(os.getenv("STREAM_DRAIN_SECONDS", "10"))
+KEEPALIVE = int(os.getenv("KEEPALIVE", "5"))
+CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+
+
+def cpu_limit(cpu_max_path=CGROUP_CPU_MAX):
+    """CPUs this process may use: affinity, capped by a cgroup v2 quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on macOS
+        cpus = os.cpu_count() or 1
+    try:
+        with open(cpu_max_path) as f:
+            quota, period = f.read().split()
+    except (OSError, ValueError):
+        return cpus
+    if quota == "max":
+        return cpus
+    return max(1, min(cpus, math.ceil(int(quota) / int(period))))
+
+
+def default_workers():
+    configured = os.getenv("WEB_CONCURRENCY")
+    if configured:
+        return max(1, int(configured))
+    return cpu_limit()
+
+
+def warm_up(app, engine, connections=None):
+    """Pay first-request costs up front; returns seconds spent per step."""
+    import auth
+
+    timings = {}
+    start = time.perf_counter()
+    if connections is None:
+        size = getattr(engine.pool, "size", None)
+        connections = size() if callable(size) else 1
+        connections = int(os.getenv("WARMUP_DB_CONNECTIONS", connections))
+    # Hold them all at once so the pool really opens that many
+    opened = [engine.connect() for _ in range(connections)]
+    try:
+        for conn in opened:
+            conn.exec_driver_sql("SELECT 1")
+    finally:
+        for conn in opened:
+            conn.close()
+    timings["db_pool"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # First use loads the bcrypt backend and runs passlib's self-test
+    auth.pwd_context.verify("warmup", auth.pwd_context.hash("warmup"))
+    timings["bcrypt"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    app.openapi()
+    timings["openapi"] = time.perf_counter() - start
+    return timings
+
+
+def on_starting(server):
+    import metrics
+
+    metrics.clear_directory()
+
+
+def child_exit(server, worker):
+    import metrics
+
+    metrics.archive_worker(worker.pid)
+
+
+def post_fork(server, worker):
+    import database
+
+    # Sockets opened by the master must not be shared with the children
+    database.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    import database
+
+    try:
+        timings = warm_up(worker.wsgi, database.engine)
+    except Exception:
+        # A cold worker is still a working worker
+        worker.log.warning("Warm-up failed:\n%s", traceback.format_exc())
+        return
+    summary = ", ".join(f"{k}={v * 1000:.0f}ms" for k, v in timings.items())
+    worker.log.info("Worker %s warm (%s)", worker.pid, summary)
+
+
+class Worker(UvicornWorker):
+    CONFIG_KWARGS = {
+        "loop": "auto",
+        "http": "auto",
+        "lifespan": "on",
+        "timeout_graceful_shutdown": STREAM_DRAIN_SECONDS,
+    }
+
+
+def _app_modules():
+    """Modules loaded from this directory (what a reload has to re-import)."""
+    modules = {}
+    for name, module in sys.modules.items():
+        path = getattr(module, "__file__", None) or ""
+        if path.startswith(APP_DIR + os.sep) and name not in ("__main__", "server"):
+            modules[name] = module
+    return modules
+
+
+class Application(BaseApplication):
+    def __init__(self, options=None):
+        self.options = options or {}
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        import main
+
+        return main.app
+
+    def reload(self):
+        super().reload()
+        if not self.cfg.preload_app:
+            return
+        previous_app, previous_modules = self.callable, _app_modules()
+        for name in previous_modules:
+            del sys.modules[name]
+        try:
+            self.callable = self.load()
+        except Exception:
+            print(
+                f"[SERVER ERROR] Reload failed, keeping the running version:\n"
+                f"{traceback.format_exc()}",
+                file=sys.stderr,
+                flush=True,
+            )
+            for name in list(_app_modules()):
+                del sys.modules[name]
+            sys.modules.update(previous_modules)
+            self.callable = previous_app
+
+
+def options():
+    return {
+        "bind": f"{HOST}:{PORT}",
+        "workers": default_workers(),
+        "worker_class": "server.Worker",
+        "preload_app": True,
+        "graceful_timeout": GRACEFUL_TIMEOUT,
+        "keepalive": KEEPALIVE,
+        "on_starting": on_starting,
+        "child_exit": child_exit,
+        "post_fork": post_fork,
+        "post_worker_init": post_worker_init,
+        "accesslog": os.getenv("ACCESS_LOG"),
+        "errorlog": "-",
+    }
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, APP_DIR)
+    # Workers share metrics through per-pid snapshot files (see metrics.py)
+    os.environ.setdefault("METRICS_DIR", "/tmp/anantam-metrics")
+    Application(options()).run()
@@ -0,0 +1,242 @@
+"""
+summarization.py: AI summaries of comment threads.
+
+- Summaries are cached under a SHA-256 of the thread's contents, so a thread
+  is only sent to the model again after one of its comments changes. The
+  comment_summaries table is read and written through the caller's session
+  (the request's get_db session); the service itself opens none
+- Concurrent requests for the same thread share one in-flight result
+- The /ai/summarize endpoint also copies each summary onto its comments
+  (Comment.ai_summary)
+- Threads requested within BATCH_WINDOW seconds of each other go to the
+  model in a single call
+- The model backend is pluggable; StubSummarizer is deterministic and needs
+  no network, and is used whenever no API key is configured
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import httpx
+from sqlalchemy.exc import IntegrityError
+
+import models
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+AI_SUMMARY_BACKEND = os.getenv(
+    "AI_SUMMARY_BACKEND", "openai" if OPENAI_API_KEY else "stub"
+)
+AI_SUMMARY_MODEL = os.getenv("AI_SUMMARY_MODEL", "gpt-4o-mini")
+AI_SUMMARY_URL = os.getenv(
+    "AI_SUMMARY_URL", "https://api.openai.com/v1/chat/completions"
+)
+AI_SUMMARY_TIMEOUT = float(os.getenv("AI_SUMMARY_TIMEOUT", "30"))
+BATCH_WINDOW = float(os.getenv("AI_SUMMARY_BATCH_WINDOW", "0.05"))
+MAX_BATCH = int(os.getenv("AI_SUMMARY_MAX_BATCH", "16"))
+MEMORY_CACHE_SIZE = int(os.getenv("AI_SUMMARY_CACHE_SIZE", "1024"))
+
+
+def thread_hash(comments):
+    """Stable hash of a thread given its comment texts in display order."""
+    digest = hashlib.sha256()
+    for content in comments:
+        encoded = content.encode("utf-8")
+        # Length-prefix each comment so ["ab", "c"] and ["a", "bc"] differ
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class StubSummarizer:
+    """Deterministic local backend for tests and development."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def summarize_batch(self, threads):
+        self.calls.append(len(threads))
+        summaries = []
+        for comments in threads:
+            firsts = [c.strip().split(".")[0][:60] for c in comments if c.strip()]
+            summaries.append(f"{len(comments)} comment(s): " + " | ".join(firsts))
+        return summaries
+
+
+class OpenAISummarizer:
+    """Chat-completions backend that summarizes several threads per request."""
+
+    def __init__(self, api_key=OPENAI_API_KEY, model=AI_SUMMARY_MODEL):
+        self.api_key = api_key
+        self.model = model
+
+    async def summarize_batch(self, threads):
+        numbered = "\n\n".join(
+            f"Thread {i + 1}:\n" + "\n".join(f"- {c}" for c in comments)
+            for i, comments in enumerate(threads)
+        )
+        payload = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": (
+                        "Summarize each numbered comment thread about a home "
+                        "interior design in one or two sentences. Reply with a "
+                        "JSON array of strings, one per thread, in order."
+                    ),
+                },
+                {"role": "user", "content": numbered},
+            ],
+        }
+        async with httpx.AsyncClient(timeout=AI_SUMMARY_TIMEOUT) as client:
+            response = await client.post(
+                AI_SUMMARY_URL,
+                json=payload,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+            )
+            response.raise_for_status()
+        content = response.json()["choices"][0]["message"]["content"]
+        summaries = json.loads(content)
+        if not isinstance(summaries, list) or len(summaries) != len(threads):
+            raise ValueError(
+                f"Expected {len(threads)} summaries from the model, got {content!r}"
+            )
+        return [str(s) for s in summaries]
+
+
+def get_backend(name=AI_SUMMARY_BACKEND):
+    if name == "openai":
+        return OpenAISummarizer()
+    if name == "stub":
+        return StubSummarizer()
+    raise ValueError(f"Unknown AI_SUMMARY_BACKEND: {name}")
+
+
+class SummaryService:
+    """Caches, coalesces and batches thread summaries in front of a backend."""
+
+    def __init__(
+        self,
+        backend=None,
+        batch_window=BATCH_WINDOW,
+        max_batch=MAX_BATCH,
+        cache_size=MEMORY_CACHE_SIZE,
+    ):
+        self.backend = backend or get_backend()
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+        self._memory = OrderedDict()
+        self._inflight = {}
+        self._pending = []
+        self._flush_handle = None
+        # The event loop only keeps weak references to tasks
+        self._tasks = set()
+
+    async def summarize(self, comments, db=None):
+        """Return (thread_hash, summary) for a thread of comment texts.
+
+        With ``db``, a summary stored by any worker is reused, and a new one
+        is stored by the request that started its computation.
+        """
+        key = thread_hash(comments)
+        cached = self._memory.get(key)
+        if cached is not None:
+            self._memory.move_to_end(key)
+            return key, cached
+        if db is not None:
+            stored = await asyncio.to_thread(load_stored, db, key)
+            if stored is not None:
+                self._remember(key, stored)
+                return key, stored
+        future = self._inflight.get(key)
+        started = future is None
+        if started:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            self._pending.append((key, list(comments)))
+            self._schedule_flush()
+        # Shield so one cancelled caller does not cancel the shared result
+        summary = await asyncio.shield(future)
+        if started and db is not None:
+            await asyncio.to_thread(store, db, key, summary, len(comments))
+        return key, summary
+
+    def _schedule_flush(self):
+        loop = asyncio.get_running_loop()
+        if len(self._pending) >= self.max_batch:
+            batch = self._pending[: self.max_batch]
+            self._pending = self._pending[self.max_batch :]
+            self._spawn(self._run_batch(batch))
+        if self._pending and self._flush_handle is None:
+            self._flush_handle = loop.call_later(
+                self.batch_window, lambda: self._spawn(self._flush())
+            )
+        elif not self._pending and self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self):
+        self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            await self._run_batch(batch)
+
+    async def _run_batch(self, batch):
+        keys = [key for key, _ in batch]
+        computed, error = {}, None
+        try:
+            fresh = await self.backend.summarize_batch([c for _, c in batch])
+            if len(fresh) != len(batch):
+                raise ValueError(
+                    f"Expected {len(batch)} summaries from the backend, "
+                    f"got {len(fresh)}"
+                )
+            computed = dict(zip(keys, fresh))
+        except Exception as exc:
+            error = exc
+        finally:
+            # Settle every future on every path, or its waiters hang forever
+            for key in keys:
+                future = self._inflight.pop(key, None)
+                if key in computed:
+                    self._remember(key, computed[key])
+                if future is None or future.done():
+                    continue
+                if key in computed:
+                    future.set_result(computed[key])
+                elif error is not None:
+                    future.set_exception(error)
+                else:
+                    future.cancel()
+
+    def _remember(self, key, summary):
+        self._memory[key] = summary
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.cache_size:
+            self._memory.popitem(last=False)
+
+
+def load_stored(db, key):
+    row = db.get(models.CommentSummary, key)
+    return row.summary if row is not None else None
+
+
+def store(db, key, summary, comment_count):
+    db.merge(
+        models.CommentSummary(
+            thread_hash=key, summary=summary, comment_count=comment_count
+        )
+    )
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # another worker stored the same thread first
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+synthetic_data.py: Deterministic large-scale datasets for perf environments.
+
+- N users with a role mix, plus homes, rooms, elements, comments and
+  purchases whose counts and shapes come from a profile (DEFAULT_PROFILE,
+  overridable with --profile file.json)
+- Deterministic: every row is a pure function of (seed, table, id). Parent
+  ids come from a 64-bit mix of the child id, other values from a Random
+  seeded per chunk, so the same seed gives the same rows whatever --workers
+- Rows are streamed with COPY from a pool of processes, one connection each.
+  Sessions run with session_replication_role=replica, which skips the
+  change-notify triggers (and FK checks) so a bulk load does not flood
+  LISTEN clients; without superuser rights the triggers are disabled on the
+  tables for the duration of the load instead and tables load in FK order
+- Every user's password is --password (hashed once with the active
+  PASSWORD_HASH_PROFILE); emails are perf0@example.com .. perf<N-1>@...,
+  which scripts/loadtest_scenarios/seeded_login.json logs in as
+
+Usage (from backend/, against an empty schema at head):
+    python synthetic_data.py --users 1000000 --seed 42
+    python synthetic_data.py --users 10000 --truncate --profile big_homes.json
+"""
+
+import argparse
+import datetime
+import io
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import psycopg2
+import psycopg2.errors
+
+CHUNK_ROWS = 50_000
+BASE_TIME = datetime.datetime(2024, 1, 1)
+MASK = (1 << 64) - 1
+
+DEFAULT_PROFILE = {
+    "roles": {"user": 0.9, "designer": 0.08, "admin": 0.02},
+    "inactive_ratio": 0.03,
+    "homes_per_user": 0.2,
+    "rooms_per_home": 4,
+    "elements_per_room": 3,
+    "comments_per_element": 0.5,
+    "purchases_per_element": 0.3,
+    # Parent picks follow u ** skew: 1 is uniform, larger values pile
+    # children onto low ids (a few very active owners/authors)
+    "owner_skew": 1.5,
+    "comment_author_skew": 2.0,
+    "element_comment_skew": 1.0,
+    "purchase_statuses": {"planned": 0.5, "ordered": 0.3, "delivered": 0.2},
+    "cost_range": [5, 5000],
+    "created_days": 730,
+}
+
+ROOM_NAMES = ["Kitchen", "Living Room", "Bedroom", "Bathroom", "Study", "Hall"]
+ELEMENT_NAMES = ["Sofa", "Lamp", "Tiles", "Curtains", "Cabinet", "Rug", "Desk"]
+VENDORS = ["Acme", "HomeCo", "Interio", "UrbanLiving", "CraftWorks"]
+WORDS = "paint finish colour budget order measure delivery fix wall light".split()
+
+# Load order; children reference ids of the tables before them
+TABLES = {
+    "users": (
+        "id, email, hashed_password, full_name, is_active, is_superuser, role, "
+        "created_at, version"
+    ),
+    "homes": "id, name, address, owner_id, created_at, version",
+    "rooms": "id, home_id, name, description, measurements, created_at, version",
+    "room_elements": (
+        "id, room_id, name, description, measurements, created_at, version"
+    ),
+    "comments": "id, user_id, room_id, element_id, content, ai_summary, created_at",
+    "purchase_details": (
+        "id, element_id, status, vendor, cost, link, notes, created_at, version"
+    ),
+}
+NOTIFY_TABLES = ["rooms", "room_elements", "comments", "purchase_details"]
+# Salts keep the parent picks of different relations independent
+SALTS = {"owner": 1, "home": 2, "room": 3, "author": 4, "element": 5, "purchase": 6}
+
+
+def _mix(x):
+    """splitmix64 finalizer: a cheap, well-spread 64-bit hash of an int."""
+    x = (x + 0x9E3779B97F4A7C15) & MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK
+    return x ^ (x >> 31)
+
+
+def parent_id(seed, relation, child_id, parents, skew=1.0):
+    """Deterministic parent in 1..parents for a child row."""
+    u = _mix((seed << 40) ^ (SALTS[relation] << 34) ^ child_id) / 2.0**64
+    return 1 + min(parents - 1, int(parents * u**skew))
+
+
+def _scaled(parents, ratio):
+    # A non-zero ratio keeps at least one row, so tiny datasets fill every
+    # table; a zero ratio (e.g. a users-only profile) means no rows at all
+    return max(1, round(parents * ratio)) if parents and ratio else 0
+
+
+def counts(users, profile):
+    homes = _scaled(users, profile["homes_per_user"])
+    rooms = _scaled(homes, profile["rooms_per_home"])
+    elements = _scaled(rooms, profile["elements_per_room"])
+    return {
+        "users": users,
+        "homes": homes,
+        "rooms": rooms,
+        "room_elements": elements,
+        "comments": round(elements * profile["comments_per_element"]),
+        "purchase_details": round(elements * profile["purchases_per_element"]),
+    }
+
+
+def _weighted(mapping):
+    return list(mapping), list(mapping.values())
+
+
+def _when(rng, profile):
+    seconds = rng.randrange(profile["created_days"] * 86400)
+    return (BASE_TIME + datetime.timedelta(seconds=seconds)).isoformat(sep=" ")
+
+
+def _sentence(rng, words=8):
+    return " ".join(rng.choices(WORDS, k=words)).capitalize() + "."
+
+
+def generate(table, start, stop, seed, sizes, profile, hashed_password="x"):
+    """COPY text for ids start..stop-1 of one table."""
+    rng = random.Random(f"{seed}:{table}:{start}")
+    out = io.StringIO()
+    write = out.write
+    if table == "users":
+        roles, weights = _weighted(profile["roles"])
+        picked = rng.choices(roles, weights, k=stop - start)
+        for i, role in zip(range(start, stop), picked):
+            active = "f" if rng.random() < profile["inactive_ratio"] else "t"
+            superuser = "t" if role == "admin" else "f"
+            write(
+                f"{i}\tperf{i - 1}@example.com\t{hashed_password}\tPerf User {i}\t"
+                f"{active}\t{superuser}\t{role}\t{_when(rng, profile)}\t1\n"
+            )
+    elif table == "homes":
+        for i in range(start, stop):
+            owner = parent_id(seed, "owner", i, sizes["users"], profile["owner_skew"])
+            write(
+                f"{i}\tHome {i}\t{rng.randint(1, 999)} Main St\t{owner}\t"
+                f"{_when(rng, profile)}\t1\n"
+            )
+    elif table == "rooms":
+        for i in range(start, stop):
+            home = parent_id(seed, "home", i, sizes["homes"])
+            area = round(rng.uniform(6, 60), 1)
+            write(
+                f"{i}\t{home}\t{rng.choice(ROOM_NAMES)}\t{_sentence(rng)}\t"
+                f'{{"area": {area}}}\t{_when(rng, profile)}\t1\n'
+            )
+    elif table == "room_elements":
+        for i in range(start, stop):
+            room = parent_id(seed, "room", i, sizes["rooms"])
+            width = rng.randint(20, 300)
+            write(
+                f"{i}\t{room}\t{rng.choice(ELEMENT_NAMES)}\t{_sentence(rng, 5)}\t"
+                f'{{"width_cm": {width}}}\t{_when(rng, profile)}\t1\n'
+            )
+    elif table == "comments":
+        for i in range(start, stop):
+            author = parent_id(
+                seed, "author", i, sizes["users"], profile["comment_author_skew"]
+            )
+            element = parent_id(
+                seed,
+                "element",
+                i,
+                sizes["room_elements"],
+                profile["element_comment_skew"],
+            )
+            room = parent_id(seed, "room", element, sizes["rooms"])
+            write(
+                f"{i}\t{author}\t{room}\t{element}\t{_sentence(rng, 12)}\t\\N\t"
+                f"{_when(rng, profile)}\n"
+            )
+    elif table == "purchase_details":
+        statuses, weights = _weighted(profile["purchase_statuses"])
+        low, high = profile["cost_range"]
+        for i in range(start, stop):
+            element = parent_id(seed, "purchase", i, sizes["room_elements"])
+            status = rng.choices(statuses, weights)[0]
+            cost = f"{rng.uniform(low, high):.2f}"
+            write(
+                f"{i}\t{element}\t{status}\t{rng.choice(VENDORS)}\t{cost}\t\\N\t\\N\t"
+                f"{_when(rng, profile)}\t1\n"
+            )
+    else:
+        raise ValueError(f"Unknown table {table!r}")
+    return out.getvalue()
+
+
+# Worker processes: one connection each, reused for every chunk
+
+_worker = {}
+
+
+def _init_worker(dsn, replica):
+    conn = psycopg2.connect(dsn)
+    if replica:
+        with conn.cursor() as cur:
+            cur.execute("SET session_replication_role = replica")
+        conn.commit()
+    _worker["conn"] = conn
+
+
+def _copy_chunk(table, start, stop, seed, sizes, profile, hashed_password):
+    data = generate(table, start, stop, seed, sizes, profile, hashed_password)
+    conn = _worker["conn"]
+    with conn.cursor() as cur:
+        cur.copy_expert(f"COPY {table} ({TABLES[table]}) FROM STDIN", io.StringIO(data))
+    conn.commit()
+    return table, stop - start
+
+
+def _chunks(total):
+    for start in range(1, total + 1, CHUNK_ROWS):
+        yield start, min(total + 1, start + CHUNK_ROWS)
+
+
+def can_use_replica_role(conn):
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL session_replication_role = replica")
+        return True
+    except psycopg2.errors.InsufficientPrivilege:
+        return False
+    finally:
+        conn.rollback()
+
+
+def prepare(conn, truncate):
+    with conn.cursor() as cur:
+        if truncate:
+            cur.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+        else:
+            for table in TABLES:
+                cur.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+                if cur.fetchone()[0]:
+                    raise SystemExit(
+                        f"[ERROR] {table} is not empty; pass --truncate to replace "
+                        "its data"
+                    )
+    conn.commit()
+
+
+def set_triggers(conn, enabled):
+    action = "ENABLE" if enabled else "DISABLE"
+    with conn.cursor() as cur:
+        for table in NOTIFY_TABLES:
+            cur.execute(f"ALTER TABLE {table} {action} TRIGGER USER")
+    conn.commit()
+
+
+def finish(conn):
+    with conn.cursor() as cur:
+        for table in TABLES:
+            cur.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"COALESCE((SELECT max(id) FROM {table}), 0) + 1, false)"
+            )
+    conn.commit()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        for table in TABLES:
+            cur.execute(f"ANALYZE {table}")
+    conn.autocommit = False
+
+
+def load(dsn, users, seed=0, profile=None, workers=None, truncate=False, password=None):
+    """Load a dataset into the database at ``dsn``; returns a JSON-able report."""
+    import auth  # the hash must match what the app verifies
+
+    profile = {**DEFAULT_PROFILE, **(profile or {})}
+    workers = workers or os.cpu_count() or 1
+    sizes = counts(users, profile)
+    hashed_password = auth.get_password_hash(password or "perf-password")
+    conn = psycopg2.connect(dsn)
+    prepare(conn, truncate)
+    replica = can_use_replica_role(conn)
+    if not replica:
+        set_triggers(conn, enabled=False)
+    started = time.perf_counter()
+    tables = {}
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(dsn, replica)
+        ) as pool:
+            pending = []
+            for table in TABLES:
+                table_started = time.perf_counter()
+                futures = [
+                    pool.submit(
+                        _copy_chunk,
+                        table,
+                        start,
+                        stop,
+                        seed,
+                        sizes,
+                        profile,
+                        hashed_password,
+                    )
+                    for start, stop in _chunks(sizes[table])
+                ]
+                tables[table] = {
+                    "rows": sizes[table],
+                    "started": table_started,
+                    "seconds": 0.0,
+                }
+                if replica:
+                    # FK triggers are off too: every table can load at once
+                    pending.extend(futures)
+                else:
+                    wait(futures)
+                    for future in futures:
+                        future.result()
+                    tables[table]["seconds"] = time.perf_counter() - table_started
+            for future in pending:
+                table, _ = future.result()
+                tables[table]["seconds"] = (
+                    time.perf_counter() - tables[table]["started"]
+                )
+        finish(conn)
+    finally:
+        if not replica:
+            set_triggers(conn, enabled=True)
+        conn.close()
+    elapsed = time.perf_counter() - started
+    return {
+        "seed": seed,
+        "workers": workers,
+        "replica_role": replica,
+        "profile": profile,
+        "seconds": round(elapsed, 2),
+        "rows": sum(sizes.values()),
+        "rows_per_s": round(sum(sizes.values()) / elapsed),
+        "tables": {
+            table: {
+                "rows": info["rows"],
+                "seconds": round(info["seconds"], 2),
+            }
+            for table, info in tables.items()
+        },
+    }
+
+
+def libpq_dsn(url):
+    """postgresql+psycopg2://... -> postgresql://... for psycopg2.connect."""
+    scheme, sep, rest = url.partition("://")
+    return f"{scheme.split('+')[0]}{sep}{rest}"
+
+
+def main():
+    from database import get_test_database_url
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--profile", help="JSON file overriding DEFAULT_PROFILE")
+    parser.add_argument("--password", default="perf-password")
+    parser.add_argument("--dsn", default=get_test_database_url())
+    parser.add_argument(
+        "--truncate", action="store_true", help="Empty the tables first"
+    )
+    parser.add_argument("--output", help="Write the JSON report here too")
+    args = parser.parse_args()
+    if args.users < 1 or args.workers < 1:
+        parser.error("--users and --workers must be positive")
+    profile = {}
+    if args.profile:
+        with open(args.profile) as f:
+            profile = json.load(f)
+        unknown = set(profile) - set(DEFAULT_PROFILE)
+        if unknown:
+            parser.error(f"Unknown profile keys: {sorted(unknown)}")
+    print(
+        f"[INFO] Loading {counts(args.users, {**DEFAULT_PROFILE, **profile})} "
+        f"with {args.workers} workers",
+        file=sys.stderr,
+    )
+    report = load(
+        libpq_dsn(args.dsn),
+        args.users,
+        seed=args.seed,
+        profile=profile,
+        workers=args.workers,
+        truncate=args.truncate,
+        password=args.password,
+    )
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
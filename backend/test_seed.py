@@ -4,18 +4,15 @@ test_seed.py: Test data seeding for integration/E2E tests.
 - Seeds the test database with known users and data for integration/E2E tests
 - Should be run after DB migrations and before tests
 - Uses the same models and DB config as the backend
+- Passwords are hashed with auth.get_password_hash, so seeded users can log
+  in; run with PASSWORD_HASH_PROFILE=test to keep seeding fast
 """
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from models import User
 from database import get_test_database_url
-import hashlib
-
-
-def hash_password(password):
-    # Simple hash for test data (not for production)
-    return hashlib.sha256(password.encode()).hexdigest()
+from auth import get_password_hash
 
 
 def seed():
@@ -29,13 +26,13 @@ def seed():
     users = [
         User(
             email="testuser1@example.com",
-            hashed_password=hash_password("password1"),
+            hashed_password=get_password_hash("password1"),
             full_name="Test User 1",
             is_superuser=False,
         ),
         User(
             email="admin@example.com",
-            hashed_password=hash_password("adminpass"),
+            hashed_password=get_password_hash("adminpass"),
             full_name="Admin User",
             is_superuser=True,
         ),
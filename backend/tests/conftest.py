@@ -1,52 +1,185 @@
 import sys
 import os
-import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from fastapi.testclient import TestClient
-from database import Base
-from main import app
-
-# Ensure backend/ is on sys.path for imports
+
+# Ensure backend/ (and tests/, for helper modules) is on sys.path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(1, os.path.abspath(os.path.dirname(__file__)))
 
 # --- Test Database Setup ---
 
-# Use DATABASE_URL from env or fallback to a default test DB
-DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///test.db")
+# Fast lane default: one in-memory SQLite database shared (cache=shared) by
+# every connection in the process, including database.engine. Point
+# TEST_DATABASE_URL at a Postgres test database to run the same fixtures
+# against a real server (database.py prefers it under pytest too).
+FAST_DATABASE_URL = "sqlite:///file:anantam_tests?mode=memory&cache=shared&uri=true"
+os.environ.setdefault("DATABASE_URL", FAST_DATABASE_URL)
+DATABASE_URL = os.getenv("TEST_DATABASE_URL") or os.environ["DATABASE_URL"]
+# Minimum-cost bcrypt: registrations and logins take ~1ms instead of ~250ms
+os.environ.setdefault("PASSWORD_HASH_PROFILE", "test")
 
-# --- Test Database Setup ---
+import pytest  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+from sqlalchemy.orm import Session as OrmSession  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from main import app  # noqa: E402
+import auth  # noqa: E402
+import main  # noqa: E402
+import models  # noqa: E402
+import impact  # noqa: E402
+import sharding  # noqa: E402
+import timing  # noqa: E402
+
+# Test files that need a live Postgres (or the running stack): the slow lane
+SLOW_LANE_FILES = {
+    "test_migrations.py": "postgres",
+    "test_auth.py": "live_server",
+}
+
+
+def pytest_addoption(parser):
+    sharding.add_options(parser)
+    impact.add_options(parser)
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "postgres: needs a live PostgreSQL server")
+    config.addinivalue_line(
+        "markers", "live_server: needs the backend running on localhost:8000"
+    )
+    config.addinivalue_line("markers", "slow: takes seconds; skipped in the fast lane")
+    # Impact selection's trylast hook must run before sharding's, so shards
+    # split only the tests it kept; pluggy calls them in registration order
+    impact.configure(config)
+    sharding.configure(config)
+
+
+def pytest_collection_modifyitems(config, items):
+    # Fast lane: pytest -m "not postgres and not live_server and not slow"
+    for item in items:
+        filename = item.path.name
+        if filename.startswith("test_postgres_"):
+            item.add_marker(pytest.mark.postgres)
+        elif filename in SLOW_LANE_FILES:
+            item.add_marker(getattr(pytest.mark, SLOW_LANE_FILES[filename]))
+
+
+def _sqlite_savepoints(engine):
+    # pysqlite issues its own BEGIN/COMMIT, which breaks SAVEPOINT; let
+    # SQLAlchemy emit them instead
+    @event.listens_for(engine, "connect")
+    def do_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def do_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+
+def is_test_database(url):
+    """SQLite, an explicit TEST_DATABASE_URL or a database named *_test.
+
+    Inside the backend container DATABASE_URL is the app database, and the
+    session fixture drops every table when the run ends.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" or url == os.getenv("TEST_DATABASE_URL"):
+        return True
+    return (parsed.database or "").endswith("_test")
 
 
 @pytest.fixture(scope="session")
 def test_db_engine():
-    # Use a separate test DB (ensure DATABASE_URL points to a test DB!)
-    engine = create_engine(DATABASE_URL)
-    Base.metadata.create_all(bind=engine)
+    if not is_test_database(DATABASE_URL):
+        pytest.fail(
+            f"Refusing to create and drop tables in {make_url(DATABASE_URL)}: "
+            "set TEST_DATABASE_URL or use a database whose name ends in _test",
+            pytrace=False,
+        )
+    if DATABASE_URL.startswith("sqlite"):
+        engine = create_engine(
+            DATABASE_URL,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        _sqlite_savepoints(engine)
+    else:
+        engine = create_engine(DATABASE_URL)
+    timing.instrument_engine(engine)
+    models.Base.metadata.create_all(bind=engine)
     yield engine
-    Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def test_db_connection(test_db_engine):
+    with test_db_engine.connect() as connection:
+        yield connection
 
 
 @pytest.fixture(scope="function")
-def db_session(test_db_engine):
-    connection = test_db_engine.connect()
-    transaction = connection.begin()
-    Session = sessionmaker(bind=connection)
-    session = Session()
+def db_session(test_db_connection):
+    # Everything a test (and the app, via client) commits only releases a
+    # SAVEPOINT; the outer transaction is rolled back afterwards
+    transaction = test_db_connection.begin()
+    session = OrmSession(
+        bind=test_db_connection, join_transaction_mode="create_savepoint"
+    )
     yield session
     session.close()
     transaction.rollback()
-    connection.close()
 
 
 @pytest.fixture(scope="function")
-def client(db_session, monkeypatch):
-    # Patch get_db to use the test session
-    def override_get_db():
-        yield db_session
+def session_factory(db_session):
+    # For code that opens its own sessions (the app, background workers):
+    # each one joins the test's transaction through a SAVEPOINT
+    def factory():
+        return OrmSession(
+            bind=db_session.connection(), join_transaction_mode="create_savepoint"
+        )
+
+    return factory
+
 
-    app.dependency_overrides = {}
-    app.dependency_overrides["get_db"] = override_get_db
+@pytest.fixture(scope="session")
+def app_client():
+    # One TestClient (and app lifespan) for the whole run
     with TestClient(app) as c:
         yield c
-    app.dependency_overrides = {}
+
+
+@pytest.fixture(scope="function")
+def client(app_client, session_factory):
+    # Each request gets its own session on the test's connection
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    previous = app.dependency_overrides.copy()
+    app.dependency_overrides[main.get_db] = override_get_db
+    yield app_client
+    app.dependency_overrides = previous
+    app_client.cookies.clear()
+
+
+@pytest.fixture(scope="function")
+def api_user(db_session):
+    user = models.User(email="api@example.com", hashed_password="x")
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+
+@pytest.fixture(scope="function")
+def api_client(client, api_user):
+    # The shared client, authenticated as api_user
+    token = auth.create_access_token({"sub": str(api_user.id), "role": api_user.role})
+    client.headers["Authorization"] = f"Bearer {token}"
+    yield client
+    client.headers.pop("Authorization", None)
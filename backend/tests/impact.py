@@ -0,0 +1,253 @@
+"""
+impact.py: Run only the tests affected by a change (``pytest --impact-base``).
+
+- ``--impact-record`` measures every test with coverage.py (one dynamic
+  context per test) and writes the map to --impact-map: the backend files
+  each test executed, plus the sha256 of every backend source file
+- ``--impact-base REF`` (git diff against the merge base with REF, plus
+  uncommitted and untracked files) and/or ``--impact-changed a.py,b.py``
+  name the changed files; files whose hash differs from the map count as
+  changed too, so edits made after recording are never missed
+- Selected: tests that executed a changed file, every test in a changed
+  test module, tests the map has never seen and live_server tests (their
+  code runs in another process, out of coverage's sight)
+- Falls back to the full run, saying why, when the map is missing or stale
+  (over --impact-max-stale of the files changed since recording), or when a
+  changed file cannot be mapped: non-Python files, conftest.py and modules
+  only executed at import time, such as models.py or schemas.py
+- Runs before tests/sharding.py, so shards split the selected tests
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+from datetime import datetime, timezone
+
+import pytest
+
+from sharding import item_key
+
+VERSION = 1
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_MAP = os.path.abspath(
+    os.path.join(BACKEND_DIR, "..", ".test-history", "impact.json")
+)
+SKIP_DIRS = {".venv", "venv", "node_modules", "__pycache__", ".pytest_cache"}
+# Changes here affect every test: always a full run
+GLOBAL_FILES = {"tests/conftest.py", "tests/impact.py", "tests/sharding.py"}
+
+
+def source_files():
+    """Backend *.py files, relative to backend/."""
+    found = []
+    for root, dirs, files in os.walk(BACKEND_DIR):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for name in files:
+            if name.endswith(".py"):
+                path = os.path.join(root, name)
+                found.append(os.path.relpath(path, BACKEND_DIR))
+    return sorted(found)
+
+
+def file_hash(relpath):
+    try:
+        with open(os.path.join(BACKEND_DIR, relpath), "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def git_changed_files(base):
+    """Files changed since the merge base with `base`, relative to backend/."""
+
+    def git(*args):
+        return subprocess.run(
+            ["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.split("\n")
+
+    merge_base = git("merge-base", base, "HEAD")[0]
+    changed = git("diff", "--name-only", "--relative", merge_base)
+    changed += git("ls-files", "--others", "--exclude-standard")
+    return {path for path in changed if path}
+
+
+def load_map(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return data if data.get("version") == VERSION else None
+
+
+def select(impact_map, changed, keys, live, max_stale=0.3):
+    """Returns (selected keys, None) or (None, reason for a full run).
+
+    `keys` are the collected tests (sharding.item_key form) and `live` the
+    subset marked live_server; `changed` holds paths relative to backend/.
+    """
+    if impact_map is None:
+        return None, "no impact map recorded"
+    recorded = impact_map["files"]
+    drifted = {path for path, sha in recorded.items() if file_hash(path) != sha}
+    if recorded and len(drifted) / len(recorded) > max_stale:
+        return None, f"impact map is stale ({len(drifted)} files changed)"
+    changed = set(changed) | drifted | (set(source_files()) - set(recorded))
+
+    files_to_tests = {}
+    for test, files in impact_map["tests"].items():
+        for path in files:
+            files_to_tests.setdefault(path, set()).add(test)
+
+    selected = set(live) | {key for key in keys if key not in impact_map["tests"]}
+    for path in sorted(changed):
+        module = os.path.splitext(os.path.basename(path))[0]
+        if path in GLOBAL_FILES:
+            return None, f"{path} affects every test"
+        if path.startswith("tests/test_") and path.endswith(".py"):
+            selected |= {key for key in keys if key.split("::")[0] == module}
+        elif path in files_to_tests:
+            selected |= files_to_tests[path]
+        elif path.endswith(".py") and file_hash(path) is None:
+            continue  # deleted; its importers changed too or fail loudly
+        else:
+            return None, f"no test coverage recorded for {path}"
+    return selected & set(keys), None
+
+
+def add_options(parser):
+    group = parser.getgroup("impact", "test impact selection")
+    group.addoption(
+        "--impact-record",
+        action="store_true",
+        help="Record which backend files each test executes (needs coverage)",
+    )
+    group.addoption(
+        "--impact-base",
+        metavar="REF",
+        help="Run only tests affected by changes since the merge base with REF",
+    )
+    group.addoption(
+        "--impact-changed",
+        metavar="FILES",
+        help="Comma-separated changed files (relative to backend/) to select by",
+    )
+    group.addoption(
+        "--impact-map",
+        default=os.getenv("TEST_IMPACT_MAP", DEFAULT_MAP),
+        help="Impact map JSON written by --impact-record",
+    )
+    group.addoption(
+        "--impact-max-stale",
+        type=float,
+        default=0.3,
+        help="Full run if more than this share of files changed since recording",
+    )
+
+
+def configure(config):
+    if config.getoption("impact_record"):
+        config.pluginmanager.register(
+            ImpactRecorder(config.getoption("impact_map")), "impact-recorder"
+        )
+    elif config.getoption("impact_base") or config.getoption("impact_changed"):
+        config.pluginmanager.register(ImpactSelector(config), "impact-selector")
+
+
+class ImpactSelector:
+    def __init__(self, config):
+        self.map_path = config.getoption("impact_map")
+        self.base = config.getoption("impact_base")
+        self.changed = {
+            path.strip()
+            for path in (config.getoption("impact_changed") or "").split(",")
+            if path.strip()
+        }
+        self.max_stale = config.getoption("impact_max_stale")
+        self.summary = ""
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, config, items):
+        changed = set(self.changed)
+        if self.base:
+            try:
+                changed |= git_changed_files(self.base)
+            except (OSError, subprocess.CalledProcessError) as exc:
+                self.summary = f"impact: full run (git diff failed: {exc})"
+                return
+        keys = [item_key(item.nodeid) for item in items]
+        live = {
+            k for k, item in zip(keys, items) if item.get_closest_marker("live_server")
+        }
+        selected, reason = select(
+            load_map(self.map_path), changed, keys, live, self.max_stale
+        )
+        if selected is None:
+            self.summary = f"impact: full run ({reason})"
+            return
+        chosen = [item for key, item in zip(keys, items) if key in selected]
+        deselected = [item for key, item in zip(keys, items) if key not in selected]
+        items[:] = chosen
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+        self.summary = (
+            f"impact: {len(chosen)} of {len(keys)} tests affected by "
+            f"{len(changed)} changed files"
+        )
+
+    def pytest_report_collectionfinish(self, config, start_path, items):
+        return self.summary
+
+
+class ImpactRecorder:
+    def __init__(self, map_path):
+        try:
+            import coverage
+        except ImportError:
+            raise pytest.UsageError("--impact-record needs coverage installed")
+        self.map_path = map_path
+        self.coverage = coverage.Coverage(
+            data_file=None,
+            config_file=False,
+            include=[os.path.join(BACKEND_DIR, "*")],
+            omit=[os.path.join(BACKEND_DIR, d, "*") for d in SKIP_DIRS],
+        )
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtestloop(self, session):
+        self.coverage.start()
+        try:
+            yield
+        finally:
+            self.coverage.stop()
+        self.write(session)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        self.coverage.switch_context(item_key(item.nodeid))
+        yield
+
+    def write(self, session):
+        data = self.coverage.get_data()
+        tests = {item_key(item.nodeid): set() for item in session.items}
+        for path in data.measured_files():
+            relpath = os.path.relpath(path, BACKEND_DIR)
+            for contexts in data.contexts_by_lineno(path).values():
+                for context in contexts:
+                    if context in tests:
+                        tests[context].add(relpath)
+        impact_map = {
+            "version": VERSION,
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "files": {path: file_hash(path) for path in source_files()},
+            "tests": {test: sorted(files) for test, files in sorted(tests.items())},
+        }
+        os.makedirs(os.path.dirname(self.map_path), exist_ok=True)
+        with open(self.map_path, "w") as f:
+            json.dump(impact_map, f, indent=1)
+        reporter = session.config.pluginmanager.get_plugin("terminalreporter")
+        if reporter:
+            reporter.write_line(
+                f"impact: recorded {len(tests)} tests to {self.map_path}"
+            )
@@ -0,0 +1,169 @@
+"""
+migration_harness.py: In-process Alembic runs for the migration tests.
+
+- upgrade()/downgrade() call alembic.command on an open connection (env.py
+  reuses it), so there are no subprocesses and no extra engines. Pass
+  script_location to run a copy of migrations/ with extra test revisions
+- migrate_to_head() restores a cached ``pg_dump --schema-only`` snapshot when
+  one exists for the current revision hash (a digest of env.py and every
+  file in migrations/versions), otherwise upgrades and caches a new one.
+  Snapshots live in MIGRATION_SNAPSHOT_DIR (default: <tmp>/anantam-migration-
+  snapshots); editing any migration changes the hash and forces a real run
+- schema_diff() compares the live schema with models metadata in one
+  autogenerate pass; an empty list means migrations and models agree
+- Without a pg_dump/psql at least as new as the server, the cache is skipped
+  and every call migrates
+"""
+
+import glob
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+
+import models
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+ALEMBIC_CONFIG = os.path.join(BACKEND_DIR, "alembic.ini")
+MIGRATIONS_DIR = os.path.join(BACKEND_DIR, "migrations")
+SNAPSHOT_DIR = os.getenv(
+    "MIGRATION_SNAPSHOT_DIR",
+    os.path.join(tempfile.gettempdir(), "anantam-migration-snapshots"),
+)
+
+
+def alembic_config(connection, script_location=MIGRATIONS_DIR):
+    config = Config(ALEMBIC_CONFIG)
+    config.set_main_option("script_location", str(script_location))
+    config.attributes["connection"] = connection
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def upgrade(engine, revision="head", script_location=MIGRATIONS_DIR):
+    # Alembic commits each revision itself (see online_migrations)
+    with engine.connect() as connection:
+        command.upgrade(alembic_config(connection, script_location), revision)
+        connection.commit()
+
+
+def downgrade(engine, revision="base", script_location=MIGRATIONS_DIR):
+    # Alembic commits each revision itself (see online_migrations)
+    with engine.connect() as connection:
+        command.downgrade(alembic_config(connection, script_location), revision)
+        connection.commit()
+
+
+def head():
+    return ScriptDirectory.from_config(alembic_config(None)).get_current_head()
+
+
+def revision_hash():
+    digest = hashlib.sha256()
+    files = [os.path.join(MIGRATIONS_DIR, "env.py")]
+    files += sorted(glob.glob(os.path.join(MIGRATIONS_DIR, "versions", "*.py")))
+    for path in files:
+        digest.update(os.path.relpath(path, MIGRATIONS_DIR).encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def snapshot_path():
+    return os.path.join(SNAPSHOT_DIR, f"{head()}-{revision_hash()[:16]}.sql")
+
+
+def _libpq_url(engine):
+    return engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def _client_major(tool):
+    path = shutil.which(tool)
+    if path is None:
+        return None
+    output = subprocess.run([path, "--version"], capture_output=True, text=True)
+    match = re.search(r"(\d+)(?:\.\d+)?", output.stdout)
+    return int(match.group(1)) if match else None
+
+
+def snapshots_supported(engine):
+    """pg_dump refuses servers newer than itself, so check both tools."""
+    if engine.dialect.name != "postgresql":
+        return False
+    with engine.connect() as connection:
+        server = int(connection.exec_driver_sql("SHOW server_version_num").scalar())
+    majors = [_client_major("pg_dump"), _client_major("psql")]
+    return all(major is not None and major >= server // 10000 for major in majors)
+
+
+def reset_schema(engine):
+    with engine.begin() as connection:
+        connection.execute(text("DROP SCHEMA public CASCADE"))
+        connection.execute(text("CREATE SCHEMA public"))
+
+
+def dump_schema(engine, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f"{path}.{os.getpid()}.tmp"
+    subprocess.run(
+        [
+            "pg_dump",
+            "--schema-only",
+            "--no-owner",
+            "--no-privileges",
+            f"--file={partial}",
+            f"--dbname={_libpq_url(engine)}",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    os.replace(partial, path)
+
+
+def restore_schema(engine, path):
+    reset_schema(engine)
+    subprocess.run(
+        [
+            "psql",
+            "--no-psqlrc",
+            "--quiet",
+            "--set=ON_ERROR_STOP=1",
+            f"--file={path}",
+            f"--dbname={_libpq_url(engine)}",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    # --schema-only leaves alembic_version empty
+    with engine.begin() as connection:
+        command.stamp(alembic_config(connection), "head")
+
+
+def migrate_to_head(engine):
+    """Bring an empty database to head; returns "snapshot" or "migrated"."""
+    use_cache = snapshots_supported(engine)
+    path = snapshot_path()
+    if use_cache and os.path.exists(path):
+        restore_schema(engine, path)
+        return "snapshot"
+    upgrade(engine)
+    if use_cache:
+        dump_schema(engine, path)
+    return "migrated"
+
+
+def schema_diff(engine):
+    with engine.connect() as connection:
+        context = MigrationContext.configure(
+            connection, opts={"compare_type": True, "compare_server_default": False}
+        )
+        return compare_metadata(context, models.Base.metadata)
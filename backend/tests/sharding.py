@@ -0,0 +1,155 @@
+"""
+sharding.py: Duration-balanced test shards (``pytest --shard i/N``).
+
+- Each collected test is weighted by its p50 duration from --shard-durations
+  (written by scripts/check_flaky_tests.py --export-durations). A test with
+  no history gets the median of its module's known tests, else the median
+  of all known tests, else DEFAULT_DURATION
+- Tests are assigned longest first to the least-loaded shard (greedy LPT).
+  The result depends only on the collected tests and the durations file, so
+  every shard of a CI matrix computes the same partition
+- Sharding runs after -m/-k deselection, so only tests that will actually
+  run are split
+- Durations are keyed as "<module>::<class>::<test>", which JUnit ids
+  ("tests.test_x.TestY.test_z") and node ids ("tests/test_x.py::TestY::
+  test_z") both reduce to, wherever pytest was started from
+"""
+
+import heapq
+import json
+import os
+import statistics
+
+import pytest
+
+DEFAULT_DURATION = 1.0
+DEFAULT_DURATIONS_FILE = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__), "..", "..", ".test-history", "durations.json"
+    )
+)
+
+
+def parse_shard(text):
+    """'2/4' -> (2, 4); shards are numbered from 1."""
+    try:
+        index, total = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"--shard must look like I/N, got {text!r}") from None
+    if not 1 <= index <= total:
+        raise ValueError(f"--shard {text}: I must be between 1 and N")
+    return index, total
+
+
+def _is_module(part):
+    return part.startswith("test_") or part.endswith("_test")
+
+
+def junit_key(test_id):
+    """'tests.test_x.TestY.test_z[a.b]' -> 'test_x::TestY::test_z[a.b]'."""
+    base, bracket, params = test_id.partition("[")
+    parts = base.split(".")
+    modules = [i for i, part in enumerate(parts[:-1]) if _is_module(part)]
+    start = modules[-1] if modules else max(len(parts) - 2, 0)
+    parts = parts[start:]
+    return "::".join(parts) + bracket + params
+
+
+def item_key(nodeid):
+    """'tests/test_x.py::TestY::test_z[a]' -> 'test_x::TestY::test_z[a]'."""
+    path, *rest = nodeid.split("::")
+    module = os.path.splitext(os.path.basename(path))[0]
+    return "::".join([module, *rest])
+
+
+def load_durations(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return {junit_key(test): float(s) for test, s in data["durations"].items()}
+
+
+def weigh(keys, known):
+    """Duration for every key, filling in defaults for tests with no history."""
+    by_module = {}
+    for key, seconds in known.items():
+        by_module.setdefault(key.split("::")[0], []).append(seconds)
+    overall = statistics.median(known.values()) if known else DEFAULT_DURATION
+    weights = {}
+    for key in keys:
+        if key in known:
+            weights[key] = known[key]
+        else:
+            module = by_module.get(key.split("::")[0])
+            weights[key] = statistics.median(module) if module else overall
+    return weights
+
+
+def partition(weights, total):
+    """Greedy LPT: returns `total` lists of keys with near-equal summed weight."""
+    shards = [[] for _ in range(total)]
+    heap = [(0.0, i) for i in range(total)]
+    for key in sorted(weights, key=lambda k: (-weights[k], k)):
+        load, i = heapq.heappop(heap)
+        shards[i].append(key)
+        heapq.heappush(heap, (load + weights[key], i))
+    return shards
+
+
+def add_options(parser):
+    parser.addoption(
+        "--shard",
+        default=None,
+        metavar="I/N",
+        help="Run only shard I of N, balanced by historical test durations",
+    )
+    parser.addoption(
+        "--shard-durations",
+        default=os.getenv("TEST_DURATIONS_FILE", DEFAULT_DURATIONS_FILE),
+        help="Durations JSON from check_flaky_tests.py --export-durations",
+    )
+
+
+def configure(config):
+    shard = config.getoption("shard")
+    if not shard:
+        return
+    try:
+        index, total = parse_shard(shard)
+    except ValueError as exc:
+        raise pytest.UsageError(str(exc))
+    plugin = ShardPlugin(index, total, config.getoption("shard_durations"))
+    config.pluginmanager.register(plugin, "sharding")
+
+
+class ShardPlugin:
+    def __init__(self, index, total, durations_path):
+        self.index = index
+        self.total = total
+        self.durations_path = durations_path
+        self.expected = 0.0
+        self.history = 0
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, config, items):
+        # Same-named modules in different directories share a key (and shard)
+        keys = [item_key(item.nodeid) for item in items]
+        known = load_durations(self.durations_path)
+        weights = weigh(set(keys), known)
+        mine = set(partition(weights, self.total)[self.index - 1])
+        self.expected = sum(weights[key] for key in mine)
+        self.history = len(set(keys) & known.keys())
+        selected = [item for key, item in zip(keys, items) if key in mine]
+        deselected = [item for key, item in zip(keys, items) if key not in mine]
+        items[:] = selected
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+
+    def pytest_report_collectionfinish(self, config, start_path, items):
+        return (
+            f"shard {self.index}/{self.total}: {len(items)} tests, "
+            f"~{self.expected:.1f}s expected ({self.history} tests with history "
+            f"in {self.durations_path})"
+        )
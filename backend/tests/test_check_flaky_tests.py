@@ -0,0 +1,81 @@
+import importlib.util
+import os
+import tracemalloc
+
+SCRIPT = os.path.join(
+    os.path.dirname(__file__), "..", "..", "scripts", "check_flaky_tests.py"
+)
+spec = importlib.util.spec_from_file_location("check_flaky_tests", SCRIPT)
+check_flaky_tests = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(check_flaky_tests)
+
+REPORT = """<?xml version="1.0" encoding="utf-8"?>
+<testsuites>
+  <testsuite name="pytest" timestamp="2026-01-02T03:04:05" tests="4">
+    <properties><property name="python" value="3.12"/></properties>
+    <testcase classname="tests.test_a" name="test_ok" time="0.5"/>
+    <testcase classname="tests.test_a" name="test_broken" time="1.25">
+      <failure message="boom">Traceback</failure>
+    </testcase>
+    <testcase classname="tests.test_b" name="test_error" time="0.1">
+      <error message="fixture"/>
+    </testcase>
+    <testcase classname="tests.test_b" name="test_skip" time="">
+      <skipped message="no db"/>
+    </testcase>
+  </testsuite>
+</testsuites>
+"""
+
+
+def test_iter_testcases_reads_each_outcome(tmp_path):
+    path = tmp_path / "backend-junit.xml"
+    path.write_text(REPORT)
+    assert list(check_flaky_tests.iter_testcases(str(path))) == [
+        ("2026-01-02T03:04:05", "tests.test_a.test_ok", "passed", 0.5),
+        ("2026-01-02T03:04:05", "tests.test_a.test_broken", "failed", 1.25),
+        ("2026-01-02T03:04:05", "tests.test_b.test_error", "failed", 0.1),
+        ("2026-01-02T03:04:05", "tests.test_b.test_skip", "skipped", 0.0),
+    ]
+
+
+def test_iter_testcases_memory_stays_flat(tmp_path):
+    path = tmp_path / "huge-junit.xml"
+    case = '<testcase classname="tests.test_big" name="test_{}" time="0.01"/>\n'
+    with open(path, "w") as f:
+        f.write('<testsuites><testsuite name="pytest">\n')
+        for i in range(50_000):
+            f.write(case.format(i))
+        f.write("</testsuite></testsuites>\n")
+
+    tracemalloc.start()
+    try:
+        count = sum(1 for _ in check_flaky_tests.iter_testcases(str(path)))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert count == 50_000
+    # Keeping every <testcase> would take tens of MiB
+    assert peak < 2 * 1024 * 1024, f"peak {peak / 2**20:.1f} MiB"
+
+
+def test_summarize_scores_flips_and_regressions():
+    runs = [("passed", 1.0), ("failed", 1.0), ("passed", 1.0), ("passed", 1.0)]
+    runs += [("passed", 2.0)] * 3
+    stats = check_flaky_tests.summarize(runs, recent=3)
+    assert stats["runs"] == 7
+    assert stats["failures"] == 1
+    assert stats["failure_rate"] == round(1 / 7, 3)
+    assert stats["flakiness"] == round(2 / 6, 3)
+    assert stats["recent_failures"] == 0
+    assert stats["regression"]["before_s"] == 1.0
+    assert stats["regression"]["after_s"] == 2.0
+
+    broken = check_flaky_tests.summarize([("failed", 0.5)] * 3, recent=3)
+    assert broken["flakiness"] == 0.0
+    assert broken["recent_failures"] == 3
+    assert broken["regression"] is None
+
+    # Nearest-rank percentiles, the same as the perf scripts report
+    timed = check_flaky_tests.summarize([("passed", d) for d in (4, 1, 3, 2)], 3)
+    assert (timed["p50_s"], timed["p95_s"]) == (2, 4)
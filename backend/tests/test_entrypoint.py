@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+import entrypoint
+
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), "..", "alembic.ini")
+
+
+def test_migrates_once_then_skips_alembic(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'entrypoint.db'}"
+    assert entrypoint.migrate(url, ALEMBIC_INI, log_sql=False) == "migrated"
+
+    def no_upgrade(config, connection):
+        pytest.fail("Alembic ran although the database was at head")
+
+    monkeypatch.setattr(entrypoint, "upgrade", no_upgrade)
+    assert entrypoint.migrate(url, ALEMBIC_INI, log_sql=False) == "at-head"
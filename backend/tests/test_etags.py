@@ -0,0 +1,84 @@
+import pytest
+
+import main
+import models
+
+
+def test_users_me_returns_304_when_etag_matches(api_client):
+    client = api_client
+    first = client.get("/users/me")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    second = client.get("/users/me", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["ETag"] == etag
+
+    weak = client.get("/users/me", headers={"If-None-Match": f"W/{etag}"})
+    assert weak.status_code == 304
+
+
+def test_update_changes_etag(api_client):
+    client = api_client
+    etag = client.get("/users/me").headers["ETag"]
+    updated = client.patch(
+        "/users/me", json={"full_name": "New Name"}, headers={"If-Match": etag}
+    )
+    assert updated.status_code == 200
+    assert updated.json()["full_name"] == "New Name"
+    assert updated.headers["ETag"] != etag
+    assert client.get("/users/me", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_stale_if_match_is_rejected(api_client):
+    client = api_client
+    home = client.post("/homes/", json={"name": "Lake House"})
+    assert home.status_code == 201
+    home_id = home.json()["id"]
+    etag = home.headers["ETag"]
+
+    first = client.patch(
+        f"/homes/{home_id}", json={"name": "Edit A"}, headers={"If-Match": etag}
+    )
+    assert first.status_code == 200
+    second = client.patch(
+        f"/homes/{home_id}", json={"name": "Edit B"}, headers={"If-Match": etag}
+    )
+    assert second.status_code == 412
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert client.get(f"/homes/{home_id}").json()["name"] == "Edit A"
+
+
+def test_lost_update_race_is_a_conflict(api_client, session_factory):
+    home_id = api_client.post("/homes/", json={"name": "Race"}).json()["id"]
+    stale = session_factory()
+    home = stale.query(models.Home).filter_by(id=home_id).one()
+
+    # Another writer gets in between this session's read and its commit
+    assert api_client.patch(f"/homes/{home_id}", json={"name": "A"}).status_code == 200
+    home.name = "B"
+    with pytest.raises(main.HTTPException) as exc:
+        main.etags.commit_versioned(stale)
+    assert exc.value.status_code == 409
+    stale.close()
+
+
+def test_null_for_a_required_field_is_a_validation_error(api_client):
+    created = api_client.post(
+        "/homes/", json={"name": "Lake House", "address": "1 Shore Rd"}
+    )
+    home_id = created.json()["id"]
+    etag = created.headers["ETag"]
+
+    rejected = api_client.patch(
+        f"/homes/{home_id}", json={"name": None}, headers={"If-Match": etag}
+    )
+    assert rejected.status_code == 422
+    # Nullable fields can still be cleared, and the rejected edit changed nothing
+    cleared = api_client.patch(
+        f"/homes/{home_id}", json={"address": None}, headers={"If-Match": etag}
+    )
+    assert cleared.status_code == 200
+    assert cleared.json()["name"] == "Lake House"
+    assert cleared.json()["address"] is None
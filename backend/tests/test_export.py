@@ -0,0 +1,143 @@
+import io
+import json
+import zipfile
+
+import export
+import models
+
+
+def seed_home(session, tmp_path, n_rooms=3, n_elements=4):
+    owner = models.User(email="owner@example.com", hashed_password="x")
+    session.add(owner)
+    session.flush()
+    home = models.Home(name="Lake House", owner_id=owner.id)
+    session.add(home)
+    session.flush()
+    for r in range(n_rooms):
+        room = models.Room(home_id=home.id, name=f"Room {r}")
+        session.add(room)
+        session.flush()
+        session.add(models.Comment(user_id=owner.id, room_id=room.id, content="hi"))
+        for e in range(n_elements):
+            element = models.RoomElement(room_id=room.id, name=f"Element {e}")
+            session.add(element)
+            session.flush()
+            session.add(
+                models.PurchaseDetail(element_id=element.id, vendor="V", cost=10)
+            )
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(b"\xff\xd8" + b"x" * 5000)
+    session.add(
+        models.Attachment(home_id=home.id, file_path=str(photo), filename="photo.jpg")
+    )
+    session.add(
+        models.Attachment(
+            home_id=home.id, file_path="missing.png", filename="missing.png"
+        )
+    )
+    session.commit()
+    return home.id
+
+
+def read_archive(chunks):
+    return zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+
+
+def ndjson(archive, member):
+    return [json.loads(line) for line in archive.read(member).splitlines()]
+
+
+def test_export_contains_all_entities(db_session, tmp_path):
+    home_id = seed_home(db_session, tmp_path)
+    archive = read_archive(
+        export.iter_home_export(
+            db_session.connection(), home_id, attachments_dir=str(tmp_path)
+        )
+    )
+    assert ndjson(archive, "home.ndjson")[0]["name"] == "Lake House"
+    assert len(ndjson(archive, "rooms.ndjson")) == 3
+    assert len(ndjson(archive, "elements.ndjson")) == 12
+    assert len(ndjson(archive, "comments.ndjson")) == 3
+    assert len(ndjson(archive, "purchases.ndjson")) == 12
+    assert len(ndjson(archive, "attachments.ndjson")) == 2
+    photo = [n for n in archive.namelist() if n.endswith("photo.jpg")]
+    assert len(photo) == 1
+    assert archive.read(photo[0]).startswith(b"\xff\xd8")
+    # Attachments missing on disk are listed but not embedded
+    assert not any(n.endswith("missing.png") for n in archive.namelist())
+
+
+def test_export_streams_in_bounded_chunks(db_session, tmp_path):
+    home_id = seed_home(db_session, tmp_path, n_rooms=20, n_elements=50)
+    chunks = list(
+        export.iter_home_export(
+            db_session.connection(),
+            home_id,
+            chunk_size=1024,
+            attachments_dir=str(tmp_path),
+        )
+    )
+    assert len(chunks) > 1
+    assert read_archive(chunks).testzip() is None
+
+
+def test_export_unknown_home_is_empty_archive(db_session):
+    archive = read_archive(export.iter_home_export(db_session.connection(), 12345))
+    assert archive.read("home.ndjson") == b""
+
+
+def test_attachments_outside_the_directory_are_skipped(db_session, tmp_path, capsys):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    (uploads / "plan.pdf").write_bytes(b"%PDF")
+    secret = tmp_path / "secret.env"
+    secret.write_text("SECRET_KEY=hunter2")
+    (uploads / "link.txt").symlink_to(secret)
+    home_id = seed_home(db_session, tmp_path, n_rooms=0)
+    for file_path in ["plan.pdf", "../secret.env", str(secret), "link.txt"]:
+        db_session.add(
+            models.Attachment(home_id=home_id, file_path=file_path, filename="f")
+        )
+    db_session.commit()
+
+    archive = read_archive(
+        export.iter_home_export(
+            db_session.connection(), home_id, attachments_dir=str(uploads)
+        )
+    )
+    files = [n for n in archive.namelist() if n.startswith("attachments/")]
+    assert [archive.read(n) for n in files] == [b"%PDF"]
+    warnings = capsys.readouterr().out
+    assert warnings.count("is outside the attachments directory") == 4
+    assert "secret.env" in warnings
+
+
+def test_export_endpoint_streams_an_owned_home(
+    api_client, db_session, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(export, "ATTACHMENTS_DIR", str(tmp_path))
+    (tmp_path / "plan.pdf").write_bytes(b"%PDF")
+    home_id = api_client.post("/homes/", json={"name": "Lake House"}).json()["id"]
+    db_session.add(
+        models.Attachment(home_id=home_id, file_path="plan.pdf", filename="plan.pdf")
+    )
+    db_session.commit()
+
+    response = api_client.get("/export/", params={"home_id": home_id})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert f"home-{home_id}-export.zip" in response.headers["content-disposition"]
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert ndjson(archive, "home.ndjson")[0]["name"] == "Lake House"
+    assert [n for n in archive.namelist() if n.endswith("plan.pdf")]
+
+
+def test_export_endpoint_rejects_other_users_homes(api_client, db_session):
+    other = models.User(email="other@example.com", hashed_password="x")
+    db_session.add(other)
+    db_session.flush()
+    home = models.Home(name="Not yours", owner_id=other.id)
+    db_session.add(home)
+    db_session.commit()
+    assert api_client.get("/export/", params={"home_id": home.id}).status_code == 403
+    assert api_client.get("/export/", params={"home_id": 999999}).status_code == 404
@@ -0,0 +1,32 @@
+import pytest
+
+import models
+from tests.conftest import is_test_database
+
+
+def test_client_requests_use_the_test_session(client, db_session):
+    response = client.post(
+        "/auth/register",
+        json={"email": "fast@example.com", "password": "password123"},
+    )
+    assert response.status_code == 200
+    user = db_session.query(models.User).filter_by(email="fast@example.com").one()
+    assert user.id == response.json()["id"]
+
+
+@pytest.mark.parametrize("run", [1, 2])
+def test_commits_are_rolled_back_after_each_test(db_session, run):
+    assert db_session.query(models.User).count() == 0
+    db_session.add(models.User(email="rollback@example.com", hashed_password="x"))
+    db_session.commit()
+    assert db_session.query(models.User).count() == 1
+
+
+def test_only_test_databases_are_created_and_dropped(monkeypatch):
+    monkeypatch.delenv("TEST_DATABASE_URL", raising=False)
+    assert is_test_database("sqlite://")
+    assert is_test_database("postgresql://u:p@db:5432/anantam_test")
+    # The app database inside the backend container
+    assert not is_test_database("postgresql://u:p@db:5432/anantam")
+    monkeypatch.setenv("TEST_DATABASE_URL", "postgresql://u:p@db:5432/scratch")
+    assert is_test_database("postgresql://u:p@db:5432/scratch")
@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import auth
+import main
+import models
+import test_seed
+
+
+def test_profiles_verify_each_other_and_flag_low_cost_hashes():
+    fast = auth.make_password_context("test")
+    production = auth.make_password_context("production")
+    low_cost = fast.hash("pw")
+    assert ",r=4$" in low_cost
+    assert production.verify("pw", low_cost)
+    assert production.needs_update(low_cost)
+    assert not fast.needs_update(low_cost)
+    with pytest.raises(ValueError):
+        auth.make_password_context("plaintext")
+
+
+def test_login_upgrades_low_cost_hashes(client, db_session, monkeypatch, capsys):
+    low_cost = auth.make_password_context("test").hash("rehash-secret")
+    user = models.User(email="rehash@example.com", hashed_password=low_cost)
+    db_session.add(user)
+    db_session.commit()
+    monkeypatch.setattr(auth, "pwd_context", auth.make_password_context("production"))
+
+    wrong = client.post(
+        "/auth/login", data={"username": "rehash@example.com", "password": "nope"}
+    )
+    assert wrong.status_code == 401
+    db_session.refresh(user)
+    assert user.hashed_password == low_cost
+
+    response = client.post(
+        "/auth/login",
+        data={"username": "rehash@example.com", "password": "rehash-secret"},
+    )
+    assert response.status_code == 200
+    db_session.refresh(user)
+    assert f",r={auth.PRODUCTION_ROUNDS}$" in user.hashed_password
+    assert not auth.password_needs_rehash(user.hashed_password)
+    assert auth.verify_password("rehash-secret", user.hashed_password)
+    # The plaintext password must never reach stdout or the logs
+    assert "rehash-secret" not in capsys.readouterr().out
+
+
+def test_seeded_users_can_log_in(app_client, tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'seed.db'}"
+    engine = create_engine(url)
+    models.Base.metadata.create_all(engine)
+    monkeypatch.setenv("TEST_DATABASE_URL", url)
+    test_seed.seed()
+
+    Session = sessionmaker(bind=engine)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setitem(main.app.dependency_overrides, main.get_db, override_get_db)
+    response = app_client.post(
+        "/auth/login",
+        data={"username": "testuser1@example.com", "password": "password1"},
+    )
+    assert response.status_code == 200
+    assert response.json()["access_token"]
+    engine.dispose()
@@ -0,0 +1,49 @@
+import impact
+
+KEYS = ["test_a::t1", "test_a::t2", "test_b::t1", "test_live::t1", "test_new::t1"]
+
+
+def recorded_map(**overrides):
+    files = {path: impact.file_hash(path) for path in impact.source_files()}
+    files.update(overrides)
+    return {
+        "version": impact.VERSION,
+        "files": files,
+        "tests": {
+            "test_a::t1": ["auth.py", "main.py"],
+            "test_a::t2": ["etags.py"],
+            "test_b::t1": ["realtime.py"],
+            "test_live::t1": [],
+        },
+    }
+
+
+def test_selects_tests_that_ran_the_changed_files():
+    selected, reason = impact.select(
+        recorded_map(), {"auth.py"}, KEYS, live={"test_live::t1"}
+    )
+    assert reason is None
+    # test_new::t1 is not in the map yet, live tests always run
+    assert selected == {"test_a::t1", "test_live::t1", "test_new::t1"}
+    selected, _ = impact.select(recorded_map(), {"tests/test_a.py"}, KEYS, live=set())
+    assert selected == {"test_a::t1", "test_a::t2", "test_new::t1"}
+
+
+def test_edits_after_recording_count_as_changes():
+    selected, _ = impact.select(
+        recorded_map(**{"realtime.py": "0" * 64}), set(), KEYS, live=set()
+    )
+    assert selected == {"test_b::t1", "test_new::t1"}
+
+
+def test_falls_back_to_full_run():
+    assert impact.select(None, {"auth.py"}, KEYS, set()) == (
+        None,
+        "no impact map recorded",
+    )
+    for changed in ("models.py", "alembic.ini", "tests/conftest.py"):
+        selected, reason = impact.select(recorded_map(), {changed}, KEYS, set())
+        assert selected is None and changed in reason
+    stale = recorded_map(**dict.fromkeys(impact.source_files(), "0" * 64))
+    selected, reason = impact.select(stale, set(), KEYS, set())
+    assert selected is None and "stale" in reason
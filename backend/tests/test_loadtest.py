@@ -0,0 +1,68 @@
+import importlib.util
+import json
+import os
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(__file__), "..", "..", "scripts", "loadtest.py")
+spec = importlib.util.spec_from_file_location("loadtest", SCRIPT)
+loadtest = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(loadtest)
+
+THRESHOLDS = {"latency_pct": 20, "rps_pct": 15, "error_points": 1}
+
+
+def report(p95_ms=100.0, rps=50.0, error_rate=0.0):
+    block = {
+        "p50_ms": 10.0,
+        "p95_ms": p95_ms,
+        "p99_ms": 200.0,
+        "rps": rps,
+        "error_rate": error_rate,
+    }
+    return {"overall": dict(block), "steps": {"login": dict(block)}}
+
+
+def test_compare_flags_only_changes_beyond_the_thresholds():
+    baseline = report()
+    assert loadtest.compare(report(p95_ms=119, rps=43), baseline, **THRESHOLDS) == []
+
+    regressions = loadtest.compare(
+        report(p95_ms=130, rps=40, error_rate=0.02), baseline, **THRESHOLDS
+    )
+    assert "overall p95_ms: 100.0 -> 130" in regressions
+    assert "login p95_ms: 100.0 -> 130" in regressions
+    # RPS is only judged overall, not per step
+    assert "overall rps: 50.0 -> 40" in regressions
+    assert not any(line.startswith("login rps") for line in regressions)
+    assert "overall error_rate: 0.0 -> 0.02" in regressions
+
+
+def test_rps_counts_only_requests_after_ramp_up():
+    stats = loadtest.Stats()
+    stats.latencies["login"] = [0.01] * 30
+    stats.errors["login"]["status_500"] = 10
+    stats.steady["login"] = 20
+    overall, steps = stats.summary(steady_elapsed=4)
+    assert overall["requests"] == steps["login"]["requests"] == 40
+    assert overall["rps"] == steps["login"]["rps"] == 5.0
+    assert overall["error_rate"] == 0.25
+
+
+@pytest.mark.parametrize("p95_ms, exit_code", [(105.0, 0), (150.0, 1)])
+def test_exit_code_reflects_regressions(tmp_path, monkeypatch, p95_ms, exit_code):
+    scenario = tmp_path / "scenario.json"
+    scenario.write_text(json.dumps({"steps": [{"path": "/health"}]}))
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(report()))
+
+    async def fake_run_load(*args):
+        return report(p95_ms=p95_ms)
+
+    monkeypatch.setattr(loadtest, "run_load", fake_run_load)
+    monkeypatch.setattr(
+        "sys.argv", ["loadtest.py", str(scenario), "--baseline", str(baseline)]
+    )
+    with pytest.raises(SystemExit) as exc:
+        loadtest.main()
+    assert exc.value.code == exit_code
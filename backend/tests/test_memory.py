@@ -0,0 +1,93 @@
+import gc
+
+import pytest
+
+import auth
+import memory
+import metrics
+import models
+
+LEAK_CYCLES = 2000
+WARMUP_CYCLES = 300
+# Allowed RSS growth after warm-up (~1 MiB is normal, mostly SQLite pages).
+# A leak of ~5 KiB per cycle exceeds it.
+RSS_BUDGET_BYTES = 8 * 1024 * 1024
+
+
+def make_admin(db, user):
+    user.is_superuser = True
+    db.commit()
+
+
+def test_diff_points_at_allocating_line():
+    memory.start()
+    try:
+        hoard = [bytearray(1024) for _ in range(2000)]
+        top = memory.diff(limit=5)
+        assert any(
+            "test_memory.py" in row["location"] and row["size_diff"] >= 2_000_000
+            for row in top
+        )
+        by_file = memory.diff(group_by="filename", limit=5, reset=True)
+        assert by_file[0]["location"].split(":")[0].endswith("test_memory.py")
+        assert all(row["size_diff"] < 1_000_000 for row in memory.diff(limit=5))
+        del hoard
+    finally:
+        memory.stop()
+    assert not memory.is_tracing()
+
+
+def test_memory_endpoints(api_client, db_session, api_user, monkeypatch):
+    client = api_client
+    assert client.post("/admin/memory/start").status_code == 403
+    make_admin(db_session, api_user)
+    monkeypatch.setattr(memory, "MEMORY_SAMPLE_RATE", 1.0)
+
+    assert client.get("/admin/memory/snapshot").status_code == 409
+    started = client.post("/admin/memory/start?frames=2").json()
+    assert started["tracing"] and started["frames"] == 2
+    try:
+        for _ in range(3):
+            client.get("/homes/")
+        routes = client.get("/admin/memory/routes").json()["routes"]
+        homes = [r for r in routes if r["route"] == "/homes/"]
+        assert homes and homes[0]["samples"] == 3
+        snapshot = client.get("/admin/memory/snapshot?group_by=filename").json()
+        assert snapshot["rss_bytes"] > 0 and isinstance(snapshot["top"], list)
+    finally:
+        assert client.post("/admin/memory/stop").json()["tracing"] is False
+
+
+@pytest.mark.slow
+def test_auth_cycles_keep_rss_bounded(client, db_session, monkeypatch):
+    """Thousands of register/login/me cycles must not grow the process."""
+    # Cheap hashes even if the run overrides PASSWORD_HASH_PROFILE
+    monkeypatch.setattr(auth, "pwd_context", auth.make_password_context("test"))
+
+    def cycle(i):
+        email = f"leak{i}@example.com"
+        assert (
+            client.post(
+                "/auth/register", json={"email": email, "password": "password123"}
+            ).status_code
+            == 200
+        )
+        token = client.post(
+            "/auth/login", data={"username": email, "password": "password123"}
+        ).json()["access_token"]
+        me = client.get("/users/me", headers={"Authorization": f"Bearer {token}"})
+        assert me.status_code == 200
+        # The test's transaction is only rolled back at the end: keep the
+        # table (and so the in-memory database) the same size every cycle
+        db_session.query(models.User).filter_by(email=email).delete()
+        db_session.commit()
+
+    for i in range(WARMUP_CYCLES):
+        cycle(i)
+    gc.collect()
+    baseline = metrics.process_rss_bytes()
+    for i in range(WARMUP_CYCLES, LEAK_CYCLES):
+        cycle(i)
+    gc.collect()
+    growth = metrics.process_rss_bytes() - baseline
+    assert growth < RSS_BUDGET_BYTES, f"RSS grew {growth / 2**20:.1f} MiB"
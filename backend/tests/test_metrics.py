@@ -0,0 +1,128 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+
+import main
+import metrics
+
+
+def sample(text, prefix):
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{prefix} not found")
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = metrics.Registry(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 0.5, 3.0):
+        registry.observe("GET", "/x", "200", seconds)
+    text = metrics.render(metrics.collect(registry, directory=""), buckets=(0.1, 1.0))
+    prefix = 'http_request_duration_seconds_bucket{method="GET",route="/x",le='
+    assert sample(text, prefix + '"0.1"}') == 1
+    assert sample(text, prefix + '"1.0"}') == 3
+    assert sample(text, prefix + '"+Inf"}') == 4
+    assert sample(text, 'http_request_duration_seconds_count{method="GET"') == 4
+    assert sample(text, 'http_requests_total{method="GET",route="/x"') == 4
+
+
+def test_metrics_endpoint_needs_the_token(client, monkeypatch):
+    assert client.get("/metrics").status_code == 404
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics").status_code == 401
+    wrong = client.get("/metrics", headers={"Authorization": "Bearer nope"})
+    assert wrong.status_code == 401
+    right = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert right.status_code == 200
+
+
+def test_metrics_endpoint_uses_route_templates(api_client, tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "scrape-secret")
+    client = api_client
+    home_id = client.post("/homes/", json={"name": "Metered"}).json()["id"]
+    client.get(f"/homes/{home_id}")
+    client.get("/homes/999999")
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'route="/homes/{home_id}",status="200"' in text
+    assert 'route="/homes/{home_id}",status="404"' in text
+    assert f"/homes/{home_id}" not in text
+    # The default in-memory test database uses SingletonThreadPool: no pool gauges
+    pool = list(metrics.pool_gauges(main.engine))
+    for gauge in ["http_requests_in_progress", "bcrypt_queue_depth"] + pool:
+        assert f"# TYPE {gauge}" in text
+    queue_pool = create_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+    assert set(metrics.pool_gauges(queue_pool)) == {
+        "db_pool_size",
+        "db_pool_checked_out",
+        "db_pool_checked_in",
+        "db_pool_overflow",
+    }
+
+
+def dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_workers_are_merged_and_archived_once(tmp_path):
+    directory = str(tmp_path)
+    worker = metrics.Registry()
+    worker.observe("GET", "/", "200", 0.01)
+    snapshot = worker.snapshot()
+
+    gone = dead_pid()
+    dead = dict(snapshot, pid=gone)
+    (tmp_path / f"{gone}.json").write_text(json.dumps(dead))
+
+    scraper = metrics.Registry()
+    scraper.observe("GET", "/", "200", 0.02)
+    merged = metrics.collect(scraper, directory)
+    assert merged["requests"][("GET", "/", "200")] == 2
+    # Gauges are only reported for live processes
+    assert set(merged["gauges"]) == {os.getpid()}
+
+    metrics.archive_worker(gone, directory)
+    assert not (tmp_path / f"{gone}.json").exists()
+    merged = metrics.collect(scraper, directory)
+    assert merged["requests"][("GET", "/", "200")] == 2
+    assert merged["latency"][("GET", "/")][-1] == pytest.approx(0.03)
+
+    # A reader that still sees the pid file next to the archive counts it once
+    (tmp_path / f"{gone}.json").write_text(json.dumps(dead))
+    merged = metrics.collect(scraper, directory)
+    assert merged["requests"][("GET", "/", "200")] == 2
+
+
+def test_reused_pid_is_counted_and_archive_is_pruned(tmp_path):
+    directory = str(tmp_path)
+    scraper = metrics.Registry()
+    gone = dead_pid()
+    old = metrics.Registry()
+    old.observe("GET", "/", "200", 0.01)
+    (tmp_path / f"{gone}.json").write_text(
+        json.dumps(dict(old.snapshot(), pid=gone, started=1.0))
+    )
+    metrics.archive_worker(gone, directory)
+
+    # A new worker is handed the same pid
+    new = metrics.Registry()
+    new.observe("GET", "/", "200", 0.01)
+    (tmp_path / f"{gone}.json").write_text(
+        json.dumps(dict(new.snapshot(), pid=gone, started=2.0))
+    )
+    merged = metrics.collect(scraper, directory)
+    assert merged["requests"][("GET", "/", "200")] == 2
+
+    metrics.archive_worker(gone, directory)
+    archive = json.loads((tmp_path / metrics.ARCHIVE).read_text())
+    # The first entry's file is gone: only the latest worker is listed
+    assert archive["merged"] == [[gone, 2.0]]
+    assert metrics.collect(scraper, directory)["requests"][("GET", "/", "200")] == 2
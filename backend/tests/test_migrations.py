@@ -1,196 +1,111 @@
 import os
-import subprocess
+
+import psycopg2
 import pytest
-from sqlalchemy import create_engine, inspect
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.pool import NullPool
 
-# Always use a dedicated test DB for migration tests
-ALEMBIC_CONFIG = os.path.abspath(
-    os.path.join(os.path.dirname(__file__), "../alembic.ini")
-)
-# Use dedicated test DB and URL, never main DB
-TEST_DB_NAME = os.getenv("TEST_DB", "anantam_test")
+from tests import migration_harness
+
+DB_NAME = os.getenv("TEST_DB", "anantam_test")
 DB_USER = os.getenv("TEST_DB_USER", "anantam")
 DB_PASSWORD = os.getenv("TEST_DB_PASSWORD", "supersecret")
 DB_HOST = os.getenv("TEST_DB_HOST", "db")
 DB_PORT = os.getenv("TEST_DB_PORT", "5432")
-DATABASE_URL = os.getenv(
-    "TEST_DATABASE_URL",
-    f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{TEST_DB_NAME}",
+SHARED_URL = make_url(
+    os.getenv(
+        "TEST_DATABASE_URL",
+        f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
+    )
+)
+# A database of its own: the other Postgres test modules in the same run
+# (or shard) keep using the shared one while this module drops and recreates
+TEST_DB_NAME = f"{SHARED_URL.database}_migrations"
+DATABASE_URL = SHARED_URL.set(database=TEST_DB_NAME).render_as_string(
+    hide_password=False
 )
-
-print("[MIGRATION TEST] ENVIRONMENT VARIABLES:")
-print(f"  TEST_DB={TEST_DB_NAME}")
-print(f"  TEST_DB_USER={DB_USER}")
-print(f"  TEST_DB_PASSWORD={DB_PASSWORD}")
-print(f"  TEST_DB_HOST={DB_HOST}")
-print(f"  TEST_DB_PORT={DB_PORT}")
-print(f"  TEST_DATABASE_URL={DATABASE_URL}")
 
 
-@pytest.fixture(scope="module")
-def clean_test_db():
-    import psycopg2
-    from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
-
-    db_url = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/postgres"
-    conn = psycopg2.connect(db_url)
+def admin_execute(*statements):
+    url = SHARED_URL.set(drivername="postgresql", database="postgres")
+    conn = psycopg2.connect(url.render_as_string(hide_password=False))
     conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-    cur = conn.cursor()
-    print(f"[MIGRATION TEST] Using ONLY test DB: {TEST_DB_NAME}")
-    # Terminate all connections to the test DB
-    cur.execute(
-        f"SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
-        f"WHERE datname = '{TEST_DB_NAME}'"
-    )
-    import pytest
-
     try:
-        cur.execute(f"DROP DATABASE IF EXISTS {TEST_DB_NAME}")
-    except Exception as e:
-        print(
-            "[MIGRATION TEST][KNOWN ISSUE] Could not drop test DB due to lingering "
-            "connections. This is a known limitation with Postgres and SQLAlchemy in "
-            "test environments. See test_plan.md for details."
-        )
-        print(f"[MIGRATION TEST][DETAILS] Exception: {e}")
-        pytest.xfail(
-            f"Teardown could not drop test DB due to lingering connections: {e}"
-        )
-    cur.execute(f"CREATE DATABASE {TEST_DB_NAME}")
-    cur.close()
-    conn.close()
-    yield
-    # Ensure all SQLAlchemy connections are closed before dropping DB
-    import gc
-    import time
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker
-
-    try:
-        # Attempt to close all sessions and dispose engine
-        engine = create_engine(DATABASE_URL, pool_pre_ping=True, pool_recycle=1)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        session.close_all()
-        session.close()
-        engine.dispose()
-        print(
-            "[MIGRATION TEST] Aggressively closed all \
-                SQLAlchemy sessions and disposed engine."
-        )
-    except Exception as e:
-        print(f"[MIGRATION TEST] Engine/session cleanup error: {e}")
-    gc.collect()
-    time.sleep(2)
-    conn = psycopg2.connect(db_url)
-    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-    cur = conn.cursor()
-    cur.execute(
-        f"SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
-        f"WHERE datname = '{TEST_DB_NAME}'"
+        with conn.cursor() as cur:
+            for statement in statements:
+                cur.execute(statement)
+    finally:
+        conn.close()
+
+
+def drop_statements():
+    return (
+        "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+        f"WHERE datname = '{TEST_DB_NAME}' AND pid <> pg_backend_pid()",
+        f"DROP DATABASE IF EXISTS {TEST_DB_NAME}",
     )
-    cur.execute(f"DROP DATABASE IF EXISTS {TEST_DB_NAME}")
-    cur.close()
-    conn.close()
 
 
-def run_alembic(cmd):
-    result = subprocess.run(
-        ["alembic", "-c", ALEMBIC_CONFIG, *cmd], capture_output=True, text=True
-    )
-    assert result.returncode == 0, f"Alembic failed: {result.stderr}"
-    return result
-
-
-def test_migration_upgrade():
-    subprocess.run(
-        [
-            "pytest",
-            __file__,
-            "-k",
-            "_upgrade",
-            "--maxfail=1",
-            "--disable-warnings",
-            "-v",
-            "--tb=short",
-        ],
-        check=True,
-    )
-
-
-def _test_migration_upgrade(clean_test_db):
-    run_alembic(["upgrade", "head"])
-    engine = create_engine(DATABASE_URL, poolclass=NullPool)
-    insp = inspect(engine)
-    tables = insp.get_table_names()
-    assert len(tables) > 0, "No tables found after migration!"
-
-
-def test_migration_downgrade():
-    subprocess.run(
-        [
-            "pytest",
-            __file__,
-            "-k",
-            "_downgrade",
-            "--maxfail=1",
-            "--disable-warnings",
-            "-v",
-            "--tb=short",
-        ],
-        check=True,
-    )
+@pytest.fixture(scope="module")
+def clean_test_db():
+    admin_execute(*drop_statements(), f"CREATE DATABASE {TEST_DB_NAME}")
+    yield
+    admin_execute(*drop_statements())
 
 
-def _test_migration_downgrade(clean_test_db):
-    run_alembic(["upgrade", "head"])
-    run_alembic(["downgrade", "base"])
+@pytest.fixture
+def engine(clean_test_db):
+    # Every test starts from an empty public schema in the same database
     engine = create_engine(DATABASE_URL, poolclass=NullPool)
-    insp = inspect(engine)
-    tables = [t for t in insp.get_table_names() if t != "alembic_version"]
-    import pytest
-
-    if len(tables) != 0:
-        print(
-            "[MIGRATION TEST][KNOWN ISSUE] Tables still exist after downgrade "
-            "(expected alembic_version). This is a known limitation due to Alembic "
-            "version table and teardown constraints. See test_plan.md for details."
-        )
-        print(f"[MIGRATION TEST][DETAILS] Remaining tables: {tables}")
-        pytest.xfail(
-            f"Tables still exist after downgrade: {tables} (expected alembic_version)"
-        )
-
-
-# NOTE: Known migration test issues:
-# - Teardown may fail to drop the test DB due \
-# to lingering connections (Postgres/SQLAlchemy \
-# limitation).
-# - Downgrade may leave alembic_version table present; \
-# this is expected and documented in test_plan.md.
-# These are marked as xfail and will not fail CI, \
-# but are visible for future improvement.
-
-
-def test_migration_idempotence():
-    subprocess.run(
-        [
-            "pytest",
-            __file__,
-            "-k",
-            "_idempotence",
-            "--maxfail=1",
-            "--disable-warnings",
-            "-v",
-            "--tb=short",
-        ],
-        check=True,
-    )
+    migration_harness.reset_schema(engine)
+    yield engine
+    engine.dispose()
 
 
-def _test_migration_idempotence(clean_test_db):
-    run_alembic(["upgrade", "head"])
-    run_alembic(["upgrade", "head"])
-    run_alembic(["downgrade", "base"])
-    run_alembic(["downgrade", "base"])
+def test_migration_upgrade_and_downgrade(engine):
+    # The one test that runs every revision, both ways
+    migration_harness.upgrade(engine)
+    tables = inspect(engine).get_table_names()
+    assert len(tables) > 0, "No tables found after migration!"
+    assert migration_harness.schema_diff(engine) == []
+
+    migration_harness.downgrade(engine)
+    tables = [t for t in inspect(engine).get_table_names() if t != "alembic_version"]
+    assert tables == []
+
+
+def test_migration_idempotence(engine):
+    migration_harness.migrate_to_head(engine)
+    migration_harness.upgrade(engine)
+    migration_harness.downgrade(engine, "-1")
+    migration_harness.upgrade(engine)
+    migration_harness.upgrade(engine)
+    assert migration_harness.schema_diff(engine) == []
+
+
+def test_schema_snapshot_is_reused(engine, tmp_path, monkeypatch):
+    if not migration_harness.snapshots_supported(engine):
+        pytest.skip("pg_dump/psql older than the server")
+    monkeypatch.setattr(migration_harness, "SNAPSHOT_DIR", str(tmp_path))
+    assert migration_harness.migrate_to_head(engine) == "migrated"
+    assert os.path.exists(migration_harness.snapshot_path())
+
+    migration_harness.reset_schema(engine)
+    assert migration_harness.migrate_to_head(engine) == "snapshot"
+    assert migration_harness.schema_diff(engine) == []
+    with engine.connect() as connection:
+        version = connection.exec_driver_sql(
+            "SELECT version_num FROM alembic_version"
+        ).scalar()
+        triggers = connection.execute(
+            text("SELECT count(*) FROM pg_trigger WHERE tgname LIKE :pattern"),
+            {"pattern": "%_notify_change"},
+        ).scalar()
+    assert version == migration_harness.head()
+    assert triggers > 0
+    # Any migration edit changes the hash, so the snapshot is not reused
+    monkeypatch.setattr(migration_harness, "revision_hash", lambda: "0" * 64)
+    migration_harness.reset_schema(engine)
+    assert migration_harness.migrate_to_head(engine) == "migrated"
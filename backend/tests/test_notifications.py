@@ -0,0 +1,112 @@
+import asyncio
+import datetime
+import socket
+
+import pytest
+from aiosmtpd.controller import Controller
+
+import models
+import notifications
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        self.messages.append((envelope.rcpt_tos, envelope.content.decode()))
+        return "250 Message accepted for delivery"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture()
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield handler, controller.port
+    controller.stop()
+
+
+def enqueue_all(session_factory, items):
+    db = session_factory()
+    for recipient, subject in items:
+        notifications.enqueue(db, recipient, subject, f"Body of {subject}", delay=0)
+    db.commit()
+    db.close()
+
+
+def outbox_rows(session_factory):
+    db = session_factory()
+    rows = db.query(models.NotificationOutbox).order_by(models.NotificationOutbox.id)
+    result = [(r.status, r.attempts, r.next_attempt_at) for r in rows]
+    db.close()
+    return result
+
+
+def test_digest_per_recipient_over_one_connection(session_factory, smtp_server):
+    handler, port = smtp_server
+    enqueue_all(
+        session_factory,
+        [
+            ("alice@example.com", "Invited to Lake House"),
+            ("bob@example.com", "Assigned to Kitchen"),
+            ("alice@example.com", "Mentioned in Kitchen"),
+            ("alice@example.com", "Assigned to Bathroom"),
+        ],
+    )
+    sender = notifications.NotificationSender(
+        session_factory=session_factory, hostname="127.0.0.1", port=port
+    )
+
+    async def run():
+        processed = await sender.send_pending()
+        await sender.close()
+        return processed
+
+    assert asyncio.run(run()) == 4
+    assert len(handler.messages) == 2
+    assert len(handler.sessions) == 1
+    alice = [body for rcpt, body in handler.messages if rcpt == ["alice@example.com"]]
+    assert "You have 3 new notifications" in alice[0]
+    assert "Mentioned in Kitchen" in alice[0]
+    assert all(status == "sent" for status, _, _ in outbox_rows(session_factory))
+
+
+def test_failed_send_is_retried_with_backoff(session_factory, monkeypatch):
+    monkeypatch.setattr(notifications, "MAX_ATTEMPTS", 2)
+    enqueue_all(session_factory, [("carol@example.com", "Hello")])
+    sender = notifications.NotificationSender(
+        session_factory=session_factory, hostname="127.0.0.1", port=free_port()
+    )
+    before = datetime.datetime.utcnow()
+    asyncio.run(sender.send_pending())
+    [(status, attempts, next_attempt_at)] = outbox_rows(session_factory)
+    assert (status, attempts) == ("pending", 1)
+    assert next_attempt_at >= before + datetime.timedelta(
+        seconds=notifications.BACKOFF_BASE
+    )
+
+    # Not due yet: nothing is claimed
+    assert asyncio.run(sender.send_pending()) == 0
+
+    db = session_factory()
+    db.query(models.NotificationOutbox).update({"next_attempt_at": before})
+    db.commit()
+    db.close()
+    asyncio.run(sender.send_pending())
+    [(status, attempts, _)] = outbox_rows(session_factory)
+    assert (status, attempts) == ("failed", 2)
+
+
+def test_backoff_is_exponential_and_capped(monkeypatch):
+    monkeypatch.setattr(notifications, "BACKOFF_BASE", 5)
+    monkeypatch.setattr(notifications, "BACKOFF_MAX", 30)
+    assert [notifications.backoff_delay(n) for n in (1, 2, 3, 4)] == [5, 10, 20, 30]
@@ -0,0 +1,56 @@
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import create_engine, inspect, text
+
+import online_migrations
+
+
+def run(engine, fn):
+    with engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            return fn()
+
+
+def test_sqlite_falls_back_to_plain_ddl_and_update():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, email)"))
+        connection.execute(
+            text("INSERT INTO users (email, id) VALUES ('A@x.io', 1), ('b@x.io', 2)")
+        )
+        connection.execute(text("ALTER TABLE users ADD COLUMN email_normalized"))
+
+    def migrate():
+        with online_migrations.lock_timeout("1s"):
+            updated = online_migrations.backfill(
+                "users",
+                "email_normalized = lower(email)",
+                where="email_normalized IS NULL",
+            )
+        online_migrations.create_index_concurrently(
+            "ix_users_email_normalized", "users", ["email_normalized"], unique=True
+        )
+        return updated
+
+    assert run(engine, migrate) == 2
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT email_normalized FROM users")).all()
+    assert sorted(rows) == [("a@x.io",), ("b@x.io",)]
+    indexes = {i["name"]: i for i in inspect(engine).get_indexes("users")}
+    assert indexes["ix_users_email_normalized"]["unique"]
+
+    run(
+        engine,
+        lambda: online_migrations.drop_index_concurrently(
+            "ix_users_email_normalized", "users"
+        ),
+    )
+    assert inspect(engine).get_indexes("users") == []
+
+
+def test_settings_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv("BACKFILL_BATCH_SIZE", "500")
+    monkeypatch.setenv("BACKFILL_SLEEP", "0.2")
+    monkeypatch.setenv("BACKFILL_LOCK_TIMEOUT", "750ms")
+    assert online_migrations._settings(None, None, None) == (500, 0.2, "750ms")
+    assert online_migrations._settings(100, 0, 3) == (100, 0, "3s")
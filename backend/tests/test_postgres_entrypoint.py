@@ -0,0 +1,130 @@
+import os
+import shutil
+import textwrap
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+import entrypoint
+from tests import migration_harness
+
+DB_NAME = os.getenv("TEST_DB", "anantam_test")
+DB_USER = os.getenv("TEST_DB_USER", "anantam")
+DB_PASSWORD = os.getenv("TEST_DB_PASSWORD", "supersecret")
+DB_HOST = os.getenv("TEST_DB_HOST", "db")
+DB_PORT = os.getenv("TEST_DB_PORT", "5432")
+DATABASE_URL = os.getenv(
+    "TEST_DATABASE_URL",
+    f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
+)
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), "..", "alembic.ini")
+REPLICAS = 6
+
+# Holds the lock long enough for the other replicas to start waiting, then
+# builds an index concurrently, which waits out every open transaction
+CONCURRENT_INDEX_REVISION = """
+import time
+
+from alembic import op
+
+import online_migrations
+
+revision = "9999_index_while_replicas_wait"
+down_revision = "{down_revision}"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    time.sleep(2)
+    online_migrations.create_index_concurrently(
+        "ix_users_email_lower", "users", ["lower(email)"], timeout="5s"
+    )
+
+
+def downgrade():
+    online_migrations.drop_index_concurrently("ix_users_email_lower", "users")
+"""
+
+
+def run_replicas(alembic_ini, **kwargs):
+    with ThreadPoolExecutor(max_workers=REPLICAS) as pool:
+        return list(
+            pool.map(
+                lambda _: entrypoint.migrate(
+                    DATABASE_URL, alembic_ini, log_sql=False, **kwargs
+                ),
+                range(REPLICAS),
+            )
+        )
+
+
+def held_advisory_locks(connection):
+    return connection.execute(
+        text("SELECT count(*) FROM pg_locks WHERE locktype = 'advisory'")
+    ).scalar()
+
+
+def test_only_one_replica_migrates():
+    engine = create_engine(DATABASE_URL, poolclass=NullPool)
+    migration_harness.reset_schema(engine)
+    # The replicas only need something left to migrate: the last revision
+    migration_harness.migrate_to_head(engine)
+    migration_harness.downgrade(engine, "-1")
+    try:
+        results = run_replicas(ALEMBIC_INI)
+        assert results.count("migrated") == 1
+        assert results.count("at-head") == REPLICAS - 1
+        with engine.connect() as connection:
+            version = connection.execute(
+                text("SELECT version_num FROM alembic_version")
+            ).scalar()
+            held = held_advisory_locks(connection)
+        assert version == migration_harness.head()
+        assert held == 0
+    finally:
+        migration_harness.reset_schema(engine)
+        engine.dispose()
+
+
+def test_waiting_replicas_do_not_block_concurrent_index_builds(tmp_path):
+    backend_dir = os.path.dirname(ALEMBIC_INI)
+    shutil.copy(ALEMBIC_INI, tmp_path / "alembic.ini")
+    shutil.copytree(
+        os.path.join(backend_dir, "migrations"),
+        tmp_path / "migrations",
+        ignore=shutil.ignore_patterns("__pycache__"),
+    )
+    (
+        tmp_path / "migrations" / "versions" / "9999_index_while_replicas_wait.py"
+    ).write_text(
+        textwrap.dedent(CONCURRENT_INDEX_REVISION).format(
+            down_revision=migration_harness.head()
+        )
+    )
+    engine = create_engine(DATABASE_URL, poolclass=NullPool)
+    migration_harness.reset_schema(engine)
+    migration_harness.migrate_to_head(engine)
+    try:
+        results = run_replicas(str(tmp_path / "alembic.ini"), lock_timeout=60)
+        assert results.count("migrated") == 1
+        assert results.count("at-head") == REPLICAS - 1
+        with engine.connect() as connection:
+            version = connection.execute(
+                text("SELECT version_num FROM alembic_version")
+            ).scalar()
+            valid = connection.execute(
+                text(
+                    "SELECT i.indisvalid FROM pg_index i "
+                    "JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE c.relname = 'ix_users_email_lower'"
+                )
+            ).scalar()
+            held = held_advisory_locks(connection)
+        assert version == "9999_index_while_replicas_wait"
+        assert valid is True
+        assert held == 0
+    finally:
+        migration_harness.reset_schema(engine)
+        engine.dispose()
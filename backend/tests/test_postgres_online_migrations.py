@@ -0,0 +1,329 @@
+import logging
+import os
+import shutil
+import textwrap
+import threading
+import time
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+import main
+import online_migrations
+import synthetic_data
+from tests import migration_harness
+
+DB_NAME = os.getenv("TEST_DB", "anantam_test")
+DB_USER = os.getenv("TEST_DB_USER", "anantam")
+DB_PASSWORD = os.getenv("TEST_DB_PASSWORD", "supersecret")
+DB_HOST = os.getenv("TEST_DB_HOST", "db")
+DB_PORT = os.getenv("TEST_DB_PORT", "5432")
+DATABASE_URL = os.getenv(
+    "TEST_DATABASE_URL",
+    f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
+)
+
+USERS = int(os.getenv("ONLINE_MIGRATION_USERS", "1000000"))
+BATCH_SIZE = 20_000
+LOGIN_THREADS = 4
+# How much slower the slowest login may be during the migration than before it
+MAX_STALL = 1.0
+USERS_ONLY = {
+    "homes_per_user": 0,
+    "rooms_per_home": 0,
+    "elements_per_room": 0,
+    "comments_per_element": 0,
+    "purchases_per_element": 0,
+}
+
+REVISION_HEADER = """
+import sqlalchemy as sa
+from alembic import op
+
+from online_migrations import (
+    backfill, create_index_concurrently, drop_index_concurrently, lock_timeout,
+)
+
+revision = "{revision}"
+down_revision = "{down_revision}"
+branch_labels = None
+depends_on = None
+"""
+# Test revisions on top of the real head, in order
+REVISIONS = {
+    "9001_normalize_email": """
+def upgrade():
+    with lock_timeout("2s"):
+        op.add_column("users", sa.Column("email_normalized", sa.String()))
+    backfill("users", "email_normalized = lower(email)",
+             where="email_normalized IS NULL")
+    create_index_concurrently("ix_users_email_normalized", "users",
+                              ["email_normalized"])
+
+
+def downgrade():
+    drop_index_concurrently("ix_users_email_normalized", "users")
+    op.drop_column("users", "email_normalized")
+""",
+    "9002_add_email_domain": """
+def upgrade():
+    with lock_timeout("2s"):
+        op.add_column("users", sa.Column("email_domain", sa.String()))
+
+
+def downgrade():
+    op.drop_column("users", "email_domain")
+""",
+    # Separate from the column so an interrupted backfill can simply be rerun
+    "9003_backfill_email_domain": """
+def upgrade():
+    backfill("users", "email_domain = split_part(email, '@', 2)",
+             where="email_domain IS NULL", name="email_domain")
+
+
+def downgrade():
+    pass
+""",
+}
+
+
+@pytest.fixture(scope="module")
+def migrations(tmp_path_factory):
+    """A copy of migrations/ with REVISIONS added to its versions."""
+    directory = tmp_path_factory.mktemp("online") / "migrations"
+    shutil.copytree(
+        migration_harness.MIGRATIONS_DIR,
+        directory,
+        ignore=shutil.ignore_patterns("__pycache__"),
+    )
+    down_revision = migration_harness.head()
+    for revision, body in REVISIONS.items():
+        source = textwrap.dedent(REVISION_HEADER).format(
+            revision=revision, down_revision=down_revision
+        )
+        (directory / "versions" / f"{revision}.py").write_text(source + body)
+        down_revision = revision
+    return directory
+
+
+@pytest.fixture
+def backfill_settings(monkeypatch):
+    def apply(batch_size, sleep):
+        monkeypatch.setenv("BACKFILL_BATCH_SIZE", str(batch_size))
+        monkeypatch.setenv("BACKFILL_SLEEP", str(sleep))
+
+    return apply
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_engine(DATABASE_URL, pool_size=LOGIN_THREADS + 2)
+    migration_harness.reset_schema(engine)
+    migration_harness.migrate_to_head(engine)
+    synthetic_data.load(
+        synthetic_data.libpq_dsn(DATABASE_URL), USERS, profile=USERS_ONLY
+    )
+    yield engine
+    migration_harness.reset_schema(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def client(engine):
+    session_factory = sessionmaker(bind=engine)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    previous = main.app.dependency_overrides.copy()
+    main.app.dependency_overrides[main.get_db] = override_get_db
+    yield TestClient(main.app)
+    main.app.dependency_overrides = previous
+
+
+def checkpoint(connection):
+    """The backfill's saved next_key, or None before it has one."""
+    table = online_migrations.PROGRESS_TABLE
+    try:
+        if not connection.execute(text(f"SELECT to_regclass('{table}')")).scalar():
+            return None
+        return connection.execute(
+            text(f"SELECT next_key FROM {table} WHERE name = 'email_domain'")
+        ).scalar()
+    finally:
+        connection.commit()
+
+
+class LoginLoad:
+    """Logs in as random seeded users from several threads until stopped."""
+
+    def __init__(self, client):
+        self.client = client
+        self.stop = threading.Event()
+        self.latencies = []
+        self.failures = []
+        self.threads = [
+            threading.Thread(target=self.run, args=(n,)) for n in range(LOGIN_THREADS)
+        ]
+
+    def run(self, n):
+        i = n
+        while not self.stop.is_set():
+            started = time.perf_counter()
+            response = self.client.post(
+                "/auth/login",
+                data={
+                    "username": f"perf{i % USERS}@example.com",
+                    "password": "perf-password",
+                },
+            )
+            self.latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                self.failures.append(response.status_code)
+            i += 7919 * LOGIN_THREADS
+
+    def __enter__(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop.set()
+        for thread in self.threads:
+            thread.join()
+
+
+def version(connection):
+    return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+
+@pytest.mark.slow
+def test_logins_continue_during_online_migration(
+    engine, client, migrations, backfill_settings, caplog
+):
+    backfill_settings(BATCH_SIZE, 0.01)
+    with LoginLoad(client) as baseline:
+        time.sleep(2)
+    assert baseline.latencies and not baseline.failures
+
+    with LoginLoad(client) as load:
+        started = time.perf_counter()
+        with caplog.at_level(logging.INFO, logger="alembic.online_migrations"):
+            migration_harness.upgrade(engine, "9001_normalize_email", migrations)
+        migration_seconds = time.perf_counter() - started
+        time.sleep(0.5)
+
+    assert f"Backfilled {USERS} rows of users" in caplog.text
+    assert not load.failures
+    # Logins kept flowing for the whole migration, not just before or after it
+    assert len(load.latencies) > migration_seconds * LOGIN_THREADS
+    assert max(load.latencies) < max(baseline.latencies) + MAX_STALL
+    with engine.connect() as connection:
+        missing = connection.execute(
+            text("SELECT count(*) FROM users WHERE email_normalized IS NULL")
+        ).scalar()
+        valid = connection.execute(
+            text(
+                "SELECT i.indisvalid FROM pg_index i JOIN pg_class c "
+                "ON c.oid = i.indexrelid WHERE c.relname = 'ix_users_email_normalized'"
+            )
+        ).scalar()
+        leftover = connection.execute(
+            text("SELECT to_regclass(:table)"),
+            {"table": online_migrations.PROGRESS_TABLE},
+        ).scalar()
+        current = version(connection)
+    assert missing == 0
+    assert valid is True
+    assert leftover is None
+    assert current == "9001_normalize_email"
+
+
+@pytest.mark.slow
+def test_backfill_resumes_after_interruption(
+    engine, migrations, backfill_settings, caplog
+):
+    backfill_settings(BATCH_SIZE // 4, 0.05)
+    migrator = create_engine(
+        DATABASE_URL,
+        poolclass=NullPool,
+        connect_args={"application_name": "online-migration-test"},
+    )
+    migration_harness.upgrade(migrator, "9002_add_email_domain", migrations)
+
+    def backfill():
+        migration_harness.upgrade(migrator, "9003_backfill_email_domain", migrations)
+
+    errors = []
+
+    def interrupted():
+        try:
+            backfill()
+        except Exception as exc:  # the migration process "dies"
+            errors.append(exc)
+
+    thread = threading.Thread(target=interrupted)
+    thread.start()
+    with engine.connect() as connection:
+        # Let a quarter of the table get done, then kill the migration
+        while thread.is_alive() and (checkpoint(connection) or 0) < USERS // 4:
+            time.sleep(0.1)
+        connection.execute(
+            text(
+                "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+                "WHERE application_name = 'online-migration-test'"
+            )
+        )
+        connection.commit()
+    thread.join()
+    assert errors
+
+    with engine.connect() as connection:
+        resume_at = checkpoint(connection)
+        done = connection.execute(
+            text("SELECT count(*) FROM users WHERE email_domain IS NOT NULL")
+        ).scalar()
+        interrupted_at = version(connection)
+    # Every committed batch was checkpointed, and nothing past the checkpoint
+    assert done == resume_at - 1
+    assert interrupted_at == "9002_add_email_domain"
+
+    with caplog.at_level(logging.INFO, logger="alembic.online_migrations"):
+        backfill()
+    assert f"at id={resume_at}" in caplog.text
+    assert f"Backfilled {USERS - done} rows of users" in caplog.text
+    with engine.connect() as connection:
+        missing = connection.execute(
+            text("SELECT count(*) FROM users WHERE email_domain IS NULL")
+        ).scalar()
+        current = version(connection)
+    assert missing == 0
+    assert current == "9003_backfill_email_domain"
+    migrator.dispose()
+
+
+def test_helpers_restore_the_session_lock_timeout():
+    engine = create_engine(DATABASE_URL, poolclass=NullPool)
+    with engine.connect() as connection:
+        connection.execute(text("CREATE TEMP TABLE notes (id int, body text)"))
+        connection.execute(text("INSERT INTO notes VALUES (1, 'A'), (2, 'B')"))
+        connection.execute(text("SET lock_timeout = '7s'"))
+        connection.commit()
+        with Operations.context(MigrationContext.configure(connection)):
+            online_migrations.create_index_concurrently(
+                "ix_notes_body", "notes", ["body"], timeout="1s"
+            )
+            online_migrations.backfill(
+                "notes", "body = lower(body)", timeout="1s", sleep=0
+            )
+        assert connection.execute(text("SHOW lock_timeout")).scalar() == "7s"
+    engine.dispose()
@@ -0,0 +1,144 @@
+import asyncio
+import importlib.util
+import json
+import os
+from pathlib import Path
+
+import psycopg2
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+import models
+import realtime
+
+# Use test DB environment variables
+DB_NAME = os.getenv("TEST_DB", "anantam_test")
+DB_USER = os.getenv("TEST_DB_USER", "anantam")
+DB_PASSWORD = os.getenv("TEST_DB_PASSWORD", "supersecret")
+DB_HOST = os.getenv("TEST_DB_HOST", "db")
+DB_PORT = os.getenv("TEST_DB_PORT", "5432")
+DATABASE_URL = os.getenv(
+    "TEST_DATABASE_URL",
+    f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
+)
+
+SUBSCRIBERS = 5000
+EMAIL = "realtime@example.com"
+MIGRATION = (
+    Path(__file__).resolve().parents[1]
+    / "migrations"
+    / "versions"
+    / "0006_add_change_notify_triggers.py"
+)
+
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location("notify_migration", MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def notify_schema():
+    """Tables plus the change-notify triggers from migration 0006."""
+    migration = load_migration()
+    engine = create_engine(DATABASE_URL)
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text(migration.NOTIFY_FUNCTION))
+        for table in migration.NOTIFY_TABLES:
+            conn.execute(
+                text(f"DROP TRIGGER IF EXISTS {table}_notify_change ON {table}")
+            )
+            conn.execute(
+                text(
+                    f"CREATE TRIGGER {table}_notify_change "
+                    f"AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                    f"FOR EACH ROW EXECUTE FUNCTION anantam_notify_change()"
+                )
+            )
+    yield engine
+    engine.dispose()
+
+
+def notify(payload):
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_notify(%s, %s)", (realtime.CHANNEL, json.dumps(payload)))
+    conn.close()
+
+
+def test_listener_fans_out_to_5000_subscribers():
+    """One LISTEN connection delivers every NOTIFY to thousands of clients."""
+
+    async def run():
+        hub = realtime.Hub()
+        listener = realtime.NotifyListener(hub, DATABASE_URL)
+        subscribers = [hub.subscribe(["home:42"]) for _ in range(SUBSCRIBERS)]
+        await listener.start()
+        try:
+            await asyncio.wait_for(listener.connected.wait(), 10)
+            for i in range(5):
+                await asyncio.to_thread(notify, {"home_id": 42, "id": i})
+            received = await asyncio.wait_for(
+                asyncio.gather(*[s.get() for s in subscribers]), 10
+            )
+            assert len(received) == SUBSCRIBERS
+            assert all(json.loads(m)["id"] == 0 for m in received)
+            # Remaining events are already queued for every subscriber
+            for _ in range(4):
+                await asyncio.wait_for(
+                    asyncio.gather(*[s.get() for s in subscribers]), 10
+                )
+            assert all(s.dropped == 0 and not s.closed for s in subscribers)
+        finally:
+            await listener.stop()
+
+    asyncio.run(run())
+
+
+def test_trigger_publishes_home_and_room(notify_schema):
+    """Inserting a comment notifies both its room and its home topic."""
+
+    async def run():
+        hub = realtime.Hub()
+        listener = realtime.NotifyListener(hub, DATABASE_URL)
+        await listener.start()
+        try:
+            await asyncio.wait_for(listener.connected.wait(), 10)
+            db = Session(notify_schema)
+            user = db.query(models.User).filter_by(email=EMAIL).first()
+            if user is None:
+                user = models.User(email=EMAIL, hashed_password="x")
+                db.add(user)
+                db.flush()
+            home = models.Home(name="RT", owner_id=user.id)
+            db.add(home)
+            db.flush()
+            room = models.Room(home_id=home.id, name="Hall")
+            db.add(room)
+            db.commit()
+            home_id, room_id = home.id, room.id
+            home_sub = hub.subscribe(realtime.topics_for(home_id))
+            room_sub = hub.subscribe(realtime.topics_for(home_id, room_id))
+            db.add(models.Comment(user_id=user.id, room_id=room_id, content="hi"))
+            db.commit()
+            for subscriber in (home_sub, room_sub):
+                # The room insert may still be in flight ahead of the comment
+                event = {}
+                while event.get("table") != "comments":
+                    message = await asyncio.wait_for(subscriber.get(), 10)
+                    event = json.loads(message)
+                assert event["op"] == "INSERT"
+                assert event["home_id"] == home_id
+                assert event["room_id"] == room_id
+            db.query(models.Home).filter_by(id=home_id).delete()
+            db.commit()
+            db.close()
+        finally:
+            await listener.stop()
+
+    asyncio.run(run())
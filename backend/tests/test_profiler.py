@@ -0,0 +1,67 @@
+import threading
+import time
+
+import profiler
+
+
+def busy_loop_for_profiler(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def test_sampler_sees_busy_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop_for_profiler, args=(stop,), name="busy")
+    worker.start()
+    try:
+        stacks = profiler.profile_for(0.3, interval=0.002)
+    finally:
+        stop.set()
+        worker.join()
+    text = profiler.collapsed(stacks)
+    busy = [line for line in text.splitlines() if line.startswith("busy;")]
+    assert busy and all("busy_loop_for_profiler" in line for line in busy)
+    assert profiler.parse_collapsed(text) == stacks
+
+
+def test_speedscope_frames_match_samples():
+    stacks = profiler.parse_collapsed(
+        "MainThread;main (app.py:1);work (app.py:10) 3\nMainThread;main (app.py:1) 1\n"
+    )
+    doc = profiler.speedscope(stacks, interval=0.01)
+    frames = doc["shared"]["frames"]
+    assert frames[1] == {"name": "main", "file": "app.py", "line": 1}
+    profile = doc["profiles"][0]
+    assert [[frames[i]["name"] for i in s] for s in profile["samples"]] == [
+        ["MainThread", "main", "work"],
+        ["MainThread", "main"],
+    ]
+    assert profile["weights"] == [30.0, 10.0]
+
+
+def test_rolling_profiler_rotates_and_merges(tmp_path):
+    rolling = profiler.RollingProfiler(str(tmp_path), interval=0.001, keep=2)
+    for _ in range(3):
+        rolling.sampler.stacks[("MainThread", "f (x.py:1)")] += 2
+        assert rolling.flush() is not None
+        time.sleep(0.002)
+    assert len(list(tmp_path.glob("profile-*.collapsed"))) == 2
+    assert rolling.load()[("MainThread", "f (x.py:1)")] == 4
+    assert rolling.load(since=time.time() + 60) == {}
+
+
+def test_profile_endpoint_is_admin_only(api_client, db_session, api_user):
+    client = api_client
+    assert client.get("/admin/profile?seconds=0.1").status_code == 403
+
+    api_user.is_superuser = True
+    db_session.commit()
+    response = client.get("/admin/profile?seconds=0.2&interval_ms=2&idle=true")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+    scope = client.get("/admin/profile?seconds=0.1&format=speedscope").json()
+    assert scope["profiles"][0]["type"] == "sampled"
+    assert client.get("/admin/profile?seconds=120").status_code == 422
@@ -0,0 +1,119 @@
+import asyncio
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+import main
+import realtime
+
+
+def event(home_id, room_id=None, op="INSERT"):
+    return json.dumps(
+        {"table": "comments", "op": op, "id": 1, "home_id": home_id, "room_id": room_id}
+    )
+
+
+def test_notifications_are_routed_by_topic():
+    async def run():
+        hub = realtime.Hub()
+        home = hub.subscribe(realtime.topics_for(1))
+        room = hub.subscribe(realtime.topics_for(1, room_id=10))
+        other = hub.subscribe(realtime.topics_for(2))
+        both = hub.subscribe(["home:1", "room:10"])
+        assert hub.dispatch_notification(event(1, 10)) == 3
+        assert home.queue.qsize() == room.queue.qsize() == 1
+        # Subscribed to both matching topics, but delivered once
+        assert both.queue.qsize() == 1
+        assert other.queue.empty()
+        hub.unsubscribe(home)
+        assert hub.subscriber_count("home:1") == 1
+
+    asyncio.run(run())
+
+
+def test_full_buffer_drops_oldest_then_evicts(monkeypatch):
+    monkeypatch.setattr(realtime, "MAX_DROPS", 3)
+
+    async def run():
+        hub = realtime.Hub(buffer_size=2)
+        slow = hub.subscribe(["home:1"])
+        for i in range(4):
+            hub.publish(["home:1"], f"m{i}")
+        assert [await slow.get(), await slow.get()] == ["m2", "m3"]
+        for i in range(5):
+            hub.publish(["home:1"], f"n{i}")
+        assert slow.closed
+        assert await slow.get() is None
+
+    asyncio.run(run())
+
+
+def test_fan_out_to_5000_subscribers():
+    async def run():
+        hub = realtime.Hub()
+        subscribers = [hub.subscribe(["home:1"]) for _ in range(5000)]
+
+        async def consume(subscriber):
+            return [await subscriber.get() for _ in range(10)]
+
+        consumers = [asyncio.create_task(consume(s)) for s in subscribers]
+        for _ in range(10):
+            assert hub.dispatch_notification(event(1)) == 5000
+            await asyncio.sleep(0)
+        results = await asyncio.gather(*consumers)
+        assert all(len(r) == 10 for r in results)
+
+    asyncio.run(run())
+
+
+def test_sse_stream_subscribes_only_while_running():
+    async def run():
+        hub = realtime.Hub()
+        topics = realtime.topics_for(1)
+        # A client that disconnects before the body starts leaves nothing behind
+        realtime.sse_stream(hub, topics)
+        assert hub.subscriber_count() == 0
+
+        stream = realtime.sse_stream(hub, topics)
+        assert await stream.__anext__() == "retry: 3000\n\n"
+        assert hub.subscriber_count("home:1") == 1
+        hub.dispatch_notification(event(1))
+        assert (await stream.__anext__()).startswith("data: ")
+        await stream.aclose()
+        assert hub.subscriber_count() == 0
+
+    asyncio.run(run())
+
+
+def test_websocket_receives_home_events(api_client):
+    client = api_client
+    token = client.headers["Authorization"].split()[1]
+    home_id = client.post("/homes/", json={"name": "Live"}).json()["id"]
+    with client.websocket_connect(f"/ws/homes/{home_id}?token={token}") as ws:
+        client.portal.call(main.realtime_hub.dispatch_notification, event(home_id))
+        assert json.loads(ws.receive_text())["home_id"] == home_id
+    assert main.realtime_hub.subscriber_count() == 0
+
+
+def test_websocket_rejects_foreign_home(api_client):
+    client = api_client
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/ws/homes/999?token=bad") as ws:
+            ws.receive_text()
+
+
+def test_listener_channel_matches_the_trigger_migration():
+    path = (
+        Path(__file__).resolve().parents[1]
+        / "migrations"
+        / "versions"
+        / "0006_add_change_notify_triggers.py"
+    )
+    spec = importlib.util.spec_from_file_location("notify_migration", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    assert realtime.CHANNEL == migration.CHANNEL
+    assert f"'{realtime.CHANNEL}'" in migration.NOTIFY_FUNCTION
@@ -0,0 +1,47 @@
+import argparse
+import json
+
+from benchmarks import reporting
+
+
+def parse(*argv):
+    parser = argparse.ArgumentParser()
+    reporting.add_report_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert reporting.percentile(values, 50) == 50
+    assert reporting.percentile(values, 99) == 99
+    assert reporting.percentile([7], 95) == 7
+    assert reporting.percentile([], 50) is None
+
+
+def test_save_then_compare_against_the_baseline(tmp_path, capsys):
+    baseline = str(tmp_path / "nested" / "baseline.json")
+    output = str(tmp_path / "report.json")
+
+    def compare(stored):
+        return [] if stored["p95_ms"] >= 10 else ["p95_ms: regressed"]
+
+    args = parse("--baseline", baseline, "--save-baseline")
+    assert reporting.finish({"p95_ms": 12}, args, compare) == 0
+    assert json.loads(open(baseline).read()) == {"p95_ms": 12}
+
+    args = parse("--baseline", baseline, "--output", output)
+    assert reporting.finish({"p95_ms": 20}, args, compare) == 0
+    assert json.loads(open(output).read())["regressions"] == []
+
+    seen = []
+    assert reporting.finish({}, args, lambda stored: seen.append(stored) or ["x"]) == 1
+    assert seen == [{"p95_ms": 12}]
+    assert "[REGRESSION] x" in capsys.readouterr().err
+
+
+def test_missing_baseline_only_warns(tmp_path, capsys):
+    args = parse("--baseline", str(tmp_path / "missing.json"))
+    assert reporting.finish({"rps": 1}, args, lambda stored: ["never"]) == 0
+    captured = capsys.readouterr()
+    assert "[WARN] Baseline" in captured.err
+    assert json.loads(captured.out) == {"rps": 1}
@@ -0,0 +1,77 @@
+import datetime
+import decimal
+import json
+
+import models
+import schemas
+import serialization
+
+
+def build_home(n_rooms=3, n_elements=2):
+    home = models.Home(
+        id=1,
+        name="Lake House",
+        owner_id=7,
+        version=2,
+        created_at=datetime.datetime(2024, 6, 1, 12, 30),
+    )
+    for r in range(n_rooms):
+        room = models.Room(id=r + 1, name=f"Room {r}", measurements={"area": 12.5})
+        home.rooms.append(room)
+        for e in range(n_elements):
+            element = models.RoomElement(id=r * 100 + e, name=f"Element {e}")
+            element.purchases.append(
+                models.PurchaseDetail(
+                    id=r * 100 + e, vendor="Acme", cost=decimal.Decimal("99.90")
+                )
+            )
+            room.elements.append(element)
+    return home
+
+
+def pydantic_dump(schema, obj):
+    return schema.model_validate(obj, from_attributes=True).model_dump(mode="json")
+
+
+def test_user_serializer_matches_pydantic():
+    user = models.User(
+        id=3,
+        email="a@example.com",
+        hashed_password="secret-hash",  # pragma: allowlist secret
+        full_name=None,
+        is_active=True,
+        is_superuser=False,
+        role="user",
+    )
+    data = serialization.serialize(schemas.UserOut, user)
+    assert data == pydantic_dump(schemas.UserOut, user)
+    assert "hashed_password" not in data
+
+
+def test_nested_serializer_matches_pydantic():
+    home = build_home()
+    data = serialization.serialize(schemas.HomeTreeOut, home)
+    assert data == pydantic_dump(schemas.HomeTreeOut, home)
+    assert data["rooms"][0]["elements"][0]["purchases"][0]["cost"] == "99.90"
+
+
+def test_serializer_is_compiled_once_per_schema():
+    first = serialization.compile_serializer(schemas.HomeTreeOut)
+    assert serialization.compile_serializer(schemas.HomeTreeOut) is first
+
+
+def test_fast_json_response_stdlib_fallback(monkeypatch):
+    payload = serialization.serialize(schemas.HomeTreeOut, build_home(1, 1))
+    fast = serialization.FastJSONResponse(payload).body
+    monkeypatch.setattr(serialization, "orjson", None)
+    fallback = serialization.FastJSONResponse(payload).body
+    assert json.loads(fast) == json.loads(fallback) == payload
+
+
+def test_home_tree_endpoint(api_client):
+    client = api_client
+    home_id = client.post("/homes/", json={"name": "Tree"}).json()["id"]
+    tree = client.get(f"/homes/{home_id}/tree")
+    assert tree.status_code == 200
+    assert tree.json()["rooms"] == []
+    assert client.get("/homes/").json()[0]["id"] == home_id
@@ -0,0 +1,117 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+
+import main
+import models
+import server
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def test_cpu_limit_honours_cgroup_quota(tmp_path):
+    cpu_max = tmp_path / "cpu.max"
+    cpu_max.write_text("50000 100000\n")
+    assert server.cpu_limit(str(cpu_max)) == 1
+    cpu_max.write_text("max 100000\n")
+    assert server.cpu_limit(str(cpu_max)) == len(os.sched_getaffinity(0))
+    assert server.cpu_limit(str(tmp_path / "missing")) >= 1
+
+
+def test_warm_up_fills_pool_and_builds_schema(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'warm.db'}")
+    main.app.openapi_schema = None
+    timings = server.warm_up(main.app, engine, connections=3)
+    assert set(timings) == {"db_pool", "bcrypt", "openapi"}
+    assert engine.pool.checkedin() >= 1
+    assert main.app.openapi_schema is not None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, proc, deadline=30):
+    end = time.monotonic() + deadline
+    while time.monotonic() < end:
+        assert proc.poll() is None, "server exited during startup"
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise AssertionError("server did not come up")
+
+
+@pytest.mark.slow
+def test_reload_and_drain_keep_requests(tmp_path):
+    db_path = tmp_path / "server.db"
+    models.Base.metadata.create_all(create_engine(f"sqlite:///{db_path}"))
+    port = free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        WEB_CONCURRENCY="2",
+        HOST="127.0.0.1",
+        PORT=str(port),
+        METRICS_DIR=str(tmp_path / "metrics"),
+        METRICS_TOKEN="scrape-secret",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "server.py"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(base + "/", proc)
+        for _ in range(5):
+            httpx.get(base + "/")
+        proc.send_signal(signal.SIGHUP)
+        time.sleep(0.5)
+        wait_until_up(base + "/", proc)
+        # Counters of the retired workers were archived, not lost
+        text = httpx.get(
+            base + "/metrics", headers={"Authorization": "Bearer scrape-secret"}
+        ).text
+        total = sum(
+            float(line.rsplit(" ", 1)[1])
+            for line in text.splitlines()
+            if line.startswith('http_requests_total{method="GET",route="/",')
+        )
+        assert total >= 6
+
+        # Registration hashes with bcrypt, so it is still in flight at SIGTERM
+        result = {}
+
+        def register():
+            result["response"] = httpx.post(
+                base + "/auth/register",
+                json={"email": "drain@example.com", "password": "secret123"},
+                timeout=30,
+            )
+
+        thread = threading.Thread(target=register)
+        thread.start()
+        time.sleep(0.05)
+        proc.send_signal(signal.SIGTERM)
+        thread.join()
+        assert result["response"].status_code == 200
+        assert proc.wait(timeout=30) == 0
+    finally:
+        if proc.poll() is None:
+            proc.kill()
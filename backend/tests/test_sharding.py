@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+import sharding
+
+
+def test_partition_is_balanced_and_deterministic():
+    weights = {f"test_x::t{i}": float(s) for i, s in enumerate([7, 6, 5, 4, 3, 3, 2])}
+    shards = sharding.partition(weights, 3)
+    loads = [sum(weights[k] for k in shard) for shard in shards]
+    # LPT's guarantee: within 4/3 of the perfect split (10s per shard here)
+    assert max(loads) <= 4 / 3 * sum(weights.values()) / 3
+    assert min(loads) >= 9.0
+    assert sorted(k for shard in shards for k in shard) == sorted(weights)
+    assert shards == sharding.partition(dict(reversed(weights.items())), 3)
+
+
+def test_junit_ids_and_node_ids_share_keys():
+    assert sharding.junit_key("tests.test_x.TestY.test_z[a.b]") == (
+        sharding.item_key("tests/test_x.py::TestY::test_z[a.b]")
+    )
+    assert sharding.junit_key("test_x.test_z") == sharding.item_key(
+        "/app/tests/test_x.py::test_z"
+    )
+
+
+def test_new_tests_get_module_then_overall_median(tmp_path):
+    path = tmp_path / "durations.json"
+    durations = {"tests.test_a.t1": 1.0, "tests.test_a.t2": 3.0, "tests.test_b.t1": 9}
+    path.write_text(json.dumps({"durations": durations}))
+    known = sharding.load_durations(str(path))
+    weights = sharding.weigh(["test_a::new", "test_c::new", "test_b::t1"], known)
+    assert weights == {"test_a::new": 2.0, "test_c::new": 3.0, "test_b::t1": 9.0}
+    assert sharding.weigh(["x::y"], {}) == {"x::y": sharding.DEFAULT_DURATION}
+
+
+@pytest.mark.parametrize("text", ["3", "0/2", "3/2", "a/b"])
+def test_parse_shard_rejects_bad_values(text):
+    with pytest.raises(ValueError):
+        sharding.parse_shard(text)
@@ -0,0 +1,173 @@
+import asyncio
+
+import pytest
+
+import main
+import models
+import summarization
+
+KITCHEN = ["Move the island left. It blocks the door.", "Agreed, 30cm at least."]
+BATHROOM = ["Tiles should be matte.", "Matte grey is fine."]
+
+
+def test_thread_hash_changes_with_content():
+    assert summarization.thread_hash(KITCHEN) == summarization.thread_hash(
+        list(KITCHEN)
+    )
+    assert summarization.thread_hash(KITCHEN) != summarization.thread_hash(
+        KITCHEN + ["One more thing."]
+    )
+    assert summarization.thread_hash(["ab", "c"]) != summarization.thread_hash(
+        ["a", "bc"]
+    )
+
+
+def test_concurrent_requests_for_same_thread_are_coalesced():
+    backend = summarization.StubSummarizer()
+    service = summarization.SummaryService(backend=backend, batch_window=0.01)
+
+    async def run():
+        return await asyncio.gather(*[service.summarize(KITCHEN) for _ in range(10)])
+
+    results = asyncio.run(run())
+    assert backend.calls == [1]
+    assert len(set(results)) == 1
+    assert results[0][1].startswith("2 comment(s): Move the island left")
+
+
+def test_distinct_threads_share_one_model_call():
+    backend = summarization.StubSummarizer()
+    service = summarization.SummaryService(backend=backend, batch_window=0.01)
+
+    async def run():
+        threads = [KITCHEN, BATHROOM] + [[f"Comment {i}"] for i in range(5)]
+        return await asyncio.gather(*[service.summarize(t) for t in threads])
+
+    results = asyncio.run(run())
+    assert backend.calls == [7]
+    assert len({summary for _, summary in results}) == 7
+
+
+def test_max_batch_splits_model_calls():
+    backend = summarization.StubSummarizer()
+    service = summarization.SummaryService(
+        backend=backend, batch_window=0.01, max_batch=4
+    )
+
+    async def run():
+        threads = [[f"Comment {i}"] for i in range(10)]
+        await asyncio.gather(*[service.summarize(t) for t in threads])
+
+    asyncio.run(run())
+    assert sorted(backend.calls) == [2, 4, 4]
+
+
+class ShortSummarizer(summarization.StubSummarizer):
+    """Drops the last summary, like a model that skipped a thread."""
+
+    async def summarize_batch(self, threads):
+        return (await super().summarize_batch(threads))[:-1]
+
+
+def test_short_backend_reply_fails_every_waiter():
+    service = summarization.SummaryService(backend=ShortSummarizer(), batch_window=0.01)
+
+    async def run():
+        threads = [KITCHEN, BATHROOM, ["Paint it white."]]
+        return await asyncio.wait_for(
+            asyncio.gather(
+                *[service.summarize(t) for t in threads], return_exceptions=True
+            ),
+            timeout=5,
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert service._inflight == {}
+
+
+def test_summary_is_recomputed_only_when_thread_changes(db_session):
+    backend = summarization.StubSummarizer()
+
+    async def run(service, comments):
+        return await service.summarize(comments, db=db_session)
+
+    first = summarization.SummaryService(backend=backend, batch_window=0)
+    asyncio.run(run(first, KITCHEN))
+    asyncio.run(run(first, KITCHEN))
+    assert backend.calls == [1]
+
+    # A fresh service (e.g. another worker) reuses the stored summary
+    second = summarization.SummaryService(backend=backend, batch_window=0)
+    asyncio.run(run(second, KITCHEN))
+    assert backend.calls == [1]
+
+    asyncio.run(run(second, KITCHEN + ["Actually, move it right."]))
+    assert backend.calls == [1, 1]
+    assert db_session.query(models.CommentSummary).count() == 2
+
+
+def add_thread(db, owner_email, comments):
+    owner = db.query(models.User).filter_by(email=owner_email).one_or_none()
+    if owner is None:
+        owner = models.User(email=owner_email, hashed_password="x")
+        db.add(owner)
+        db.flush()
+    home = models.Home(name="Home", owner_id=owner.id)
+    db.add(home)
+    db.flush()
+    room = models.Room(home_id=home.id, name="Kitchen")
+    db.add(room)
+    db.flush()
+    element = models.RoomElement(room_id=room.id, name="Island")
+    db.add(element)
+    db.flush()
+    for content in comments:
+        db.add(models.Comment(user_id=owner.id, room_id=room.id, content=content))
+        db.add(
+            models.Comment(
+                user_id=owner.id,
+                room_id=room.id,
+                element_id=element.id,
+                content=content,
+            )
+        )
+    db.commit()
+    return room.id, element.id
+
+
+@pytest.fixture
+def stub_service(monkeypatch):
+    service = summarization.SummaryService(
+        backend=summarization.StubSummarizer(), batch_window=0
+    )
+    monkeypatch.setattr(main, "summary_service", service)
+    return service
+
+
+def test_summarize_endpoint_for_own_thread(
+    api_client, api_user, db_session, stub_service
+):
+    room_id, element_id = add_thread(db_session, api_user.email, KITCHEN)
+    for body in ({"room_id": room_id}, {"element_id": element_id}):
+        response = api_client.post("/ai/summarize", json=body)
+        assert response.status_code == 200
+        assert response.json()["comment_count"] == 2
+        assert response.json()["summary"].startswith("2 comment(s): Move the island")
+    saved = {c.ai_summary for c in db_session.query(models.Comment)}
+    assert saved == {response.json()["summary"]}
+
+
+def test_summarize_endpoint_hides_other_users_threads(
+    api_client, db_session, stub_service
+):
+    room_id, element_id = add_thread(
+        db_session, "other@example.com", ["The safe code is 1234."]
+    )
+    for body in ({"room_id": room_id}, {"element_id": element_id}):
+        response = api_client.post("/ai/summarize", json=body)
+        assert response.status_code == 403
+        assert "1234" not in response.text
+    assert stub_service.backend.calls == []
+    missing = api_client.post("/ai/summarize", json={"room_id": 999999})
+    assert missing.status_code == 404
@@ -0,0 +1,61 @@
+from collections import Counter
+
+import synthetic_data
+
+PROFILE = synthetic_data.DEFAULT_PROFILE
+
+
+def rows(table, stop, seed=7, sizes=None, profile=PROFILE):
+    sizes = sizes or synthetic_data.counts(2000, profile)
+    text = synthetic_data.generate(table, 1, stop, seed, sizes, profile)
+    return [line.split("\t") for line in text.splitlines()]
+
+
+def test_same_seed_same_rows():
+    sizes = synthetic_data.counts(2000, PROFILE)
+    for table in synthetic_data.TABLES:
+        first = synthetic_data.generate(table, 1, 300, 7, sizes, PROFILE)
+        assert first == synthetic_data.generate(table, 1, 300, 7, sizes, PROFILE)
+        assert first != synthetic_data.generate(table, 1, 300, 8, sizes, PROFILE)
+        columns = synthetic_data.TABLES[table].count(",") + 1
+        assert all(len(r.split("\t")) == columns for r in first.splitlines())
+
+
+def test_zero_ratios_give_empty_tables_and_small_ones_round_up():
+    users_only = {**PROFILE, "homes_per_user": 0}
+    sizes = synthetic_data.counts(1000, users_only)
+    assert sizes["users"] == 1000
+    assert all(sizes[table] == 0 for table in synthetic_data.TABLES if table != "users")
+
+    sparse = {**PROFILE, "homes_per_user": 0.0001, "comments_per_element": 0}
+    sizes = synthetic_data.counts(1000, sparse)
+    assert sizes["homes"] == 1 and sizes["room_elements"] >= 1
+    assert sizes["comments"] == 0
+
+
+def test_foreign_keys_are_in_range_and_consistent():
+    sizes = synthetic_data.counts(2000, PROFILE)
+    element_room = {
+        int(r[0]): int(r[1]) for r in rows("room_elements", sizes["room_elements"] + 1)
+    }
+    comments = rows("comments", sizes["comments"] + 1)
+    assert len(comments) == sizes["comments"]
+    for _, user, room, element, *_ in comments:
+        assert 1 <= int(user) <= sizes["users"]
+        assert element_room[int(element)] == int(room)
+    homes = rows("homes", sizes["homes"] + 1)
+    assert all(1 <= int(r[3]) <= sizes["users"] for r in homes)
+
+
+def test_role_mix_and_owner_skew_follow_the_profile():
+    users = rows("users", 20001, sizes=synthetic_data.counts(20000, PROFILE))
+    roles = Counter(r[6] for r in users)
+    assert abs(roles["designer"] / 20000 - PROFILE["roles"]["designer"]) < 0.01
+    assert all((r[5] == "t") == (r[6] == "admin") for r in users)
+
+    def mean_owner(skew):
+        profile = {**PROFILE, "owner_skew": skew}
+        homes = rows("homes", 5001, profile=profile)
+        return sum(int(r[3]) for r in homes) / len(homes)
+
+    assert mean_owner(3.0) < mean_owner(1.0) * 0.6
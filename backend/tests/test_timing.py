@@ -0,0 +1,85 @@
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import auth
+import models
+import timing
+
+
+def test_span_outside_a_request_is_a_no_op():
+    assert timing.current_trace() is None
+    with timing.span("anything"):
+        pass
+    assert timing.current_trace() is None
+
+
+def add_timed_user(db):
+    db.add(
+        models.User(
+            email="timed@example.com", hashed_password=auth.get_password_hash("pw")
+        )
+    )
+    db.commit()
+
+
+def test_login_has_no_server_timing_by_default(client, db_session):
+    assert timing.SERVER_TIMING is False
+    add_timed_user(db_session)
+    for username in ("timed@example.com", "nobody@example.com"):
+        response = client.post(
+            "/auth/login", data={"username": username, "password": "pw"}
+        )
+        assert "Server-Timing" not in response.headers
+
+
+def test_login_reports_each_phase(client, db_session, monkeypatch):
+    monkeypatch.setattr(timing, "SERVER_TIMING", True)
+    add_timed_user(db_session)
+
+    response = client.post(
+        "/auth/login", data={"username": "timed@example.com", "password": "pw"}
+    )
+    assert response.status_code == 200
+    header = response.headers["Server-Timing"]
+    phases = {part.split(";")[0]: part for part in header.split(", ")}
+    assert {"db", "bcrypt", "jwt", "total"} <= set(phases)
+    total = float(phases["total"].split("dur=")[1])
+    bcrypt = float(phases["bcrypt"].split("dur=")[1].split(";")[0])
+    assert 0 < bcrypt <= total
+
+
+def test_sampled_requests_are_logged_as_json(capsys):
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        for _ in range(3):
+            with timing.span("step"):
+                pass
+        return {"id": item_id}
+
+    app.add_middleware(timing.ServerTimingMiddleware, header=True, sample_rate=1.0)
+    with TestClient(app) as client:
+        response = client.get("/items/7")
+    assert "step;dur=" in response.headers["Server-Timing"]
+    assert 'desc="3x"' in response.headers["Server-Timing"]
+
+    lines = [
+        json.loads(line)
+        for line in capsys.readouterr().out.splitlines()
+        if line.startswith('{"event": "trace"')
+    ]
+    assert len(lines) == 1
+    assert lines[0]["route"] == "/items/{item_id}"
+    assert lines[0]["status"] == 200
+    assert [span["name"] for span in lines[0]["spans"]] == ["step"] * 3
+
+
+def test_header_can_be_disabled():
+    app = FastAPI()
+    app.get("/")(lambda: {})
+    app.add_middleware(timing.ServerTimingMiddleware, header=False, sample_rate=0)
+    with TestClient(app) as client:
+        assert "Server-Timing" not in client.get("/").headers
@@ -0,0 +1,179 @@
+"""
+timing.py: Per-request phase timing (Server-Timing header + trace log).
+
+- ServerTimingMiddleware opens a Trace per HTTP request in a context
+  variable; threadpool handlers see it too, since anyio copies the context
+- Code annotates phases with ``with timing.span("name"):``. Outside a
+  request (scripts, tests, startup) a span is a no-op
+- instrument_engine() adds a "db" span around every SQL statement
+- The response gets ``Server-Timing: db;dur=1.8;desc="3x", bcrypt;dur=240.1,
+  total;dur=245.0`` (durations in ms, summed per name). Off by default: the
+  spans show e.g. whether a login ran bcrypt, so whether an email exists.
+  Set SERVER_TIMING=1 only where the clients are trusted
+- A sample of requests (TRACE_SAMPLE_RATE) and every request slower than
+  TRACE_SLOW_MS is logged as one JSON line with the individual spans
+"""
+
+import contextvars
+import json
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "1000"))
+MAX_SPANS = 200
+
+_current = contextvars.ContextVar("timing_trace", default=None)
+
+
+class Trace:
+    __slots__ = ("start", "totals", "spans", "dropped")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.totals = {}  # name -> [seconds, count]
+        self.spans = []  # (name, offset, seconds), capped at MAX_SPANS
+        self.dropped = 0
+
+    def add(self, name, start, seconds):
+        total = self.totals.get(name)
+        if total is None:
+            self.totals[name] = [seconds, 1]
+        else:
+            total[0] += seconds
+            total[1] += 1
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append((name, start - self.start, seconds))
+        else:
+            self.dropped += 1
+
+    def header(self, total_seconds):
+        parts = []
+        for name, (seconds, count) in self.totals.items():
+            part = f"{name};dur={seconds * 1000:.1f}"
+            if count > 1:
+                part += f';desc="{count}x"'
+            parts.append(part)
+        parts.append(f"total;dur={total_seconds * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, time.perf_counter() - start)
+
+
+def record(name, start, seconds):
+    """Add a span measured elsewhere (``start`` from time.perf_counter())."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, start, seconds)
+
+
+def instrument_engine(engine):
+    """Time every statement on ``engine`` as a "db" span."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("timing_starts", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("timing_starts")
+        if starts:
+            start = starts.pop()
+            record("db", start, time.perf_counter() - start)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        conn = context.connection
+        starts = conn.info.get("timing_starts") if conn is not None else None
+        if starts:
+            starts.pop()
+
+
+def log_trace(trace, scope, status, total_seconds):
+    route = scope.get("route")
+    line = {
+        "event": "trace",
+        "trace_id": uuid.uuid4().hex[:16],
+        "method": scope["method"],
+        "route": getattr(route, "path", None) or scope["path"],
+        "status": status,
+        "total_ms": round(total_seconds * 1000, 2),
+        "spans": [
+            {
+                "name": name,
+                "start_ms": round(offset * 1000, 2),
+                "dur_ms": round(seconds * 1000, 2),
+            }
+            for name, offset, seconds in trace.spans
+        ],
+    }
+    if trace.dropped:
+        line["dropped_spans"] = trace.dropped
+    print(json.dumps(line), flush=True)
+
+
+class ServerTimingMiddleware:
+    """Pure ASGI middleware; total covers everything up to the last body chunk."""
+
+    def __init__(
+        self,
+        app,
+        header=None,
+        sample_rate=TRACE_SAMPLE_RATE,
+        slow_ms=TRACE_SLOW_MS,
+    ):
+        self.app = app
+        self.header = header  # None: follow SERVER_TIMING
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trace = Trace()
+        token = _current.set(trace)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING if self.header is None else self.header:
+                    elapsed = time.perf_counter() - trace.start
+                    headers = list(message.get("headers", ()))
+                    headers.append(
+                        (b"server-timing", trace.header(elapsed).encode("latin-1"))
+                    )
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            total = time.perf_counter() - trace.start
+            if total >= self.slow_seconds or random.random() < self.sample_rate:
+                log_trace(trace, scope, status, total)
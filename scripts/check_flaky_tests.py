@@ -1,65 +1,363 @@
 #!/usr/bin/env python3
 """
-check_flaky_tests.py: Detects flaky/repeatedly failing tests from JUnit XML reports.
-- Looks for tests that failed in the last N runs (default: 3)
-- Prints a summary and exits nonzero if flakiness is detected
-- Can be used in CI to trigger notifications
+check_flaky_tests.py: Test history store built from JUnit XML reports.
+
+- Every run ingests new reports/*-junit.xml files into a local SQLite store
+  (--db, default .test-history/history.sqlite). A report counts as new when
+  its content hash has not been seen, so re-running is cheap and reports
+  overwritten in place by the next test run become a new run
+- Reports are read with streaming iterparse, one <testcase> at a time
+- Per test, over its last --window runs: failure rate, p50/p95 duration and
+  a flakiness score, the share of consecutive runs whose outcome flipped
+  between pass and fail (always-failing tests score 0: broken, not flaky)
+- Prints the flaky tests, the slowest tests and the most regressed ones
+  (recent median duration against the earlier runs in the window)
+- Exits nonzero if a test is flaky or failed in 2 of its last 3 runs, so CI
+  can trigger notifications; --output writes the whole report as JSON
+- --export-durations writes each test's p50 duration as JSON, the weights
+  backend/tests/sharding.py balances `pytest --shard i/N` with
 """
+
+import argparse
+import glob
+import hashlib
+import json
 import os
+import sqlite3
 import sys
-import glob
 import xml.etree.ElementTree as ET
-from collections import defaultdict
+from datetime import datetime, timezone
+
+# Same nearest-rank percentile as the perf scripts (backend/benchmarks)
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(os.path.dirname(__file__), "..", "backend", "benchmarks")
+    ),
+)
+from reporting import percentile  # noqa: E402
+
+REPORTS_PATTERN = os.path.join("reports", "*-junit.xml")
+DEFAULT_DB = os.path.join(".test-history", "history.sqlite")
+DEFAULT_DURATIONS = os.path.join(".test-history", "durations.json")
+HISTORY_DEPTH = 3  # Recent runs checked for repeated failures
+FAILED = ("failure", "error")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    report TEXT NOT NULL,
+    sha256 TEXT NOT NULL UNIQUE,
+    started_at TEXT NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    test TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_test_run ON results (test, run_id);
+"""
 
-REPORTS_DIR = "reports"
-HISTORY_DEPTH = 3  # Number of recent runs to check
 
+def connect(path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
 
-# Find all JUnit XML files in reports/
-def find_junit_reports():
-    return sorted(glob.glob(os.path.join(REPORTS_DIR, "*-junit.xml")))
 
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-def parse_failures(xml_path):
-    failures = set()
+
+def iter_testcases(xml_path):
+    """Yield (started_at, test, outcome, seconds) per <testcase>, streaming."""
+    started_at = None
+    open_elements = []
+    for event, elem in ET.iterparse(xml_path, events=("start", "end")):
+        if event == "start":
+            open_elements.append(elem)
+            if elem.tag == "testsuite" and started_at is None:
+                started_at = elem.get("timestamp")
+            continue
+        open_elements.pop()
+        if elem.tag == "testcase":
+            outcome = "passed"
+            for child in elem:
+                if child.tag in FAILED:
+                    outcome = "failed"
+                    break
+                if child.tag == "skipped":
+                    outcome = "skipped"
+            test = f"{elem.get('classname', '')}.{elem.get('name', '')}"
+            yield started_at, test, outcome, float(elem.get("time") or 0)
+        elif elem.tag != "testsuite":
+            continue
+        # Drop the finished testcase (or suite) and its siblings from the
+        # enclosing suite, so memory stays flat on huge reports
+        elem.clear()
+        if open_elements:
+            del open_elements[-1][:]
+
+
+def run_started_at(timestamp, mtime):
+    """The suite's timestamp (pytest writes local time) in UTC, else mtime."""
     try:
-        tree = ET.parse(xml_path)
-        for testcase in tree.findall(".//testcase"):
-            if (
-                testcase.find("failure") is not None
-                or testcase.find("error") is not None
-            ):
-                name = (
-                    testcase.attrib.get("classname", "")
-                    + "."
-                    + testcase.attrib.get("name", "")
+        started = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        started = mtime
+    return started.astimezone(timezone.utc).isoformat()
+
+
+def ingest(conn, reports):
+    """Add reports not seen before; returns the number of new runs."""
+    added = 0
+    for path in reports:
+        sha = file_sha256(path)
+        if conn.execute("SELECT 1 FROM runs WHERE sha256 = ?", (sha,)).fetchone():
+            continue
+        mtime = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc)
+        try:
+            with conn:
+                run_id = conn.execute(
+                    "INSERT INTO runs (report, sha256, started_at, ingested_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (path, sha, "", datetime.now(timezone.utc).isoformat()),
+                ).lastrowid
+                started_at = None
+                rows = []
+                for case in iter_testcases(path):
+                    started_at = case[0]
+                    rows.append((run_id, *case[1:]))
+                    if len(rows) >= 5000:
+                        conn.executemany("INSERT INTO results VALUES (?,?,?,?)", rows)
+                        rows = []
+                conn.executemany("INSERT INTO results VALUES (?,?,?,?)", rows)
+                conn.execute(
+                    "UPDATE runs SET started_at = ? WHERE id = ?",
+                    (run_started_at(started_at, mtime), run_id),
                 )
-                failures.add(name)
-    except Exception as e:
-        print(f"[WARN] Could not parse {xml_path}: {e}")
-    return failures
+        except ET.ParseError as e:
+            print(f"[WARN] Could not parse {path}: {e}")
+            continue
+        added += 1
+    return added
+
+
+def median(values):
+    return percentile(sorted(values), 50)
+
+
+def history(conn, window):
+    """{test: [(outcome, duration), ...]} oldest first, last `window` runs."""
+    rows = conn.execute(
+        """
+        SELECT test, outcome, duration FROM (
+            SELECT r.test, r.outcome, r.duration, runs.started_at, runs.id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY r.test ORDER BY runs.started_at DESC, runs.id DESC
+                   ) AS age
+            FROM results r JOIN runs ON runs.id = r.run_id
+            WHERE r.outcome != 'skipped'
+        )
+        WHERE age <= ?
+        ORDER BY test, started_at, id
+        """,
+        (window,),
+    )
+    tests = {}
+    for test, outcome, duration in rows:
+        tests.setdefault(test, []).append((outcome, duration))
+    return tests
+
+
+def export_durations(conn, path, window=50):
+    """Write {"durations": {test: p50 seconds}}; returns the number of tests."""
+    durations = {
+        test: percentile(sorted(duration for _, duration in runs), 50)
+        for test, runs in history(conn, window).items()
+    }
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"window": window, "durations": durations}, f, indent=1)
+    return len(durations)
+
+
+def refresh_durations(
+    path=DEFAULT_DURATIONS, db=DEFAULT_DB, reports=REPORTS_PATTERN, window=50
+):
+    """Ingest new reports, then export durations; used by the test runners."""
+    conn = connect(db)
+    try:
+        ingest(conn, sorted(glob.glob(reports), key=os.path.getmtime))
+        return export_durations(conn, path, window)
+    finally:
+        conn.close()
+
+
+def summarize(runs, recent):
+    outcomes = [outcome for outcome, _ in runs]
+    durations = [duration for _, duration in runs]
+    failures = outcomes.count("failed")
+    flips = sum(1 for a, b in zip(outcomes, outcomes[1:]) if a != b)
+    ordered = sorted(durations)
+    stats = {
+        "runs": len(runs),
+        "failures": failures,
+        "failure_rate": round(failures / len(runs), 3),
+        "flakiness": round(flips / (len(runs) - 1), 3) if len(runs) > 1 else 0.0,
+        "p50_s": round(percentile(ordered, 50), 4),
+        "p95_s": round(percentile(ordered, 95), 4),
+        "recent_failures": outcomes[-HISTORY_DEPTH:].count("failed"),
+        "regression": None,
+    }
+    # Regression: median of the last `recent` runs vs. the runs before them
+    if len(durations) >= recent + 3:
+        before = median(durations[:-recent])
+        after = median(durations[-recent:])
+        stats["regression"] = {
+            "before_s": round(before, 4),
+            "after_s": round(after, 4),
+            "delta_s": round(after - before, 4),
+            "ratio": round(after / before, 2) if before else None,
+        }
+    return stats
+
+
+def analyze(conn, window, recent, top, flaky_threshold, min_delta):
+    stats = {
+        test: summarize(runs, recent) for test, runs in history(conn, window).items()
+    }
+    flaky = sorted(
+        (
+            test
+            for test, s in stats.items()
+            if s["failures"] >= 2 and s["flakiness"] >= flaky_threshold
+        ),
+        key=lambda t: -stats[t]["flakiness"],
+    )
+    repeated = sorted(t for t, s in stats.items() if s["recent_failures"] >= 2)
+    slowest = sorted(stats, key=lambda t: -stats[t]["p50_s"])[:top]
+    regressed = sorted(
+        (
+            t
+            for t, s in stats.items()
+            if s["regression"] and s["regression"]["delta_s"] >= min_delta
+        ),
+        key=lambda t: -stats[t]["regression"]["delta_s"],
+    )[:top]
+    runs = conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+    return {
+        "runs": runs,
+        "tests": len(stats),
+        "window": window,
+        "flaky": {t: stats[t] for t in flaky},
+        "repeated_failures": {t: stats[t] for t in repeated},
+        "slowest": {t: stats[t] for t in slowest},
+        "regressed": {t: stats[t] for t in regressed},
+    }
+
+
+def print_report(report):
+    print(
+        f"[INFO] {report['tests']} tests across {report['runs']} stored runs "
+        f"(window: last {report['window']} runs per test)"
+    )
+    if report["flaky"]:
+        print("[FLAKY] Tests flipping between pass and fail:")
+        for test, s in report["flaky"].items():
+            print(
+                f"  - {test}: flakiness {s['flakiness']:.2f}, "
+                f"failed {s['failures']}/{s['runs']} runs"
+            )
+    if report["repeated_failures"]:
+        print(
+            f"[FLAKY] Tests that failed in multiple of their last {HISTORY_DEPTH} runs:"
+        )
+        for test in report["repeated_failures"]:
+            print(f"  - {test}")
+    if not report["flaky"] and not report["repeated_failures"]:
+        print("[INFO] No flaky tests detected in recent runs.")
+    if report["slowest"]:
+        print("[INFO] Slowest tests (p50 / p95):")
+        for test, s in report["slowest"].items():
+            print(f"  - {test}: {s['p50_s']:.3f}s / {s['p95_s']:.3f}s")
+    if report["regressed"]:
+        print("[WARN] Most regressed tests (median before -> recent):")
+        for test, s in report["regressed"].items():
+            r = s["regression"]
+            print(f"  - {test}: {r['before_s']:.3f}s -> {r['after_s']:.3f}s")
 
 
 def main():
-    all_reports = find_junit_reports()
-    if not all_reports:
+    parser = argparse.ArgumentParser(
+        description="Track test outcomes and durations across JUnit XML reports"
+    )
+    parser.add_argument("--db", default=os.getenv("TEST_HISTORY_DB", DEFAULT_DB))
+    parser.add_argument(
+        "--reports",
+        default=REPORTS_PATTERN,
+        help=f"Glob of JUnit XML reports to ingest (default: {REPORTS_PATTERN})",
+    )
+    parser.add_argument(
+        "--window", type=int, default=50, help="Runs per test to analyze"
+    )
+    parser.add_argument(
+        "--recent",
+        type=int,
+        default=5,
+        help="Runs compared against the rest of the window for regressions",
+    )
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--flaky-threshold",
+        type=float,
+        default=0.2,
+        help="Minimum share of pass/fail flips for a test to count as flaky",
+    )
+    parser.add_argument(
+        "--min-delta",
+        type=float,
+        default=0.05,
+        help="Ignore duration regressions smaller than this many seconds",
+    )
+    parser.add_argument("--output", help="Write the report as JSON")
+    parser.add_argument(
+        "--export-durations",
+        nargs="?",
+        const=DEFAULT_DURATIONS,
+        metavar="PATH",
+        help=f"Write per-test p50 durations (default: {DEFAULT_DURATIONS})",
+    )
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    reports = sorted(glob.glob(args.reports), key=os.path.getmtime)
+    added = ingest(conn, reports)
+    print(f"[INFO] Ingested {added} new report(s) into {args.db}")
+    if args.export_durations:
+        count = export_durations(conn, args.export_durations, args.window)
+        print(f"[INFO] Wrote durations for {count} tests to {args.export_durations}")
+    report = analyze(
+        conn, args.window, args.recent, args.top, args.flaky_threshold, args.min_delta
+    )
+    conn.close()
+    if not report["runs"]:
         print("[INFO] No JUnit XML reports found.")
         sys.exit(0)
-    # Only check the last N runs
-    recent_reports = all_reports[-HISTORY_DEPTH:]
-    fail_history = defaultdict(int)
-    for report in recent_reports:
-        for test in parse_failures(report):
-            fail_history[test] += 1
-    flaky = [t for t, count in fail_history.items() if count >= 2]
-    if flaky:
-        print("[FLAKY] The following tests failed in multiple recent runs:")
-        for t in flaky:
-            print(f"  - {t}")
-        sys.exit(1)
-    else:
-        print("[INFO] No flaky tests detected in recent runs.")
-        sys.exit(0)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if report["flaky"] or report["repeated_failures"] else 0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+loadtest.py: Asyncio HTTP load generator for the backend.
+
+- Runs a scenario file (JSON, see scripts/loadtest_scenarios/) with N
+  virtual users; each user repeats the scenario's steps until the duration
+  is over. Users start evenly spread over the ramp-up period
+- Steps can template values ("{email}", "{token}") from per-iteration vars
+  and extract values from JSON responses for later steps
+- Prints a JSON report: overall and per-step RPS, p50/p95/p99 latency and
+  an error breakdown. RPS only counts requests started after the ramp-up,
+  so it is the steady-state rate at full concurrency
+- With --baseline, compares against a stored report and exits 1 if
+  throughput drops, latency rises or errors grow beyond the thresholds
+
+Examples:
+    python scripts/loadtest.py scripts/loadtest_scenarios/auth_flow.json \\
+        --concurrency 50 --ramp-up 10 --duration 60 --output reports/load.json
+    python scripts/loadtest.py scripts/loadtest_scenarios/auth_flow.json \\
+        --baseline reports/load-baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+
+import httpx
+
+# Report and baseline handling shared with backend/benchmarks/db_perf.py
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(os.path.dirname(__file__), "..", "backend", "benchmarks")
+    ),
+)
+from reporting import add_report_arguments, finish, percentile  # noqa: E402
+
+DEFAULT_BASE_URL = os.getenv("LOADTEST_BASE_URL", "http://localhost:8000")
+
+
+class StepFailed(Exception):
+    pass
+
+
+def render(value, variables):
+    """Fill "{name}" placeholders in strings, recursively."""
+    if isinstance(value, str):
+        return value.format_map(variables)
+    if isinstance(value, dict):
+        return {k: render(v, variables) for k, v in value.items()}
+    if isinstance(value, list):
+        return [render(v, variables) for v in value]
+    return value
+
+
+def load_scenario(path):
+    with open(path) as f:
+        scenario = json.load(f)
+    if not scenario.get("steps"):
+        raise ValueError(f"{path}: scenario has no steps")
+    for step in scenario["steps"]:
+        step.setdefault("name", f"{step.get('method', 'GET')} {step['path']}")
+        step.setdefault("method", "GET")
+        step.setdefault("expect", [200])
+    scenario.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    scenario.setdefault("vars", {})
+    return scenario
+
+
+class Stats:
+    def __init__(self, measure_from=0.0):
+        self.latencies = defaultdict(list)  # step -> seconds
+        self.errors = defaultdict(Counter)  # step -> kind -> count
+        self.steady = Counter()  # step -> requests started after ramp-up
+        self.measure_from = measure_from  # time.monotonic() at end of ramp-up
+        self.iterations = 0
+
+    def summary(self, steady_elapsed):
+        steps = {}
+        all_latencies = []
+        all_errors = Counter()
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            latencies = sorted(self.latencies[name])
+            errors = self.errors[name]
+            all_latencies.extend(latencies)
+            all_errors.update(errors)
+            steps[name] = self._block(
+                latencies, errors, self.steady[name], steady_elapsed
+            )
+        overall = self._block(
+            sorted(all_latencies),
+            all_errors,
+            sum(self.steady.values()),
+            steady_elapsed,
+        )
+        overall["iterations"] = self.iterations
+        return overall, steps
+
+    @staticmethod
+    def _block(latencies, errors, steady, steady_elapsed):
+        failed = sum(errors.values())
+        total = len(latencies) + failed
+        return {
+            "requests": total,
+            "errors": failed,
+            "error_rate": round(failed / total, 4) if total else 0.0,
+            "rps": round(steady / steady_elapsed, 2) if steady_elapsed else 0.0,
+            "p50_ms": _ms(percentile(latencies, 50)),
+            "p95_ms": _ms(percentile(latencies, 95)),
+            "p99_ms": _ms(percentile(latencies, 99)),
+            "max_ms": _ms(latencies[-1] if latencies else None),
+            "error_breakdown": dict(errors.most_common()),
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+async def run_step(client, step, variables, stats):
+    kwargs = {}
+    if "json" in step:
+        kwargs["json"] = render(step["json"], variables)
+    if "form" in step:
+        kwargs["data"] = render(step["form"], variables)
+    if "headers" in step:
+        kwargs["headers"] = render(step["headers"], variables)
+    path = render(step["path"], variables)
+    if time.monotonic() >= stats.measure_from:
+        stats.steady[step["name"]] += 1
+    start = time.perf_counter()
+    try:
+        response = await client.request(step["method"], path, **kwargs)
+    except httpx.HTTPError as exc:
+        stats.errors[step["name"]][type(exc).__name__] += 1
+        raise StepFailed from exc
+    elapsed = time.perf_counter() - start
+    if response.status_code not in step["expect"]:
+        stats.errors[step["name"]][f"status_{response.status_code}"] += 1
+        raise StepFailed
+    # Only successful requests count towards latency percentiles
+    stats.latencies[step["name"]].append(elapsed)
+    if "extract" in step:
+        try:
+            body = response.json()
+            for var, field in step["extract"].items():
+                variables[var] = body[field]
+        except (ValueError, KeyError, TypeError):
+            stats.errors[step["name"]]["bad_body"] += 1
+            raise StepFailed
+
+
+async def virtual_user(vu, client, scenario, run_id, start_delay, deadline, stats):
+    await asyncio.sleep(start_delay)
+    iteration = 0
+    while time.monotonic() < deadline:
+        variables = {"run": run_id, "vu": vu, "iter": iteration}
+        variables.update(render(scenario["vars"], variables))
+        for step in scenario["steps"]:
+            try:
+                await run_step(client, step, variables, stats)
+            except StepFailed:
+                break  # later steps depend on this one
+        else:
+            stats.iterations += 1
+        iteration += 1
+
+
+async def run_load(scenario, base_url, concurrency, ramp_up, duration, timeout):
+    run_id = uuid.uuid4().hex[:8]
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=timeout
+    ) as client:
+        started = time.monotonic()
+        stats = Stats(measure_from=started + ramp_up)
+        deadline = stats.measure_from + duration
+        users = [
+            virtual_user(
+                vu,
+                client,
+                scenario,
+                run_id,
+                ramp_up * vu / concurrency,
+                deadline,
+                stats,
+            )
+            for vu in range(concurrency)
+        ]
+        await asyncio.gather(*users)
+        finished = time.monotonic()
+    elapsed = finished - started
+    overall, steps = stats.summary(finished - stats.measure_from)
+    return {
+        "scenario": scenario["name"],
+        "base_url": base_url,
+        "concurrency": concurrency,
+        "ramp_up_s": ramp_up,
+        "duration_s": duration,
+        "elapsed_s": round(elapsed, 2),
+        "overall": overall,
+        "steps": steps,
+    }
+
+
+def compare(report, baseline, latency_pct, rps_pct, error_points):
+    """List of regressions (empty when the run is within thresholds)."""
+    regressions = []
+    blocks = [("overall", report["overall"], baseline.get("overall", {}))]
+    for name, block in report["steps"].items():
+        if name in baseline.get("steps", {}):
+            blocks.append((name, block, baseline["steps"][name]))
+    for name, current, previous in blocks:
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            old, new = previous.get(key), current.get(key)
+            if old and new and new > old * (1 + latency_pct / 100):
+                regressions.append(f"{name} {key}: {old} -> {new}")
+        old, new = previous.get("rps"), current.get("rps")
+        if name == "overall" and old and new < old * (1 - rps_pct / 100):
+            regressions.append(f"{name} rps: {old} -> {new}")
+        old, new = previous.get("error_rate", 0), current.get("error_rate", 0)
+        if new - old > error_points / 100:
+            regressions.append(f"{name} error_rate: {old} -> {new}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend load generator")
+    parser.add_argument("scenario", help="Scenario JSON file")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--ramp-up", type=float, default=5, help="Seconds")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds")
+    parser.add_argument("--timeout", type=float, default=30, help="Per request")
+    add_report_arguments(parser)
+    parser.add_argument(
+        "--latency-threshold", type=float, default=20, help="Allowed %% increase"
+    )
+    parser.add_argument(
+        "--rps-threshold", type=float, default=15, help="Allowed %% decrease"
+    )
+    parser.add_argument(
+        "--error-threshold",
+        type=float,
+        default=1,
+        help="Allowed error rate increase in percentage points",
+    )
+    args = parser.parse_args()
+    if args.concurrency < 1 or args.duration <= 0 or args.ramp_up < 0:
+        parser.error("concurrency >= 1, duration > 0 and ramp-up >= 0 required")
+
+    scenario = load_scenario(args.scenario)
+    print(
+        f"[INFO] {scenario['name']}: {args.concurrency} users, "
+        f"{args.ramp_up}s ramp-up, {args.duration}s at {args.base_url}",
+        file=sys.stderr,
+    )
+    report = asyncio.run(
+        run_load(
+            scenario,
+            args.base_url,
+            args.concurrency,
+            args.ramp_up,
+            args.duration,
+            args.timeout,
+        )
+    )
+    sys.exit(
+        finish(
+            report,
+            args,
+            lambda baseline: compare(
+                report,
+                baseline,
+                args.latency_threshold,
+                args.rps_threshold,
+                args.error_threshold,
+            ),
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
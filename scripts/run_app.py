@@ -11,6 +11,106 @@ import time
 import platform
 import urllib.request
 import glob
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+INFRA_DIR = os.path.join(BASE_DIR, "infra")
+NPM_SUBDIRS = ["frontend", "backend", "e2e"]
+BACKEND_URL = "http://localhost:8000/"
+NPM_INSTALL_TIMEOUT = 900
+
+# Every timed step as {"step", "start", "seconds", "status"}; start is the
+# offset from RUN_START, so overlapping (concurrent) steps are visible
+STEP_TIMINGS = []
+_timings_lock = threading.Lock()
+RUN_START = time.perf_counter()
+
+
+@contextmanager
+def timed_step(name):
+    """Time a block; it may set the yielded entry's "status" itself."""
+    start = time.perf_counter()
+    entry = {"step": name, "start": round(start - RUN_START, 2), "status": "ok"}
+    try:
+        yield entry
+    except BaseException:
+        entry["status"] = "failed"
+        raise
+    finally:
+        entry["seconds"] = round(time.perf_counter() - start, 2)
+        with _timings_lock:
+            STEP_TIMINGS.append(entry)
+
+
+def run_step(name, fn, *args):
+    with timed_step(name):
+        return fn(*args)
+
+
+def run_concurrently(steps):
+    """Run independent steps ({name: callable}) at once and wait for all.
+
+    A failing step (including one that calls sys.exit) does not cancel the
+    others; once all have finished, the first failure in `steps` order is
+    re-raised in the caller.
+    """
+    with ThreadPoolExecutor(max_workers=len(steps)) as pool:
+        futures = {name: pool.submit(run_step, name, fn) for name, fn in steps.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def wait_for(check, description, timeout, initial_delay=0.25, max_delay=5.0):
+    """Poll check() with exponential backoff until it is true or timeout passes.
+
+    Exceptions from check() count as "not ready yet". Returns True/False.
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    attempts = 0
+    with timed_step(f"wait: {description}") as step:
+        while True:
+            attempts += 1
+            try:
+                if check():
+                    print(f"[OK] {description} (after {attempts} checks).")
+                    return True
+            except Exception:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"[ERROR] {description}: not ready after {timeout:g}s.")
+                step["status"] = "timeout"
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, max_delay)
+
+
+def backend_responds(url=BACKEND_URL):
+    # The same probe as the backend's compose healthcheck, without waiting
+    # for its 5s interval
+    with urllib.request.urlopen(url, timeout=2) as resp:
+        return resp.status == 200
+
+
+def print_timing_report(output=None):
+    if not STEP_TIMINGS:
+        return
+    wall = round(time.perf_counter() - RUN_START, 2)
+    print("\n=== Startup timing report ===")
+    print(f"{'start':>8} {'seconds':>8}  {'status':<7} step")
+    for step in sorted(STEP_TIMINGS, key=lambda s: s["start"]):
+        print(
+            f"{step['start']:>7.2f}s {step['seconds']:>7.2f}s  "
+            f"{step['status']:<7} {step['step']}"
+        )
+    print(f"Total wall clock: {wall:.2f}s")
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w") as f:
+            json.dump({"wall_seconds": wall, "steps": STEP_TIMINGS}, f, indent=2)
+        print(f"[INFO] Timing report written to {output}")
 
 
 def validate_npm_dependencies():
@@ -99,30 +199,41 @@ def validate_processes():
             print(f"[ERROR] {proc} is missing from PATH.")
 
 
+def npm_install(subdir):
+    pkg_dir = os.path.join(BASE_DIR, subdir)
+    if not os.path.exists(os.path.join(pkg_dir, "package.json")):
+        print(f"[SKIP] No package.json found in {subdir}, skipping npm install.")
+        return True
+    print(f"[INFO] Running 'npm install' in {subdir} ...")
+    # Installs run side by side, so output is captured and only shown on failure
+    try:
+        with timed_step(f"npm install ({subdir})"):
+            result = subprocess.run(
+                ["npm", "install", "--no-audit", "--no-fund"],
+                cwd=pkg_dir,
+                capture_output=True,
+                text=True,
+                timeout=NPM_INSTALL_TIMEOUT,
+            )
+    except subprocess.TimeoutExpired:
+        print(f"[ERROR] npm install in {subdir} timed out.")
+        return False
+    if result.returncode == 0:
+        print(f"[OK] npm dependencies installed in {subdir}.")
+        return True
+    print(result.stdout[-4000:])
+    print(result.stderr[-4000:])
+    print(f"[ERROR] npm install failed in {subdir}. See the output above.")
+    return False
+
+
 def setup_npm_dependencies():
     print(
-        "\n[STEP 1.5] Installing npm dependencies for \
-        frontend, backend, and e2e ..."
+        "\n[STEP 1.5] Installing npm dependencies for "
+        "frontend, backend, and e2e (in parallel) ..."
     )
-    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-    for subdir in ["frontend", "backend", "e2e"]:
-        pkg_dir = os.path.join(base_dir, subdir)
-        pkg_json = os.path.join(pkg_dir, "package.json")
-        if os.path.exists(pkg_json):
-            print(f"[INFO] Running 'npm install' in {subdir} ...")
-            result = subprocess.run(["npm", "install"], cwd=pkg_dir)
-            if result.returncode == 0:
-                print(f"[OK] npm dependencies installed in {subdir}.")
-            else:
-                print(
-                    f"[ERROR] npm install failed \
-                    in {subdir}. Please check the logs."
-                )
-        else:
-            print(
-                f"[SKIP] No package.json found \
-                in {subdir}, skipping npm install."
-            )
+    with ThreadPoolExecutor(max_workers=len(NPM_SUBDIRS)) as pool:
+        return all(pool.map(npm_install, NPM_SUBDIRS))
 
 
 def cleanup_orphans():
@@ -196,8 +307,6 @@ def test_docker_compose_stack():
     env_src = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".env"))
     env_dst = os.path.join(infra_dir, ".env")
     if not os.path.exists(env_dst):
-        import shutil
-
         shutil.copy(env_src, env_dst)
         print(f"[INFO] Copied .env to {env_dst} for Docker Compose.")
     # Start stack
@@ -208,11 +317,8 @@ def test_docker_compose_stack():
             "Check docker-compose.yml and .env."
         )
         sys.exit(1)
-    print(
-        "[OK] Docker Compose stack started. Waiting for\
-        services to initialize..."
-    )
-    time.sleep(5)
+    print("[OK] Docker Compose stack started. Waiting for the backend ...")
+    wait_for(backend_responds, "Backend is healthy", timeout=120)
     # Check container health (basic)
     ps = subprocess.run(
         ["docker", "compose", "ps"],
@@ -397,6 +503,26 @@ def setup_python_venv():
         sys.exit(1)
 
 
+def start_stack(infra_dir=INFRA_DIR):
+    env_src = os.path.join(BASE_DIR, ".env")
+    env_dst = os.path.join(infra_dir, ".env")
+    if not os.path.exists(env_dst):
+        shutil.copy(env_src, env_dst)
+        print(f"[INFO] Copied .env to {env_dst} for Docker Compose.")
+    result = subprocess.run(["docker", "compose", "up", "-d"], cwd=infra_dir)
+    if result.returncode != 0:
+        print(
+            "[FATAL] Failed to start Docker Compose stack. "
+            "Check docker-compose.yml and .env."
+        )
+        sys.exit(1)
+
+
+def stop_stack(infra_dir=INFRA_DIR):
+    with timed_step("docker compose down"):
+        subprocess.run(["docker", "compose", "down"], cwd=infra_dir)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Anantam Master Control Script")
     parser.add_argument(
@@ -426,13 +552,35 @@ def main():
         action="store_true",
         help="Remove all containers, volumes, and orphans",
     )
+    parser.add_argument(
+        "--health-timeout",
+        type=float,
+        default=120,
+        help="Seconds to wait for the backend to become healthy (default: 120)",
+    )
+    parser.add_argument("--output", help="Write the step timing report as JSON")
     args = parser.parse_args()
 
+    try:
+        orchestrate(args)
+    finally:
+        print_timing_report(args.output)
+
+
+def orchestrate(args):
     print("\n=== Master Control Application Execution Script ===\n")
-    ensure_homebrew_path_in_shell()
-    check_and_install_docker_compose_plugin()
-    validate_processes()
-    setup_npm_dependencies()
+    run_step("homebrew PATH", ensure_homebrew_path_in_shell)
+    run_step("compose plugin", check_and_install_docker_compose_plugin)
+    # Independent of each other: tool checks and npm installs. The image
+    # build reads the same directories, so it only starts once npm is done
+    results = run_concurrently(
+        {"tool check": validate_processes, "npm install": setup_npm_dependencies}
+    )
+    if not results["npm install"]:
+        print("[FATAL] npm install failed; not building or starting the stack.")
+        sys.exit(1)
+    if args.build:
+        run_step("docker build", build_images)
     validate_npm_dependencies()
     validate_npm_precommit_scripts()
 
@@ -446,7 +594,6 @@ def main():
         return
 
     if args.build:
-        build_images()
         print("[OK] Build complete.")
         return
 
@@ -460,54 +607,16 @@ def main():
             "[STEP] Starting Docker Compose stack \
             for test suites ..."
         )
-        infra_dir = os.path.abspath(
-            os.path.join(os.path.dirname(__file__), "..", "infra")
-        )
-        env_src = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".env"))
-        env_dst = os.path.join(infra_dir, ".env")
-        if not os.path.exists(env_dst):
-            import shutil
-
-            shutil.copy(env_src, env_dst)
-            print(f"[INFO] Copied .env to {env_dst} for Docker Compose.")
-        result = subprocess.run(["docker", "compose", "up", "-d"], cwd=infra_dir)
-        if result.returncode != 0:
-            print(
-                "[FATAL] Failed to start Docker Compose stack. \
-                    Check docker-compose.yml and .env."
-            )
-            sys.exit(1)
-        import time
-        import urllib.request
-
-        # Wait for backend to be healthy by curling the endpoint
-        print(
-            "[STEP] Waiting for backend service \
-            to be healthy (curl check) ..."
-        )
-        healthy = False
-        for _ in range(30):
-            try:
-                with urllib.request.urlopen(
-                    "http://localhost:8000/", timeout=2
-                ) as resp:
-                    if resp.status == 200:
-                        healthy = True
-                        print("[OK] Backend is healthy.")
-                        break
-            except Exception:
-                pass
-            time.sleep(2)
-        if not healthy:
-            print("[FATAL] Backend did not become healthy in time.")
-            subprocess.run(["docker", "compose", "down"], cwd=infra_dir)
+        infra_dir = INFRA_DIR
+        run_step("docker compose up", start_stack, infra_dir)
+        if not wait_for(backend_responds, "Backend is healthy", args.health_timeout):
+            stop_stack(infra_dir)
             sys.exit(1)
 
         # Run Alembic migrations inside backend container
         print("[STEP] Running Alembic migrations in backend container ...")
         print("[DEBUG] infra_dir: {}".format(infra_dir))
         print("[DEBUG] Current working directory: {}".format(os.getcwd()))
-        print("[DEBUG] Environment: {}".format(os.environ))
         # Use 'docker compose ps -q backend' to get the backend container ID
         try:
             ps = subprocess.run(
@@ -601,7 +710,7 @@ def main():
                 "-c",
                 "cd /app && alembic -c /app/alembic.ini upgrade head",
             ]
-            result = subprocess.run(alembic_cmd)
+            result = run_step("alembic upgrade", subprocess.run, alembic_cmd)
             if result.returncode == 0:
                 print("[OK] Alembic migrations applied.")
             else:
@@ -629,8 +738,11 @@ def main():
         test_files = sorted(glob.glob(os.path.join(tests_dir, "test_*.py")))
         all_passed = True
         for test_script in test_files:
-            print(f"[TEST] Running {os.path.basename(test_script)} ...")
-            result = subprocess.run([venv_python, test_script])
+            name = os.path.basename(test_script)
+            print(f"[TEST] Running {name} ...")
+            result = run_step(
+                f"test {name}", subprocess.run, [venv_python, test_script]
+            )
             if result.returncode == 0:
                 print(f"[OK] {os.path.basename(test_script)} passed.")
             else:
@@ -641,7 +753,7 @@ def main():
                 all_passed = False
         # Stop stack after tests
         print("[STEP] Stopping Docker Compose stack after tests ...")
-        subprocess.run(["docker", "compose", "down"], cwd=infra_dir)
+        stop_stack(infra_dir)
         if all_passed:
             print("[OK] All backend test suites passed.")
         else:
@@ -650,61 +762,25 @@ def main():
 
     # Default: full validation, stack up, test, stack down
 
-    # Initial environment validation (tools, versions, etc.)
-    run_env_validation()
-    # Setup Python venv and install requirements
-    setup_python_venv()
-    # Re-run environment validation using backend venv \
-    # Python to check for missing packages after install
-    run_env_validation(use_venv_python=True)
-    check_env_file_and_vars()
+    # Tool and .env checks are independent; the stack then starts while the
+    # venv installs, since only the tests need both
+    run_concurrently(
+        {"env validation": run_env_validation, "env file": check_env_file_and_vars}
+    )
 
-    # Start stack (in detached mode)
-    print("[STEP 4] Starting Docker Compose stack for testing ...")
-    infra_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "infra"))
-    env_src = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".env"))
-    env_dst = os.path.join(infra_dir, ".env")
-    if not os.path.exists(env_dst):
-        import shutil
+    def python_env():
+        setup_python_venv()
+        # Re-run environment validation using the backend venv Python to
+        # check for missing packages after install
+        run_env_validation(use_venv_python=True)
 
-        shutil.copy(env_src, env_dst)
-        print(f"[INFO] Copied .env to {env_dst} for Docker Compose.")
-    result = subprocess.run(["docker", "compose", "up", "-d"], cwd=infra_dir)
-    if result.returncode != 0:
-        print(
-            "[FATAL] Failed to start Docker Compose stack. \
-                Check docker-compose.yml and .env."
-        )
-        sys.exit(1)
-    import time
+    print("[STEP 4] Starting Docker Compose stack for testing ...")
+    infra_dir = INFRA_DIR
+    run_concurrently({"python venv": python_env, "docker compose up": start_stack})
 
-    # Wait for backend to be healthy
     print("[STEP 4.1] Waiting for backend service to be healthy ...")
-    healthy = False
-    for _ in range(30):
-        ps = subprocess.run(
-            ["docker", "compose", "ps", "--format", "json"],
-            cwd=infra_dir,
-            capture_output=True,
-            text=True,
-        )
-        try:
-            services = json.loads(ps.stdout)
-            for svc in services:
-                if svc.get("Service") == "backend" and "healthy" in svc.get(
-                    "Status", ""
-                ):
-                    healthy = True
-                    break
-        except Exception:
-            pass
-        if healthy:
-            print("[OK] Backend is healthy.")
-            break
-        time.sleep(2)
-    if not healthy:
-        print("[FATAL] Backend did not become healthy in time.")
-        subprocess.run(["docker", "compose", "down"], cwd=infra_dir)
+    if not wait_for(backend_responds, "Backend is healthy", args.health_timeout):
+        stop_stack(infra_dir)
         sys.exit(1)
 
     # Run automated tests
@@ -716,7 +792,7 @@ def main():
     tests_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "tests"))
     test_script = os.path.join(tests_dir, "test_auth.py")
     if os.path.exists(test_script):
-        result = subprocess.run([venv_python, test_script])
+        result = run_step("test_auth.py", subprocess.run, [venv_python, test_script])
         if result.returncode == 0:
             print("[OK] Authentication endpoints passed automated tests.")
         else:
@@ -729,7 +805,7 @@ def main():
 
     # Stop stack after tests
     print("[STEP 6] Stopping Docker Compose stack after tests ...")
-    subprocess.run(["docker", "compose", "down"], cwd=infra_dir)
+    stop_stack(infra_dir)
 
     print(
         "[INFO] All initial checks, stack test, \
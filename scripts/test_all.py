@@ -1,7 +1,10 @@
+import argparse
 import subprocess
 import sys
 import os
 
+from check_flaky_tests import DEFAULT_DURATIONS, refresh_durations
+
 # All backend Postgres-related test groups (name, file)
 POSTGRES_TEST_GROUPS = [
     ("Auth API Tests", "/app/tests/test_auth.py"),
@@ -11,18 +14,28 @@ POSTGRES_TEST_GROUPS = [
     ("PostgreSQL Advanced Tests", "/app/tests/test_postgres_advanced.py"),
     ("PostgreSQL Extra Tests", "/app/tests/test_postgres_extra.py"),
     ("PostgreSQL More Advanced Tests", "/app/tests/test_postgres_more.py"),
+    ("PostgreSQL Realtime Tests", "/app/tests/test_postgres_realtime.py"),
+    ("PostgreSQL Entrypoint Tests", "/app/tests/test_postgres_entrypoint.py"),
+    (
+        "PostgreSQL Online Migration Tests",
+        "/app/tests/test_postgres_online_migrations.py",
+    ),
 ]
 
 
-def postgres_test_cmd(test_file):
+TEST_DB_NAME = "anantam_test"
+COMPOSE = ["docker", "compose", "-f", "infra/docker-compose.yml"]
+
+
+def postgres_test_env(db_name=TEST_DB_NAME):
+    """docker compose exec/run flags pointing the tests at `db_name`."""
+    url = (
+        "postgresql://anantam:"
+        f"supersecret@db:5432/{db_name}"  # pragma: allowlist secret
+    )
     return [
-        "docker",
-        "compose",
-        "-f",
-        "infra/docker-compose.yml",
-        "exec",
         "-e",
-        "TEST_DB=anantam_test",
+        f"TEST_DB={db_name}",
         "-e",
         "TEST_DB_USER=anantam",
         "-e",
@@ -32,27 +45,74 @@ def postgres_test_cmd(test_file):
         "-e",
         "TEST_DB_PORT=5432",
         "-e",
-        (
-            "TEST_DATABASE_URL="
-            "postgresql://anantam:"
-            "supersecret@db:5432/anantam_test"  # pragma: allowlist secret
-        ),
+        f"TEST_DATABASE_URL={url}",
         "-e",
-        (
-            "DATABASE_URL="
-            "postgresql://anantam:"
-            "supersecret@db:5432/anantam_test"  # pragma: allowlist secret
-        ),
-        "backend",
+        f"DATABASE_URL={url}",
+    ]
+
+
+def pytest_cmd(test_files, pytest_args=()):
+    return [
         "pytest",
-        test_file,
+        *test_files,
         "--maxfail=10",
         "--disable-warnings",
         "-v",
         "--tb=short",
+        *pytest_args,
+    ]
+
+
+def postgres_test_cmd(test_file, db_name=TEST_DB_NAME, exec_flags=(), pytest_args=()):
+    return [
+        *COMPOSE,
+        "exec",
+        *exec_flags,
+        *postgres_test_env(db_name),
+        "backend",
+        *pytest_cmd([test_file], pytest_args),
     ]
 
 
+# Where the durations and the impact map are copied in the backend container
+CONTAINER_DURATIONS = "/tmp/test-durations.json"
+IMPACT_MAP = os.path.join(".test-history", "impact.json")
+CONTAINER_IMPACT_MAP = "/tmp/test-impact.json"
+
+
+def compose_cp(src, dst):
+    subprocess.run(COMPOSE + ["cp", src, dst], check=True)
+
+
+def prepare_shard_durations():
+    """Refresh per-test durations from the test history and copy them in."""
+    count = refresh_durations(DEFAULT_DURATIONS)
+    print(f"[INFO] Shard durations: {count} tests with history")
+    compose_cp(DEFAULT_DURATIONS, f"backend:{CONTAINER_DURATIONS}")
+
+
+def changed_backend_files(base):
+    """Files under backend/ changed since the merge base with `base`."""
+
+    def git(*args):
+        return subprocess.run(
+            ["git", *args], cwd="backend", capture_output=True, text=True, check=True
+        ).stdout.splitlines()
+
+    merge_base = git("merge-base", base, "HEAD")[0]
+    changed = git("diff", "--name-only", "--relative", merge_base)
+    changed += git("ls-files", "--others", "--exclude-standard")
+    return sorted(set(changed))
+
+
+def combined_test_cmd(options, db_name=TEST_DB_NAME, exec_flags=(), pytest_args=()):
+    """One pytest run over every Postgres test file, with plugin options."""
+    first, *rest = [test_file for _, test_file in POSTGRES_TEST_GROUPS]
+    return postgres_test_cmd(
+        first, db_name, exec_flags, [*rest, *options, *pytest_args]
+    )
+
+
 TEST_COMMANDS = [
     (name, postgres_test_cmd(test_file)) for name, test_file in POSTGRES_TEST_GROUPS
 ]
@@ -96,9 +156,50 @@ def ensure_playwright_installed():
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Run the Anantam test suites")
     # If 'postgres' is passed as an argument, only run Postgres-related tests
-    only_postgres = len(sys.argv) > 1 and sys.argv[1] == "postgres"
-    cmds = TEST_COMMANDS if only_postgres else ALL_COMMANDS
+    parser.add_argument("suite", nargs="?", choices=["postgres"])
+    parser.add_argument(
+        "--shard",
+        metavar="I/N",
+        help="Run only shard I of N of the backend Postgres tests, balanced "
+        "by historical durations (e.g. one CI matrix job per shard)",
+    )
+    parser.add_argument(
+        "--impact",
+        metavar="BASE",
+        help="Run only the backend Postgres tests affected by changes since "
+        "the merge base with BASE (full run if the impact map is missing/stale)",
+    )
+    parser.add_argument(
+        "--impact-record",
+        action="store_true",
+        help=f"Run the backend Postgres tests and record {IMPACT_MAP}",
+    )
+    args = parser.parse_args()
+    options = []
+    if args.impact:
+        changed = changed_backend_files(args.impact)
+        if not changed:
+            print(f"[INFO] No backend changes since {args.impact}; nothing to run.")
+            return
+        print(f"[INFO] Changed backend files: {', '.join(changed)}")
+        if os.path.exists(IMPACT_MAP):
+            compose_cp(IMPACT_MAP, f"backend:{CONTAINER_IMPACT_MAP}")
+        options += [f"--impact-changed={','.join(changed)}"]
+    if args.impact or args.impact_record:
+        options += [f"--impact-map={CONTAINER_IMPACT_MAP}"]
+    if args.impact_record:
+        options += ["--impact-record"]
+    if args.shard:
+        prepare_shard_durations()
+        options += [f"--shard={args.shard}", f"--shard-durations={CONTAINER_DURATIONS}"]
+    if options:
+        cmds = [("Backend Tests", combined_test_cmd(options))]
+    elif args.suite == "postgres":
+        cmds = TEST_COMMANDS
+    else:
+        cmds = ALL_COMMANDS
     ran = []
     print("\n==================== TEST SUITE START ====================\n")
     for name, cmd in cmds:
@@ -120,6 +221,10 @@ def main():
         if result.returncode != 0 and name == "Migration Tests":
             print("[TEST SUITE] Migration Tests failed, " "but continuing as expected.")
     print("\n==================== TEST SUITE END ====================\n")
+    if args.impact_record and all(code == 0 for _, code in ran):
+        os.makedirs(os.path.dirname(IMPACT_MAP), exist_ok=True)
+        compose_cp(f"backend:{CONTAINER_IMPACT_MAP}", IMPACT_MAP)
+        print(f"[INFO] Impact map saved to {IMPACT_MAP}")
     print("\nTest Summary:")
     for name, code in ran:
         print(f"  {name}: {'PASSED' if code == 0 else 'FAILED'}")
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+test_parallel.py: Run the backend Postgres test groups concurrently.
+
+- Migrates a template database (anantam_test_template) once with Alembic
+- Each worker owns a database (anantam_test_w<N>) that is re-cloned from the
+  template with CREATE DATABASE ... TEMPLATE before every group, so groups
+  never see each other's rows and create_all/drop_all stay local
+- Each group runs in its own ``docker compose run --rm backend-test``
+  container (infra/docker-compose.parallel.yml) with TEST_WORKER_CPUS CPUs
+  and TEST_WORKER_MEMORY_MB of memory, not in the running backend service,
+  which is capped at 0.5 CPU. --workers defaults to as many such containers
+  as the host's CPUs and memory fit
+- Groups with live-server tests (test_auth.py) start a server inside their
+  container on the worker's database, so they never touch the app's data
+- Groups from test_all.POSTGRES_TEST_GROUPS run on --workers workers; each
+  group's output goes to reports/parallel/<group>.log instead of
+  interleaving on the terminal
+- --balanced replaces the fixed groups with one duration-balanced shard of
+  all Postgres tests per worker (pytest --shard, see tests/sharding.py), so
+  workers finish together; --shard I/N runs only this machine's part of an
+  N-way split, itself balanced over the workers
+- The per-group JUnit files are merged into reports/backend-parallel-junit.xml,
+  which check_flaky_tests.py picks up like the other *-junit.xml reports
+
+Usage (from the repo root, with the db service up):
+    python3 scripts/test_parallel.py
+    python3 scripts/test_parallel.py --workers 4 --keep-dbs
+    python3 scripts/test_parallel.py --workers 4 --shard 1/2
+"""
+
+import argparse
+import os
+import queue
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from check_flaky_tests import DEFAULT_DURATIONS, refresh_durations
+from test_all import (
+    COMPOSE,
+    POSTGRES_TEST_GROUPS,
+    TEST_DB_NAME,
+    postgres_test_env,
+    pytest_cmd,
+)
+
+WORKER_COMPOSE = COMPOSE + ["-f", "infra/docker-compose.parallel.yml"]
+WORKER_SERVICE = "backend-test"
+# Resources of one worker container (read by docker-compose.parallel.yml)
+WORKER_CPUS = float(os.environ.setdefault("TEST_WORKER_CPUS", "1"))
+WORKER_MEMORY_MB = int(os.environ.setdefault("TEST_WORKER_MEMORY_MB", "1024"))
+LIVE_SERVER_FILES = ("/app/tests/test_auth.py",)
+# Starts the app on the worker's database, waits for it, then runs "$@"
+LIVE_SERVER_SH = (
+    "python server.py > /tmp/live-server.log 2>&1 & "
+    "for _ in $(seq 150); do curl -sf http://localhost:8000/ > /dev/null "
+    '&& break; sleep 0.2; done; exec "$@"'
+)
+TEMPLATE_DB = f"{TEST_DB_NAME}_template"
+REPORTS_DIR = "reports"
+MERGED_REPORT = os.path.join(REPORTS_DIR, "backend-parallel-junit.xml")
+# Same rule as test_all.py: these groups may fail without failing the run
+ALLOWED_FAILURES = {"Migration Tests"}
+COUNTERS = ("tests", "failures", "errors", "skipped")
+
+
+def slug(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+def psql(sql):
+    cmd = COMPOSE + ["exec", "-T", "db", "psql", "-U", "anantam", "-d", "postgres"]
+    cmd += ["-v", "ON_ERROR_STOP=1", "-q", "-c", sql]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"psql failed: {sql}\n{result.stderr.strip()}")
+
+
+def drop_database(name):
+    psql(
+        "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+        f"WHERE datname = '{name}' AND pid <> pg_backend_pid()"
+    )
+    psql(f"DROP DATABASE IF EXISTS {name}")
+
+
+def default_workers(group_count=None):
+    """As many worker containers as the host's CPUs and memory fit."""
+    by_cpu = int((os.cpu_count() or 1) // WORKER_CPUS)
+    try:
+        memory_mb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") >> 20
+    except (AttributeError, ValueError, OSError):
+        memory_mb = WORKER_MEMORY_MB
+    by_memory = memory_mb // WORKER_MEMORY_MB
+    return max(1, min(by_cpu, by_memory, group_count or by_cpu))
+
+
+def worker_cmd(db_name, command, live_server=False):
+    """Run `command` in a fresh worker container; /reports is reports/parallel/."""
+    cmd = WORKER_COMPOSE + ["run", "--rm", "--no-deps", "-T"]
+    cmd += ["-v", f"{os.path.abspath(os.path.join(REPORTS_DIR, 'parallel'))}:/reports"]
+    cmd += postgres_test_env(db_name) + [WORKER_SERVICE]
+    if live_server:
+        cmd += ["sh", "-c", LIVE_SERVER_SH, "sh"]
+    return cmd + command
+
+
+def build_template():
+    drop_database(TEMPLATE_DB)
+    psql(f"CREATE DATABASE {TEMPLATE_DB} OWNER anantam")
+    cmd = worker_cmd(
+        TEMPLATE_DB,
+        ["env", "PYTHONPATH=/app", "alembic", "-c", "alembic.ini", "upgrade", "head"],
+    )
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Template migration failed:\n{result.stderr.strip()}")
+
+
+class Workers:
+    """Hands out worker databases, re-cloned from the template on acquire.
+
+    Clones are quick and serialized: CREATE DATABASE ... TEMPLATE fails if any
+    other session is connected to the template at that moment.
+    """
+
+    def __init__(self, count):
+        self.free = queue.Queue()
+        for i in range(count):
+            self.free.put(f"{TEST_DB_NAME}_w{i}")
+        self.names = list(self.free.queue)
+        self.clone_lock = threading.Lock()
+
+    def acquire(self):
+        name = self.free.get()
+        with self.clone_lock:
+            drop_database(name)
+            psql(f"CREATE DATABASE {name} TEMPLATE {TEMPLATE_DB} OWNER anantam")
+        return name
+
+    def release(self, name):
+        self.free.put(name)
+
+    def drop_all(self):
+        for name in self.names + [TEMPLATE_DB]:
+            try:
+                drop_database(name)
+            except RuntimeError as exc:
+                print(f"[WARN] {exc}")
+
+
+def shard_groups(shard, count):
+    """Split shard I/N (default 1/1) into `count` sub-shards, one per worker."""
+    index, total = (int(part) for part in (shard or "1/1").split("/"))
+    first = (index - 1) * count + 1
+    return [
+        (f"Shard {k}/{total * count}", None, f"{k}/{total * count}")
+        for k in range(first, first + count)
+    ]
+
+
+def run_group(workers, name, test_file, shard=None):
+    db_name = workers.acquire()
+    junit = f"{slug(name)}-junit.xml"
+    local = os.path.join(REPORTS_DIR, "parallel", junit)
+    log_path = os.path.join(REPORTS_DIR, "parallel", f"{slug(name)}.log")
+    start = time.monotonic()
+    try:
+        pytest_args = [f"--junitxml=/reports/{junit}"]
+        if shard:
+            # Every file, so the shard may include live-server tests
+            test_files = [path for _, path in POSTGRES_TEST_GROUPS]
+            pytest_args += [
+                f"--shard={shard}",
+                f"--shard-durations=/reports/{os.path.basename(DEFAULT_DURATIONS)}",
+            ]
+        else:
+            test_files = [test_file]
+        live_server = any(path in LIVE_SERVER_FILES for path in test_files)
+        cmd = worker_cmd(db_name, pytest_cmd(test_files, pytest_args), live_server)
+        if os.path.exists(local):
+            os.remove(local)
+        with open(log_path, "w") as log:
+            log.write(f"[COMMAND] {' '.join(cmd)}\n\n")
+            log.flush()
+            code = subprocess.call(cmd, stdout=log, stderr=subprocess.STDOUT)
+        return {
+            "name": name,
+            "db": db_name,
+            "code": code,
+            "seconds": time.monotonic() - start,
+            "junit": local if os.path.exists(local) else None,
+            "log": log_path,
+        }
+    finally:
+        workers.release(db_name)
+
+
+def merge_junit(results, path):
+    merged = ET.Element("testsuites", name="backend-parallel")
+    totals = dict.fromkeys(COUNTERS, 0)
+    total_time = 0.0
+    for result in results:
+        if not result["junit"]:
+            continue
+        try:
+            root = ET.parse(result["junit"]).getroot()
+        except (OSError, ET.ParseError) as exc:
+            print(f"[WARN] Could not parse {result['junit']}: {exc}")
+            continue
+        suites = [root] if root.tag == "testsuite" else root.findall("testsuite")
+        for suite in suites:
+            suite.set("name", result["name"])
+            for key in COUNTERS:
+                totals[key] += int(suite.get(key, 0))
+            total_time += float(suite.get("time", 0))
+            merged.append(suite)
+    for key, value in totals.items():
+        merged.set(key, str(value))
+    merged.set("time", f"{total_time:.3f}")
+    ET.ElementTree(merged).write(path, encoding="utf-8", xml_declaration=True)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Worker containers (default: as many as CPUs and memory fit)",
+    )
+    parser.add_argument(
+        "--keep-dbs", action="store_true", help="Keep the template and worker DBs"
+    )
+    parser.add_argument(
+        "--balanced",
+        action="store_true",
+        help="Run one duration-balanced shard per worker instead of fixed groups",
+    )
+    parser.add_argument(
+        "--shard", metavar="I/N", help="Run only shard I of N (implies --balanced)"
+    )
+    args = parser.parse_args()
+    if args.workers is None:
+        fixed = not (args.balanced or args.shard)
+        args.workers = default_workers(len(POSTGRES_TEST_GROUPS) if fixed else None)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.shard:
+        parts = args.shard.split("/")
+        if len(parts) != 2 or not all(p.isdigit() for p in parts):
+            parser.error("--shard must look like I/N")
+        if not 1 <= int(parts[0]) <= int(parts[1]):
+            parser.error("--shard: I must be between 1 and N")
+    os.makedirs(os.path.join(REPORTS_DIR, "parallel"), exist_ok=True)
+    if args.balanced or args.shard:
+        groups = shard_groups(args.shard, args.workers)
+        count = refresh_durations(DEFAULT_DURATIONS)
+        print(f"[INFO] Shard durations: {count} tests with history")
+        # The worker containers read it from /reports
+        shutil.copy(DEFAULT_DURATIONS, os.path.join(REPORTS_DIR, "parallel"))
+    else:
+        groups = [(name, test_file, None) for name, test_file in POSTGRES_TEST_GROUPS]
+
+    started = time.monotonic()
+    print(f"[INFO] Migrating template database {TEMPLATE_DB} ...")
+    try:
+        build_template()
+    except RuntimeError as exc:
+        print(f"[ERROR] {exc}")
+        sys.exit(1)
+    print(f"[INFO] Template ready in {time.monotonic() - started:.1f}s")
+
+    workers = Workers(args.workers)
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            futures = [
+                pool.submit(run_group, workers, name, test_file, shard)
+                for name, test_file, shard in groups
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                status = "PASSED" if result["code"] == 0 else "FAILED"
+                print(
+                    f"[{status}] {result['name']} on {result['db']} "
+                    f"in {result['seconds']:.1f}s (log: {result['log']})"
+                )
+    finally:
+        if not args.keep_dbs:
+            workers.drop_all()
+
+    order = [name for name, _, _ in groups]
+    results.sort(key=lambda r: order.index(r["name"]))
+    totals = merge_junit(results, MERGED_REPORT)
+    wall = time.monotonic() - started
+    serial = sum(r["seconds"] for r in results)
+    print("\nTest Summary:")
+    for result in results:
+        status = "PASSED" if result["code"] == 0 else "FAILED"
+        print(f"  {result['name']}: {status} ({result['seconds']:.1f}s)")
+    print(
+        f"\n[INFO] {totals['tests']} tests, {totals['failures']} failures, "
+        f"{totals['errors']} errors, {totals['skipped']} skipped"
+    )
+    print(
+        f"[INFO] Wall clock {wall:.1f}s on {args.workers} workers "
+        f"(groups took {serial:.1f}s in total); merged report: {MERGED_REPORT}"
+    )
+    failed = [
+        r["name"]
+        for r in results
+        if r["code"] != 0 and r["name"] not in ALLOWED_FAILURES
+    ]
+    if failed:
+        print(f"\n[TEST SUITE] Failed groups: {', '.join(failed)}\n")
+        sys.exit(1)
+    print("\n[TEST SUITE] All tests passed!\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -106,6 +106,8 @@ def main():
     required_pkgs = [
         ("fastapi", "fastapi"),
         ("uvicorn", "uvicorn"),
+        ("gunicorn", "gunicorn"),
+        ("uvicorn-worker", "uvicorn_worker"),
         ("psycopg2-binary", "psycopg2"),
         ("sqlalchemy", "sqlalchemy"),
         ("python-dotenv", "dotenv"),